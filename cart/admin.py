@@ -1,21 +1,23 @@
 
-import uuid
 from django.contrib import admin
 from .models import Order, OrderLine, Color, Size
 from django.utils.html import format_html
+from shop_vivu import ids
+from shop_vivu.admin_paginator import EstimatedCountPaginator
 
 
 class OrderLineInline(admin.TabularInline):
     model = OrderLine
     readonly_field = ("orderline_id")
     extra = 0  
+    autocomplete_fields = ('product',)
     def save_new_inline(self, form, obj, commit=True):
         """
         Custom save method to generate `orderline_id`.
         """
         instance = form.save(commit=False)
         if not instance.orderline_id:  # Sinh orderline_id nếu chưa có
-            instance.orderline_id = f"OL{str(uuid.uuid4())[:8].upper()}"
+            instance.orderline_id = ids.next_id('OL')
         if commit:
             instance.save()
         return instance
@@ -26,8 +28,12 @@ class OrderLineInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_id', 'user', 'status', 'total_price', 'payment_method','note', 'created_at', 'updated_at')
     list_filter = ('status', 'payment_method', 'created_at')
-    search_fields = ('order_id', 'user__username', 'user__email')
+    search_fields = ('order_id', 'user__full_name', 'user__email')
     ordering = ('-created_at',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('created_at', 'updated_at', 'order_id','total_price')  # Giữ các trường này chỉ đọc
     
     fieldsets = (
@@ -46,6 +52,11 @@ class OrderLineAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     readonly_fields = ('orderline_id', 'created_at', 'updated_at')
     ordering = ('-created_at',)
+    # Order.__str__ dùng tên khách hàng nên nạp kèm order__user
+    list_select_related = ('order__user', 'product', 'color', 'size')
+    autocomplete_fields = ('order', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         ("Order Line Details", {
             'fields': ('orderline_id', 'order', 'product','color','size', 'quantity','created_at', 'updated_at')
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cart import sales
+from cart.models import Order, SalesRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bảng tổng hợp doanh thu từ các đơn hàng đã giao, đọc theo từng lô. "
+        "Số liệu mới được tính trước, rồi thay các dòng cũ trong một transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Số đơn hàng mỗi lô")
+        parser.add_argument('--since', help="Chỉ tính lại từ tháng chứa ngày này (YYYY-MM-DD), mặc định tính lại tất cả")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.filter(status='delivered')
+        rollups = SalesRollup.objects.all()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date().replace(day=1)
+            except ValueError:
+                raise CommandError("--since phải có dạng YYYY-MM-DD")
+            orders = orders.filter(created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+            rollups = rollups.filter(period_start__gte=since)
+
+        deltas = defaultdict(lambda: [Decimal('0'), 0, 0])
+        last_id = ''
+        processed = 0
+        while True:
+            order_ids = list(
+                orders.filter(order_id__gt=last_id).order_by('order_id').values_list('order_id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+            for key, values in sales.rollup_deltas(order_ids).items():
+                for index, value in enumerate(values):
+                    deltas[key][index] += value
+            processed += len(order_ids)
+
+        # Xóa và ghi lại trong cùng transaction: trang thống kê không bao giờ thấy bảng tổng hợp rỗng hoặc thiếu
+        with transaction.atomic():
+            deleted, _ = rollups.delete()
+            sales.apply_deltas(deltas)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xóa {deleted} dòng tổng hợp cũ, tính lại từ {processed} đơn hàng đã giao."
+        ))
@@ -0,0 +1,52 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cart import sales
+from cart.models import Order, ProductSalesCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bộ đếm bán hàng theo tháng và bảng xếp hạng bán chạy từ các đơn hàng chưa hủy. "
+        "Số liệu mới được tính trước, rồi thay bộ đếm cũ trong một transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Số đơn hàng mỗi lô")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        orders = Order.objects.exclude(status='cancelled')
+
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        defaults = {}
+        last_id = ''
+        processed = 0
+        while True:
+            order_ids = list(
+                orders.filter(order_id__gt=last_id).order_by('order_id').values_list('order_id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+            batch_deltas, batch_defaults = sales.counter_deltas(order_ids)
+            for key, (units, revenue) in batch_deltas.items():
+                deltas[key][0] += units
+                deltas[key][1] += revenue
+            defaults.update(batch_defaults)
+            processed += len(order_ids)
+
+        # Xóa và ghi lại trong cùng transaction: trang thống kê không bao giờ thấy bộ đếm rỗng hoặc thiếu
+        with transaction.atomic():
+            old_months = set(ProductSalesCounter.objects.values_list('month', flat=True).distinct())
+            deleted, _ = ProductSalesCounter.objects.all().delete()
+            sales.apply_counter_deltas(deltas, defaults)
+
+        for month in old_months | {month for month, _ in deltas}:
+            sales.refresh_leaderboard(month)
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xóa {deleted} bộ đếm cũ, tính lại từ {processed} đơn hàng."
+        ))
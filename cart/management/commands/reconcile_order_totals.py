@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from cart.models import Order, OrderLine
+
+
+class Command(BaseCommand):
+    help = "Đối soát và sửa `Order.total_price` theo tổng các dòng đơn hàng, xử lý theo từng lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Số đơn hàng mỗi lô")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ báo cáo, không sửa dữ liệu")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        expected_total = Coalesce(Subquery(OrderLine.total_for_order(OuterRef('pk'))), Value(Decimal('0')))
+
+        last_id = ''
+        checked = fixed = 0
+        while True:
+            # Duyệt theo khóa chính (keyset) để mỗi lô là một range scan trên index
+            order_ids = list(
+                Order.objects.filter(order_id__gt=last_id)
+                .order_by('order_id')
+                .values_list('order_id', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+            checked += len(order_ids)
+
+            mismatched = list(
+                Order.objects.filter(order_id__in=order_ids)
+                .annotate(expected_total=expected_total)
+                .exclude(total_price=F('expected_total'))
+                .values_list('order_id', flat=True)
+            )
+            if mismatched and not dry_run:
+                with transaction.atomic():
+                    Order.objects.filter(order_id__in=mismatched).update(total_price=expected_total)
+            fixed += len(mismatched)
+
+        action = "cần sửa" if dry_run else "đã sửa"
+        self.stdout.write(self.style.SUCCESS(f"Đã kiểm tra {checked} đơn hàng, {action} {fixed} đơn hàng."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_sync_order_model_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderline',
+            name='color_name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Tên màu'),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Tên sản phẩm'),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='size_name',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Tên kích cỡ'),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Đơn giá'),
+        ),
+    ]
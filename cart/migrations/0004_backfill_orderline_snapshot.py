@@ -0,0 +1,40 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_snapshot(apps, schema_editor):
+    """
+    Điền giá bán và tên sản phẩm/màu/kích cỡ cho các dòng đơn hàng cũ.
+    Đọc theo từng lô theo khóa chính (keyset) và ghi bằng `bulk_update`,
+    để không nạp cả bảng vào bộ nhớ.
+    """
+    OrderLine = apps.get_model('cart', 'OrderLine')
+    lines = (
+        OrderLine.objects.filter(product_name='')
+        .select_related('product', 'color', 'size')
+        .only('orderline_id', 'color_id', 'size_id', 'product__name', 'product__sell_price', 'color__name', 'size__name')
+        .order_by('orderline_id')
+    )
+    last_id = ''
+    while True:
+        batch = list(lines.filter(orderline_id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for line in batch:
+            line.unit_price = line.product.sell_price
+            line.product_name = line.product.name
+            line.color_name = line.color.name if line.color_id else ''
+            line.size_name = line.size.name if line.size_id else ''
+        OrderLine.objects.bulk_update(batch, ['unit_price', 'product_name', 'color_name', 'size_name'])
+        last_id = batch[-1].orderline_id
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_orderline_price_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
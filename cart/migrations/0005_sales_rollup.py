@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_backfill_orderline_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Ngày'), ('month', 'Tháng')], max_length=5, verbose_name='Kỳ')),
+                ('period_start', models.DateField(verbose_name='Ngày bắt đầu kỳ')),
+                ('product_id', models.CharField(blank=True, default='', max_length=50, verbose_name='Mã sản phẩm')),
+                ('category_id', models.CharField(blank=True, default='', max_length=10, verbose_name='Mã danh mục')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('orders', models.IntegerField(default=0, verbose_name='Số đơn hàng')),
+                ('units', models.IntegerField(default=0, verbose_name='Số sản phẩm')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp doanh thu',
+                'verbose_name_plural': 'Tổng hợp doanh thu',
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start', 'product_id', 'category_id'), name='unique_sales_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Tháng')),
+                ('product_id', models.CharField(max_length=50, verbose_name='Mã sản phẩm')),
+                ('product_name', models.CharField(blank=True, default='', max_length=255, verbose_name='Tên sản phẩm')),
+                ('image_url', models.CharField(blank=True, default='', max_length=255, verbose_name='Ảnh')),
+                ('units', models.IntegerField(default=0, verbose_name='Số lượng đã bán')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm bán hàng',
+                'verbose_name_plural': 'Bộ đếm bán hàng',
+                'indexes': [models.Index(fields=['month', '-units'], name='sales_counter_leaderboard')],
+                'constraints': [models.UniqueConstraint(fields=('month', 'product_id'), name='unique_sales_counter_month_product')],
+            },
+        ),
+    ]
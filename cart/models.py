@@ -1,8 +1,14 @@
-from uuid import uuid4
+from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from shop_vivu import ids
 from user.models import User
-from products.models import Color, Product, Size
+from products.models import Color, InventoryMovement, Product, Size, StockQuantity
+
+SUBTOTAL_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
 
 class Cart(models.Model):
     id = models.AutoField(primary_key=True)
@@ -76,13 +82,74 @@ class Order(models.Model):
     vnp_TransactionStatus = models.CharField(max_length=2,null=True,blank=True,default='')
     def __str__(self):
         return f"Order {self.order_id} - {self.user.full_name} - {self.vnp_TransactionNo}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ trạng thái lúc tải để nhận biết chuyển trạng thái khi lưu
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from . import sales
+
+        # `total_price` chỉ được cập nhật bằng cộng dồn trong SQL (xem `apply_total_delta`),
+        # nên khi lưu một đơn hàng đã tồn tại không ghi đè giá trị cũ đang nằm trong instance.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total_price'
+            ]
+        was_delivered = getattr(self, '_loaded_status', None) == 'delivered'
+        was_cancelled = getattr(self, '_loaded_status', None) == 'cancelled'
+        adding = self._state.adding
+        saves_status = kwargs.get('update_fields') is None or 'status' in kwargs['update_fields']
+        # Bảng tổng hợp doanh thu được cập nhật trong cùng transaction với việc đổi trạng thái.
+        # `Order.objects.filter(...).update(status=...)` không đi qua đây: chạy `backfill_sales_rollups` sau đó.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if saves_status and was_delivered != (self.status == 'delivered'):
+                sales.apply_delivered_orders([self.pk], sign=-1 if was_delivered else 1)
+            if saves_status and not adding and was_cancelled != (self.status == 'cancelled'):
+                # Hủy đơn (hoặc khôi phục đơn đã hủy) thì trừ (cộng lại) bộ đếm bán hàng
+                sales.count_orders([self.pk], sign=1 if was_cancelled else -1)
+        if saves_status:
+            self._loaded_status = self.status
+
+    @staticmethod
+    def apply_total_delta(order_id, delta):
+        """Cộng `delta` vào tổng giá trị đơn hàng bằng một câu UPDATE nguyên tử."""
+        if delta:
+            Order.objects.filter(pk=order_id).update(total_price=F('total_price') + delta)
+
+    def release_stock(self):
+        """
+        Hoàn trả tồn kho cho toàn bộ dòng của đơn hàng: một truy vấn lấy số lượng theo biến thể,
+        sau đó ghi sổ kho và cập nhật số dư bằng một câu UPDATE duy nhất.
+        """
+        from products import inventory
+
+        returned = OrderLine.objects.filter(
+            order=self, product=OuterRef('product'), color=OuterRef('color'), size=OuterRef('size')
+        ).values('order').annotate(total=Sum('quantity')).values('total')
+        deltas = dict(
+            StockQuantity.objects.filter(Exists(returned)).annotate(returned=Subquery(returned)).values_list('id', 'returned')
+        )
+        inventory.record_many(deltas, InventoryMovement.RESTOCK, self.order_id)
+
     def update_total_price(self):
-        total = sum(line.subtotal() for line in self.order_lines.all())
-        self.total_price = total
-        self.save()
+        """Tính lại toàn bộ tổng giá trị đơn hàng từ các dòng đơn hàng (trong SQL)."""
+        Order.objects.filter(pk=self.pk).update(
+            total_price=Coalesce(Subquery(OrderLine.total_for_order(OuterRef('pk'))), Value(Decimal('0')))
+        )
+        self.refresh_from_db(fields=['total_price'])
     class Meta:
         verbose_name = "Đơn hàng"
         verbose_name_plural = "Quản lý đơn hàng"
+        indexes = [
+            # Lọc theo trạng thái trong trang quản trị/thống kê, lịch sử đơn hàng theo khách hàng
+            models.Index(fields=['status', 'created_at'], name='order_status_created'),
+            models.Index(fields=['user', 'created_at'], name='order_user_created'),
+        ]
 class OrderLine(models.Model):
     orderline_id = models.CharField(max_length=50, primary_key=True, unique=True,editable=False, blank=True, verbose_name = "Mã dòng đơn hàng")
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_lines',verbose_name = "Mã đơn hàng")
@@ -93,27 +160,138 @@ class OrderLine(models.Model):
     created_at = models.DateTimeField(auto_now_add=True,verbose_name = "Ngày tạo")
     updated_at = models.DateTimeField(auto_now=True,verbose_name = "Ngày cập nhật")
     status_review = models.IntegerField(choices=[(0, 'Not Reviewed'), (1, 'Reviewed')], default=0,verbose_name = "Trạng thái đánh giá")
+    # Ảnh chụp giá và tên tại thời điểm mua, để đọc đơn hàng/doanh thu không cần join sang sản phẩm
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name = "Đơn giá")
+    product_name = models.CharField(max_length=255, blank=True, default='', verbose_name = "Tên sản phẩm")
+    color_name = models.CharField(max_length=255, blank=True, default='', verbose_name = "Tên màu")
+    size_name = models.CharField(max_length=255, blank=True, default='', verbose_name = "Tên kích cỡ")
 
     def __str__(self):
         return f"{self.orderline_id} "
     
     def subtotal(self):
         """Calculate subtotal for the order line."""
-        return self.product.sell_price * self.quantity
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.order.update_total_price()
+        return self.unit_price * self.quantity
+
+    @staticmethod
+    def subtotal_expression():
+        return ExpressionWrapper(F('quantity') * F('unit_price'), output_field=SUBTOTAL_FIELD)
+
+    def snapshot_product(self):
+        """Lưu lại giá bán và tên sản phẩm/màu/kích cỡ hiện tại vào dòng đơn hàng."""
+        self.unit_price = self.product.sell_price
+        self.product_name = self.product.name
+        self.color_name = self.color.name if self.color_id else ''
+        self.size_name = self.size.name if self.size_id else ''
+
+    @classmethod
+    def total_for_order(cls, order):
+        """Subquery tổng tiền các dòng của một đơn hàng, dùng được với `OuterRef`."""
+        return cls.objects.filter(order=order).values('order').annotate(
+            total=Sum(cls.subtotal_expression())
+        ).values('total')
+
+    def _stored_subtotal(self):
+        """Đơn hàng và thành tiền của dòng này như đang lưu trong DB (None nếu chưa có)."""
+        return OrderLine.objects.filter(pk=self.pk).annotate(
+            line_total=self.subtotal_expression()
+        ).values_list('order_id', 'line_total').first()
+
     def save(self, *args, **kwargs):
         # Tự động sinh `orderline_id` nếu chưa có
         if not self.orderline_id:
-            self.orderline_id = f"OL{str(uuid4())[:8].upper()}"
-        super().save(*args, **kwargs)
-    # Gọi cập nhật tổng giá khi xóa
-    def delete(self, *args, **kwargs):
-        order = self.order  # Lưu lại tham chiếu đơn hàng
-        super().delete(*args, **kwargs)
-        order.update_total_price()
+            self.orderline_id = ids.next_id('OL')
+        if self._state.adding and not self.product_name:
+            self.snapshot_product()
+        from . import sales
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & {'order', 'product', 'quantity', 'unit_price'}:
+            # Không ảnh hưởng tới thành tiền hay doanh thu (ví dụ cập nhật `status_review`)
+            super().save(*args, **kwargs)
+            return
+        # Cập nhật tổng đơn hàng bằng phần chênh lệch, trong cùng transaction với dòng đơn hàng
+        with transaction.atomic():
+            previous = None if self._state.adding else self._stored_subtotal()
+            # Đơn đã giao (cũ và mới) được trừ khỏi bảng tổng hợp doanh thu rồi cộng lại với dòng đã đổi
+            delivered = list(Order.objects.filter(
+                pk__in={self.order_id, previous[0] if previous else self.order_id}, status='delivered',
+            ).values_list('pk', flat=True))
+            if delivered:
+                sales.apply_delivered_orders(delivered, sign=-1)
+            super().save(*args, **kwargs)
+            current = (self.order_id, self.subtotal())
+            if previous and previous[0] != current[0]:
+                Order.apply_total_delta(previous[0], -previous[1])
+                previous = None
+            Order.apply_total_delta(current[0], current[1] - (previous[1] if previous else 0))
+            if delivered:
+                sales.apply_delivered_orders(delivered, sign=1)
+
+    # Khi xóa, thành tiền của dòng được trừ khỏi tổng đơn hàng (và doanh thu nếu đơn đã giao) trong `cart.signals`
     class Meta:
         verbose_name = "Chi tiết đơn hàng"
-        verbose_name_plural = "Chi tiết đơn hàng"
\ No newline at end of file
+        verbose_name_plural = "Chi tiết đơn hàng"
+        indexes = [
+            models.Index(fields=['order', 'product'], name='orderline_order_product'),
+            models.Index(fields=['product', 'created_at'], name='orderline_product_created'),
+        ]
+
+
+class SalesRollup(models.Model):
+    """
+    Doanh thu của các đơn hàng đã giao, cộng dồn theo ngày/tháng tạo đơn.
+    `product_id`/`category_id` rỗng nghĩa là tổng của mọi sản phẩm/danh mục.
+    """
+    DAY = 'day'
+    MONTH = 'month'
+    PERIOD_CHOICES = [(DAY, 'Ngày'), (MONTH, 'Tháng')]
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES, verbose_name = "Kỳ")
+    period_start = models.DateField(verbose_name = "Ngày bắt đầu kỳ")
+    product_id = models.CharField(max_length=50, blank=True, default='', verbose_name = "Mã sản phẩm")
+    category_id = models.CharField(max_length=10, blank=True, default='', verbose_name = "Mã danh mục")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name = "Doanh thu")
+    orders = models.IntegerField(default=0, verbose_name = "Số đơn hàng")
+    units = models.IntegerField(default=0, verbose_name = "Số sản phẩm")
+
+    @property
+    def average_order_value(self):
+        return self.revenue / self.orders if self.orders else Decimal('0')
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.period_start} {self.product_id or '*'} {self.category_id or '*'}"
+
+    class Meta:
+        verbose_name = "Tổng hợp doanh thu"
+        verbose_name_plural = "Tổng hợp doanh thu"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'period_start', 'product_id', 'category_id'],
+                name='unique_sales_rollup_key'
+            )
+        ]
+
+
+class ProductSalesCounter(models.Model):
+    """
+    Số lượng bán và doanh thu của một sản phẩm trong một tháng (theo ngày tạo đơn),
+    cộng khi đặt hàng và trừ khi đơn bị hủy. Tên và ảnh được lưu sẵn để đọc bảng xếp hạng không cần join.
+    """
+    month = models.DateField(verbose_name = "Tháng")
+    product_id = models.CharField(max_length=50, verbose_name = "Mã sản phẩm")
+    product_name = models.CharField(max_length=255, blank=True, default='', verbose_name = "Tên sản phẩm")
+    image_url = models.CharField(max_length=255, blank=True, default='', verbose_name = "Ảnh")
+    units = models.IntegerField(default=0, verbose_name = "Số lượng đã bán")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name = "Doanh thu")
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.product_id}: {self.units}"
+
+    class Meta:
+        verbose_name = "Bộ đếm bán hàng"
+        verbose_name_plural = "Bộ đếm bán hàng"
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'product_id'], name='unique_sales_counter_month_product')
+        ]
+        indexes = [models.Index(fields=['month', '-units'], name='sales_counter_leaderboard')]
@@ -0,0 +1,181 @@
+"""
+Số liệu bán hàng được cộng dồn khi đơn hàng thay đổi, để các trang thống kê chỉ đọc vài dòng
+thay vì quét bảng đơn hàng:
+- `SalesRollup`: doanh thu của đơn hàng đã giao theo ngày/tháng tạo đơn, theo sản phẩm và danh mục.
+- `ProductSalesCounter`: số lượng bán theo tháng của từng sản phẩm (đơn chưa hủy), kèm bảng
+  xếp hạng top-N mỗi tháng giữ trong cache `LEADERBOARD_TTL` giây.
+
+Bảng tổng hợp được cập nhật khi đơn hàng chuyển vào/ra trạng thái "đã giao" (`Order.save`) và khi dòng của
+đơn đã giao được thêm, sửa, chuyển sang đơn khác hay xóa (`OrderLine.save`, `cart.signals`). Đổi trạng thái
+bằng `update()` trên queryset thì bỏ qua các bước này: chạy `backfill_sales_rollups` để dựng lại.
+
+Bộ đếm bán hàng được cộng sau khi transaction đặt hàng commit (`transaction.on_commit`), nên khóa dòng
+bộ đếm của sản phẩm bán chạy không nằm trong transaction checkout.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from products.models import Image, Product
+from .models import Order, OrderLine, ProductSalesCounter, SalesRollup
+
+UPDATE_CHUNK = 500
+ROLLUP_KEY = ('period', 'period_start', 'product_id', 'category_id')
+LEADERBOARD_SIZE = 8
+LEADERBOARD_FIELDS = ('product_id', 'product_name', 'image_url', 'units', 'revenue')
+LEADERBOARD_TTL = 60  # giây; bảng xếp hạng được tính lại khi hết hạn, không phải theo từng đơn hàng
+
+
+def period_starts(created_at):
+    day = timezone.localdate(created_at)
+    return [(SalesRollup.DAY, day), (SalesRollup.MONTH, day.replace(day=1))]
+
+
+def rollup_deltas(order_ids, sign=1):
+    """
+    Phần cộng thêm của các đơn hàng vào bảng tổng hợp:
+    {(period, period_start, product_id, category_id): [doanh thu, số đơn, số sản phẩm]}.
+    """
+    created = dict(Order.objects.filter(pk__in=order_ids).values_list('order_id', 'created_at'))
+    lines = defaultdict(list)
+    for line in (
+        OrderLine.objects.filter(order_id__in=created)
+        .values('order_id', 'product_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(OrderLine.subtotal_expression()))
+    ):
+        lines[line['order_id']].append(line)
+    categories = defaultdict(list)
+    for product_id, category_id in Product.category.through.objects.filter(
+        product_id__in={line['product_id'] for order_lines in lines.values() for line in order_lines}
+    ).values_list('product_id', 'category_id'):
+        categories[product_id].append(category_id)
+
+    deltas = defaultdict(lambda: [Decimal('0'), 0, 0])
+
+    def add(key, revenue, orders, units):
+        delta = deltas[key]
+        delta[0] += sign * revenue
+        delta[1] += sign * orders
+        delta[2] += sign * units
+
+    for order_id, created_at in created.items():
+        order_lines = lines.get(order_id, [])
+        by_category = defaultdict(lambda: [Decimal('0'), 0])
+        for line in order_lines:
+            for category_id in categories[line['product_id']]:
+                by_category[category_id][0] += line['revenue']
+                by_category[category_id][1] += line['units']
+        for period, start in period_starts(created_at):
+            add((period, start, '', ''), sum((line['revenue'] for line in order_lines), Decimal('0')), 1,
+                sum(line['units'] for line in order_lines))
+            for line in order_lines:
+                add((period, start, line['product_id'], ''), line['revenue'], 1, line['units'])
+            for category_id, (revenue, units) in by_category.items():
+                add((period, start, '', category_id), revenue, 1, units)
+    return deltas
+
+
+def _increment(model, key_fields, value_fields, deltas, defaults=None):
+    """
+    Cộng dồn {khóa: [giá trị...]} vào `model` bằng UPDATE nguyên tử: tạo trước các dòng còn thiếu
+    (`defaults` cho các cột khác theo khóa), rồi một câu UPDATE có CASE cho mỗi lô khóa.
+    """
+    deltas = {key: value for key, value in deltas.items() if any(value)}
+    keys = list(deltas)
+    with transaction.atomic():
+        for offset in range(0, len(keys), UPDATE_CHUNK):
+            chunk = keys[offset:offset + UPDATE_CHUNK]
+            model.objects.bulk_create([
+                model(**dict(zip(key_fields, key)), **(defaults or {}).get(key, {})) for key in chunk
+            ], ignore_conflicts=True)
+            # Lọc rộng theo từng cột rồi khớp khóa trong Python, tránh một chuỗi OR rất dài
+            candidates = model.objects.filter(**{
+                f'{field}__in': {key[index] for key in chunk} for index, field in enumerate(key_fields)
+            }).values_list('pk', *key_fields)
+            ids = {tuple(row[1:]): row[0] for row in candidates}
+            rows = [(ids[key], deltas[key]) for key in chunk]
+            model.objects.filter(pk__in=[pk for pk, _ in rows]).update(**{
+                field: F(field) + Case(*[When(pk=pk, then=Value(delta[index])) for pk, delta in rows])
+                for index, field in enumerate(value_fields)
+            })
+
+
+def apply_deltas(deltas):
+    """Cộng các phần thay đổi vào bảng tổng hợp doanh thu."""
+    _increment(SalesRollup, ROLLUP_KEY, ('revenue', 'orders', 'units'), deltas)
+
+
+def apply_delivered_orders(order_ids, sign=1):
+    """Cộng (`sign=1`) hoặc trừ (`sign=-1`) các đơn hàng đã giao vào bảng tổng hợp."""
+    apply_deltas(rollup_deltas(order_ids, sign))
+
+
+def counter_deltas(order_ids, sign=1):
+    """
+    Phần cộng thêm của các đơn hàng vào bộ đếm bán hàng: {(tháng, product_id): [số lượng, doanh thu]}
+    và giá trị các cột khác cho dòng bộ đếm mới tạo (tên, ảnh sản phẩm).
+    """
+    first_image = Image.objects.filter(product=OuterRef('product_id')).values('url')[:1]
+    lines = (
+        OrderLine.objects.filter(order_id__in=order_ids)
+        .values('order__created_at', 'product_id')
+        .annotate(units=Sum('quantity'), revenue=Sum(OrderLine.subtotal_expression()), name=Max('product_name'))
+    )
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    names = {}
+    for line in lines:
+        key = (timezone.localdate(line['order__created_at']).replace(day=1), line['product_id'])
+        deltas[key][0] += sign * line['units']
+        deltas[key][1] += sign * line['revenue']
+        names[line['product_id']] = line['name']
+    if not deltas:
+        return {}, {}
+    # Ảnh chỉ cần cho các dòng bộ đếm mới tạo: một truy vấn cho cả đơn hàng
+    images = dict(
+        Product.objects.filter(pk__in=names).annotate(image=Subquery(first_image)).values_list('pk', 'image')
+    )
+    defaults = {
+        key: {'product_name': names[key[1]], 'image_url': images.get(key[1]) or ''} for key in deltas
+    }
+    return dict(deltas), defaults
+
+
+def apply_counter_deltas(deltas, defaults):
+    """Cộng các phần thay đổi vào bộ đếm bán hàng."""
+    _increment(ProductSalesCounter, ('month', 'product_id'), ('units', 'revenue'), deltas, defaults)
+
+
+def count_orders(order_ids, sign=1):
+    """
+    Cộng (`sign=1`, khi đặt hàng) hoặc trừ (`sign=-1`, khi hủy/xóa) các đơn hàng vào bộ đếm bán hàng.
+    Phần thay đổi được tính ngay (dòng đơn hàng còn đó), còn việc cộng vào bộ đếm chạy sau khi
+    transaction hiện tại commit, trong một transaction ngắn riêng.
+    """
+    deltas, defaults = counter_deltas(order_ids, sign)
+    if deltas:
+        transaction.on_commit(lambda: apply_counter_deltas(deltas, defaults))
+
+
+def _leaderboard_key(month):
+    return f"sales-leaderboard:{month:%Y-%m}"
+
+
+def refresh_leaderboard(month):
+    """Tính lại top-N của tháng từ bộ đếm (range scan trên index (month, -units)) và lưu vào cache `LEADERBOARD_TTL` giây."""
+    leaderboard = list(
+        ProductSalesCounter.objects.filter(month=month, units__gt=0)
+        .order_by('-units', 'product_id')
+        .values(*LEADERBOARD_FIELDS)[:LEADERBOARD_SIZE]
+    )
+    cache.set(_leaderboard_key(month), leaderboard, timeout=LEADERBOARD_TTL)
+    return leaderboard
+
+
+def leaderboard(month):
+    """Top-N sản phẩm bán chạy của tháng (`month` là ngày đầu tháng)."""
+    cached = cache.get(_leaderboard_key(month))
+    return cached if cached is not None else refresh_leaderboard(month)
@@ -1,8 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Cart, CartDetail, Order, OrderLine
 from products.models import Product, Color, Size
+from shop_vivu.metrics import TimedSerializerMixin
 
-class CartDetailSerializer(serializers.ModelSerializer):
+class CartDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source='product.name')
     product_sell_price = serializers.ReadOnlyField(source='product.sell_price')
     color_name = serializers.ReadOnlyField(source='color.name')
@@ -32,7 +34,7 @@ class CartDetailSerializer(serializers.ModelSerializer):
         return None
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = CartDetailSerializer(source='cart_details', many=True)
     total = serializers.SerializerMethodField()
 
@@ -48,11 +50,9 @@ class CartSerializer(serializers.ModelSerializer):
             detail.quantity * detail.product.sell_price for detail in obj.cart_details.all()
         )
 
-class OrderLineSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name')
-    product_sell_price = serializers.DecimalField(source='product.sell_price', max_digits=10, decimal_places=2)
-    color_name = serializers.CharField(source='color.name')  # Thêm trường color_name
-    size_name = serializers.CharField(source='size.name')    # Thêm trường size_name
+class OrderLineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Đọc từ ảnh chụp lưu trên dòng đơn hàng, không join sang sản phẩm/màu/kích cỡ
+    product_sell_price = serializers.DecimalField(source='unit_price', max_digits=10, decimal_places=2)
 
     class Meta:
         model = OrderLine
@@ -60,10 +60,29 @@ class OrderLineSerializer(serializers.ModelSerializer):
     
     
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     order_lines = OrderLineSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     class Meta:
         model = Order
         fields = ['order_id', 'user', 'status_display', 'total_price', 'payment_method','note', 'created_at', 'updated_at', 'order_lines']
 
+
+class OrderSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Dạng rút gọn của đơn hàng cho lịch sử mua hàng.
+    `item_count` và `first_image_url` được tính sẵn bằng SQL trong view.
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    first_image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = ['order_id', 'status', 'status_display', 'total_price', 'created_at', 'item_count', 'first_image_url']
+
+    def get_first_image_url(self, obj):
+        if obj.first_image:
+            return settings.MEDIA_URL + obj.first_image
+        return None
+
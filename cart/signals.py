@@ -1,12 +1,65 @@
-# from django.db.models.signals import post_save, post_delete
-# from django.dispatch import receiver
-# from .models import Order, OrderLine
-
-# @receiver(post_save, sender=OrderLine)
-# @receiver(post_delete, sender=OrderLine)
-# def update_order_total(sender, instance, **kwargs):
-#     order = instance.order
-#     # Tính tổng tiền từ tất cả các OrderLine thuộc Order
-#     total_price = sum(line.quantity * line.price for line in order.order_lines.all())
-#     order.total_price = total_price
-#     order.save()
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from user.models import User
+from . import sales
+from .models import Order, OrderLine
+
+
+def _deletes_orders(origin):
+    """Lệnh xóa bắt đầu từ đơn hàng hoặc khách hàng: các đơn hàng bị xóa cùng với dòng của chúng."""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, (Order, User))
+
+
+def _delivered_orders(origin):
+    """
+    {mã đơn hàng: đã giao?} của một lệnh xóa, gắn vào `origin` (instance hoặc queryset bị xóa): mọi tín hiệu
+    `pre_delete` của lệnh xóa chạy trước khi xóa, mọi `post_delete` chạy sau, nên mỗi đơn chỉ được trừ/cộng một lần.
+    """
+    return origin.__dict__.setdefault('_delivered_orders', {})
+
+
+@receiver(pre_delete, sender=Order)
+def reverse_order_sales(sender, instance, **kwargs):
+    """
+    Trừ đơn hàng bị xóa khỏi bảng tổng hợp doanh thu và bộ đếm bán hàng. Dùng tín hiệu thay vì
+    `Order.delete` để chạy cả khi xóa hàng loạt (admin "xóa các mục đã chọn", xóa khách hàng kéo
+    theo đơn hàng). Chạy trước khi các dòng đơn hàng bị xóa, trong transaction của lệnh xóa.
+    """
+    stored_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    if stored_status == 'delivered':
+        sales.apply_delivered_orders([instance.pk], sign=-1)
+    if stored_status not in (None, 'cancelled'):
+        sales.count_orders([instance.pk], sign=-1)
+
+
+@receiver(pre_delete, sender=OrderLine)
+def subtract_order_line(sender, instance, origin=None, **kwargs):
+    """
+    Trừ thành tiền của dòng bị xóa khỏi tổng đơn hàng (và doanh thu nếu đơn đã giao), cả khi xóa hàng loạt
+    (`OrderLine.objects.filter(...).delete()`, admin "xóa các mục đã chọn", xóa sản phẩm/màu/kích cỡ kéo theo
+    dòng đơn hàng). Bỏ qua khi đơn hàng bị xóa cùng: `reverse_order_sales` đã trừ cả đơn.
+    """
+    if _deletes_orders(origin):
+        return
+    stored = instance._stored_subtotal()
+    if stored:
+        Order.apply_total_delta(stored[0], -stored[1])
+    delivered = _delivered_orders(origin)
+    if instance.order_id not in delivered:
+        delivered[instance.order_id] = Order.objects.filter(pk=instance.order_id, status='delivered').exists()
+        # Trừ cả đơn đã giao khỏi bảng tổng hợp khi còn đủ dòng; `restore_order_rollup` cộng lại phần còn lại
+        if delivered[instance.order_id]:
+            sales.apply_delivered_orders([instance.order_id], sign=-1)
+
+
+@receiver(post_delete, sender=OrderLine)
+def restore_order_rollup(sender, instance, origin=None, **kwargs):
+    if _deletes_orders(origin):
+        return
+    if _delivered_orders(origin).pop(instance.order_id, False):
+        sales.apply_delivered_orders([instance.order_id], sign=1)
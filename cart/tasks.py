@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.db import transaction
+from .models import Order
+
+
+@shared_task
+def apply_vnpay_result(data):
+    """
+    Áp dụng kết quả thanh toán VNPAY (đã xác thực chữ ký) cho đơn hàng.
+    Idempotent theo `vnp_TransactionNo`: callback lặp lại hoặc chạy đồng thời
+    được tuần tự hóa bằng khóa dòng trên đơn hàng và chỉ có tác dụng một lần.
+    """
+    order_id = data.get('vnp_TxnRef')
+    transaction_no = data.get('vnp_TransactionNo', '')
+
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(order_id=order_id).first()
+        if order is None:
+            # Đơn hàng đã bị hủy bởi một callback thất bại trước đó
+            return f"Order {order_id} không còn tồn tại"
+        if order.vnp_TransactionNo:
+            return f"Order {order_id} đã được cập nhật với giao dịch {order.vnp_TransactionNo}"
+
+        if data.get('vnp_ResponseCode') == '00':
+            Order.objects.filter(pk=order.pk).update(
+                vnp_BankCode=data.get('vnp_BankCode', ''),
+                vnp_BankTranNo=data.get('vnp_BankTranNo', ''),
+                vnp_CardType=data.get('vnp_CardType', ''),
+                vnp_ResponseCode=data.get('vnp_ResponseCode', ''),
+                vnp_TransactionNo=transaction_no,
+                vnp_TransactionStatus=data.get('vnp_TransactionStatus', ''),
+                payment_method='bank_transfer',
+            )
+            return f"Order {order_id} thanh toán thành công"
+
+        # Thanh toán thất bại: hoàn trả tồn kho rồi xóa đơn hàng
+        order.release_stock()
+        order.delete()
+        return f"Order {order_id} thanh toán thất bại, đã hoàn trả tồn kho"
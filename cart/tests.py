@@ -1,3 +1,386 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import count
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from products import inventory
+from products.models import Color, Product, Size, StockQuantity
+from products.vnpay import VNPay
+from products.tests import ChangelistQueryCountMixin, QueryPlanMixin
+from user.models import User
+
+from . import sales
+from .models import Order, OrderLine, ProductSalesCounter, SalesRollup
+from .tasks import apply_vnpay_result
+from .views import OrderCursorPagination, acknowledge_vnpay_result, order_detail_queryset, order_summary_queryset
+
+
+class CartQueryPlanTests(QueryPlanMixin, TestCase):
+    # Lịch sử đơn hàng như OrderListView chạy: queryset của view + thứ tự của phân trang con trỏ
+    ordering = OrderCursorPagination.ordering
+
+    def test_order_history(self):
+        self.assertNoFullScan(order_detail_queryset('KH0001').order_by(*self.ordering)[:10])
+
+    def test_order_history_summary(self):
+        self.assertNoFullScan(order_summary_queryset('KH0001').order_by(*self.ordering)[:10])
+
+    def test_order_detail(self):
+        self.assertNoFullScan(order_detail_queryset('KH0001').filter(order_id='OD1'))
+
+
+class OrderHistoryPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='khach@shop.vn', full_name='Khách', password='x')
+        self.header = f'Token {Token.objects.create(user=self.user).key}'
+        color = Color.objects.create(color_id='C1', name='Đỏ')
+        size = Size.objects.create(size_id='S1', name='M')
+        product = Product.objects.create(product_id='P1', name='Áo', import_price=Decimal('50'), sell_price=Decimal('100'))
+        created_at = timezone.now()
+        for n in range(12):
+            order = Order.objects.create(
+                order_id=f'OD{n:02}', user=self.user, status='pending', payment_method='cash_on_delivery',
+            )
+            for line in range(2):
+                OrderLine.objects.create(
+                    orderline_id=f'OL{n:02}-{line}', order=order, product=product, color=color, size=size, quantity=1,
+                )
+            # Từng cặp đơn có cùng thời điểm tạo
+            Order.objects.filter(pk=order.pk).update(created_at=created_at - timedelta(minutes=n // 2))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params, HTTP_AUTHORIZATION=self.header)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_per_page(self):
+        url = reverse('order-list')
+        self.get(url)  # làm nóng cache xác thực
+        # Tóm tắt: một truy vấn; đầy đủ: đơn hàng + các dòng (prefetch). Không có COUNT(*), không tăng theo cỡ trang
+        for mode, expected in (('summary', 1), ('full', 2)):
+            for page_size in (2, 5):
+                with self.subTest(mode=mode, page_size=page_size), self.assertNumQueries(expected):
+                    page = self.get(url, mode=mode, page_size=page_size)
+                self.assertEqual(len(page['results']), page_size)
+                if mode == 'full':
+                    self.assertEqual(len(page['results'][0]['order_lines']), 2)
+
+    def test_next_cursor_resumes_across_equal_created_at(self):
+        url, seen = f"{reverse('order-list')}?mode=summary&page_size=3", []
+        while url:
+            page = self.client.get(url, HTTP_AUTHORIZATION=self.header).json()
+            seen += [order['order_id'] for order in page['results']]
+            url = page['next']
+        self.assertEqual(seen, [f'OD{n:02}' for n in (1, 0, 3, 2, 5, 4, 7, 6, 9, 8, 11, 10)])
+
+
+class CartAdminChangelistTests(ChangelistQueryCountMixin, TestCase):
+    order_sequence = count(1)
+
+    def make_order(self):
+        return Order.objects.create(order_id=f'OD{next(self.order_sequence)}', user=self.admin)
+
+    def test_order_changelist(self):
+        def add_rows(n):
+            for _ in range(n):
+                self.make_order()
+        self.assertChangelistQueriesConstant(Order, add_rows)
+
+    def test_order_line_changelist(self):
+        def add_rows(n):
+            for _ in range(n):
+                OrderLine.objects.create(
+                    order=self.make_order(), product=self.make_product(), color=self.color, size=self.size, quantity=1,
+                )
+        self.assertChangelistQueriesConstant(OrderLine, add_rows)
+
+
+class SalesFixtureMixin:
+    order_sequence = count(1)
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='khach@shop.vn', full_name='Khách', password='x')
+        self.color = Color.objects.create(color_id='C1', name='Đỏ')
+        self.size = Size.objects.create(size_id='S1', name='M')
+        self.product = Product.objects.create(
+            product_id='P1', name='Áo', import_price=Decimal('50'), sell_price=Decimal('100'),
+        )
+
+    def make_order(self, quantity=2, status='pending'):
+        order = Order.objects.create(
+            order_id=f'OD{next(self.order_sequence)}', user=self.user, status='pending', payment_method='cash_on_delivery',
+        )
+        OrderLine.objects.create(
+            orderline_id=f'OL-{order.order_id}', order=order, product=self.product, color=self.color, size=self.size,
+            quantity=quantity,
+        )
+        if status != 'pending':
+            order.status = status
+            order.save()
+        return order
+
+    def units_sold(self):
+        return sum(ProductSalesCounter.objects.values_list('units', flat=True))
+
+    def monthly_revenue(self):
+        return sum(SalesRollup.objects.filter(period=SalesRollup.MONTH, product_id='', category_id='')
+                   .values_list('revenue', flat=True))
+
+
+class SalesCounterTests(SalesFixtureMixin, TestCase):
+    def test_counters_are_updated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                order = self.make_order()
+                sales.count_orders([order.pk])
+            self.assertEqual(self.units_sold(), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.units_sold(), 2)
+
+    def test_queryset_delete_reverses_sales(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.make_order(status='delivered')
+            sales.count_orders([order.pk])
+        self.assertEqual(self.monthly_revenue(), Decimal('200'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(pk=order.pk).delete()
+        self.assertEqual(self.units_sold(), 0)
+        self.assertEqual(self.monthly_revenue(), 0)
+
+    def test_deleting_customer_reverses_sales(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sales.count_orders([self.make_order(quantity=3).pk])
+        self.assertEqual(self.units_sold(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.units_sold(), 0)
+
+    def test_cancelled_order_is_not_reversed_twice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.make_order()
+            sales.count_orders([order.pk])
+            order.status = 'cancelled'
+            order.save()
+        self.assertEqual(self.units_sold(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.units_sold(), 0)
+
+    def test_rebuild_replaces_counters_and_leaderboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.make_order(quantity=4)
+            sales.count_orders([order.pk])
+        month = timezone.localdate(order.created_at).replace(day=1)
+        ProductSalesCounter.objects.update(units=99)
+        cache.delete(f"sales-leaderboard:{month:%Y-%m}")
+        sales.refresh_leaderboard(month)
+
+        call_command('rebuild_sales_counters', stdout=StringIO())
+        self.assertEqual(self.units_sold(), 4)
+        self.assertEqual([row['units'] for row in sales.leaderboard(month)], [4])
+
+
+class BackfillSalesRollupsTests(SalesFixtureMixin, TestCase):
+    def test_backfill_replaces_rollups(self):
+        self.make_order(quantity=1, status='delivered')
+        self.make_order(quantity=2, status='delivered')
+        self.make_order(quantity=5)
+        SalesRollup.objects.update(revenue=Decimal('1'))
+
+        call_command('backfill_sales_rollups', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(self.monthly_revenue(), Decimal('300'))
+
+    def test_failed_backfill_keeps_old_rollups(self):
+        self.make_order(status='delivered')
+        with mock.patch.object(sales, 'apply_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.monthly_revenue(), Decimal('200'))
+
+
+class DeliveredOrderLineRollupTests(SalesFixtureMixin, TestCase):
+    def assertRollupsRebuildTheSame(self):
+        rows = lambda: {
+            row[:4]: row[4:] for row in SalesRollup.objects.exclude(orders=0, units=0, revenue=0)
+            .values_list(*sales.ROLLUP_KEY, 'revenue', 'orders', 'units')
+        }
+        maintained = rows()
+        call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(maintained, rows())
+
+    def test_line_edited_on_delivered_order(self):
+        order = self.make_order(quantity=2, status='delivered')
+        line = order.order_lines.get()
+        line.quantity = 5
+        line.save()
+        self.assertEqual(self.monthly_revenue(), Decimal('500'))
+        self.assertRollupsRebuildTheSame()
+
+    def test_line_added_to_delivered_order(self):
+        order = self.make_order(quantity=2, status='delivered')
+        OrderLine.objects.create(
+            orderline_id='OL-2', order=order, product=self.product, color=self.color, size=self.size, quantity=1,
+        )
+        self.assertEqual(self.monthly_revenue(), Decimal('300'))
+        self.assertRollupsRebuildTheSame()
+
+    def test_lines_deleted_from_delivered_order(self):
+        order = self.make_order(quantity=2, status='delivered')
+        for index in (2, 3):
+            OrderLine.objects.create(
+                orderline_id=f'OL-{index}', order=order, product=self.product, color=self.color, size=self.size,
+                quantity=1,
+            )
+        OrderLine.objects.filter(pk__in=['OL-2', 'OL-3']).delete()
+        self.assertEqual(self.monthly_revenue(), Decimal('200'))
+        self.assertRollupsRebuildTheSame()
+
+    def test_line_moved_out_of_delivered_order(self):
+        order, pending = self.make_order(quantity=2, status='delivered'), self.make_order(quantity=1)
+        line = order.order_lines.get()
+        line.order = pending
+        line.save()
+        self.assertEqual(self.monthly_revenue(), Decimal('0'))
+        self.assertRollupsRebuildTheSame()
+
+
+class VnpayResultTests(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.stock = StockQuantity.objects.create(product=self.product, color=self.color, size=self.size, stock=10)
+        self.order = self.make_order(quantity=2)
+        inventory.sell(self.stock.pk, 2, self.order.order_id)
+        self.order.refresh_from_db()
+        cache.clear()
+
+    def ipn_data(self, response_code='00', transaction_no='9001'):
+        data = {
+            'vnp_TxnRef': self.order.order_id, 'vnp_Amount': str(int(self.order.total_price * 100)),
+            'vnp_ResponseCode': response_code, 'vnp_TransactionNo': transaction_no, 'vnp_BankCode': 'NCB',
+        }
+        signed = VNPay(data).get_payment_url('', settings.VNPAY_HASH_SECRET)
+        return {**data, 'vnp_SecureHash': signed.rsplit('vnp_SecureHash=', 1)[1]}
+
+    def test_bad_signature_is_rejected(self):
+        data = {**self.ipn_data(), 'vnp_Amount': '1'}
+        with mock.patch.object(apply_vnpay_result, 'delay') as delay:
+            self.assertEqual(acknowledge_vnpay_result(data), ('97', 'Invalid Signature'))
+        delay.assert_not_called()
+
+    def test_duplicate_callback_is_queued_once(self):
+        with mock.patch.object(apply_vnpay_result, 'delay') as delay:
+            self.assertEqual(acknowledge_vnpay_result(self.ipn_data())[0], '00')
+            self.assertEqual(acknowledge_vnpay_result(self.ipn_data())[0], '00')
+        delay.assert_called_once()
+
+    def test_failed_enqueue_allows_retry(self):
+        with mock.patch.object(apply_vnpay_result, 'delay', side_effect=ConnectionError), \
+                self.assertLogs('cart.views', 'ERROR'):
+            self.assertEqual(acknowledge_vnpay_result(self.ipn_data())[0], '99')
+        with mock.patch.object(apply_vnpay_result, 'delay') as delay:
+            self.assertEqual(acknowledge_vnpay_result(self.ipn_data())[0], '00')
+        delay.assert_called_once()
+
+    def test_task_applies_transaction_once(self):
+        data = self.ipn_data()
+        apply_vnpay_result(data)
+        self.assertIn('đã được cập nhật', apply_vnpay_result({**data, 'vnp_TransactionNo': '9002'}))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.vnp_TransactionNo, self.order.payment_method), ('9001', 'bank_transfer'))
+
+    def test_failed_payment_releases_stock_once(self):
+        data = self.ipn_data(response_code='24', transaction_no='')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_vnpay_result(data)
+            apply_vnpay_result(data)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.stock, 10)
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+
+
+class OrderTotalTests(SalesFixtureMixin, TestCase):
+    def total(self, order):
+        return Order.objects.values_list('total_price', flat=True).get(pk=order.pk)
+
+    def test_line_add_change_and_delete(self):
+        order = self.make_order(quantity=2)
+        self.assertEqual(self.total(order), Decimal('200'))
+        line = OrderLine.objects.create(
+            orderline_id='OL-2', order=order, product=self.product, color=self.color, size=self.size, quantity=1,
+        )
+        self.assertEqual(self.total(order), Decimal('300'))
+        line.quantity = 4
+        line.save()
+        self.assertEqual(self.total(order), Decimal('600'))
+        line.delete()
+        self.assertEqual(self.total(order), Decimal('200'))
+
+    def test_queryset_delete_subtracts_lines(self):
+        order = self.make_order(quantity=2)
+        OrderLine.objects.create(
+            orderline_id='OL-2', order=order, product=self.product, color=self.color, size=self.size, quantity=1,
+        )
+        OrderLine.objects.create(
+            orderline_id='OL-3', order=order, product=self.product, color=self.color, size=self.size, quantity=3,
+        )
+        OrderLine.objects.filter(pk__in=['OL-2', 'OL-3']).delete()
+        self.assertEqual(self.total(order), Decimal('200'))
+
+    def test_cascade_from_size_subtracts_lines(self):
+        order = self.make_order(quantity=2)
+        other_size = Size.objects.create(size_id='S2', name='XL')
+        OrderLine.objects.create(
+            orderline_id='OL-2', order=order, product=self.product, color=self.color, size=other_size, quantity=1,
+        )
+        other_size.delete()
+        self.assertEqual(self.total(order), Decimal('200'))
+
+    def test_line_moved_to_another_order(self):
+        order, other = self.make_order(quantity=2), self.make_order(quantity=1)
+        line = order.order_lines.get()
+        line.order = other
+        line.save()
+        self.assertEqual((self.total(order), self.total(other)), (Decimal('0'), Decimal('300')))
+
+    def test_saving_stale_order_keeps_total(self):
+        order = Order.objects.get(pk=self.make_order(quantity=2).pk)
+        OrderLine.objects.create(
+            orderline_id='OL-2', order=order, product=self.product, color=self.color, size=self.size, quantity=1,
+        )
+        # `order` vẫn giữ tổng 200 trong bộ nhớ
+        order.note = 'Giao giờ hành chính'
+        order.save()
+        order.status = 'confirmed'
+        order.save(update_fields=['status'])
+        self.assertEqual(self.total(order), Decimal('300'))
+
+    def test_review_flag_does_not_touch_total(self):
+        order = self.make_order(quantity=2)
+        line = order.order_lines.get()
+        Order.objects.filter(pk=order.pk).update(total_price=Decimal('1'))
+        line.status_review = 1
+        line.save(update_fields=['status_review'])
+        self.assertEqual(self.total(order), Decimal('1'))
 
-# Create your tests here.
+    def test_reconcile_fixes_drift(self):
+        order, correct = self.make_order(quantity=2), self.make_order(quantity=1)
+        Order.objects.filter(pk=order.pk).update(total_price=Decimal('5'))
+        out = StringIO()
+        call_command('reconcile_order_totals', '--dry-run', stdout=out)
+        self.assertIn('cần sửa 1', out.getvalue())
+        self.assertEqual(self.total(order), Decimal('5'))
+        call_command('reconcile_order_totals', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual((self.total(order), self.total(correct)), (Decimal('200'), Decimal('100')))
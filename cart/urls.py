@@ -2,7 +2,7 @@
 from django.urls import path
 
 from . import views
-from .views import CreateOrderAPIView, OrderDetailView, OrderListView, VnpayReturn
+from .views import CreateOrderAPIView, OrderDetailView, OrderListView, VnpayIPN, VnpayReturn
 
 urlpatterns = [
     path('view/', views.view_cart, name='view_cart'),
@@ -13,4 +13,5 @@ urlpatterns = [
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('detail_orders/', OrderDetailView.as_view(), name='order-detail'),
     path('vnpay/',VnpayReturn.as_view(), name='vnpay-return'),
+    path('vnpay/ipn/', VnpayIPN.as_view(), name='vnpay-ipn'),
 ]
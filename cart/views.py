@@ -1,5 +1,6 @@
 
 import json
+import logging
 
 import urllib
 from products import vnpay
@@ -11,18 +12,29 @@ import hmac
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from shop_vivu import settings
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.pagination import CursorPagination
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.core.cache import cache
+from shop_vivu import ids, settings
 from .models import Cart, CartDetail
 from .serializers import CartSerializer, CartDetailSerializer, OrderLineSerializer
 from django.db import transaction
 from .models import Order, OrderLine
-from products.models import Color, Product, Size, StockQuantity
-from .serializers import OrderSerializer
+from products import inventory
+from products.availability import availability_map
+from products.models import Color, Image, Product, Size, StockQuantity
+from .serializers import OrderSerializer, OrderSummarySerializer
+from .tasks import apply_vnpay_result
+from . import sales
 from rest_framework.views import APIView
-from uuid import uuid4
 from django.db import transaction
 
+logger = logging.getLogger(__name__)
+
+VNPAY_DEDUPE_TIMEOUT = 10 * 60  # giây
+
 
 def get_user_cart(user):
     """
@@ -76,10 +88,9 @@ def add_product_to_cart(request):
     if quantity <= 0:
         return Response({"detail": "Quantity must be greater than 0."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Lấy sản phẩm tồn kho theo màu sắc và kích thước
-    try:
-        stock_entry = StockQuantity.objects.get(product_id=product_id, color_id=color_id, size_id=size_id)
-    except StockQuantity.DoesNotExist:
+    # Lấy tồn kho theo màu sắc và kích thước từ bảng trong bộ nhớ; checkout mới kiểm tra chính xác
+    available_stock = availability_map.get(product_id, color_id, size_id)
+    if available_stock is None:
         return Response({"detail": "Stock for the specified product, color, and size does not exist."},
                         status=status.HTTP_404_NOT_FOUND)
 
@@ -93,11 +104,11 @@ def add_product_to_cart(request):
     new_quantity = current_quantity_in_cart + quantity
 
     # Kiểm tra số lượng tồn kho
-    if new_quantity > stock_entry.stock:
+    if new_quantity > available_stock:
         return Response(
             {
                 "detail": f"Cannot add {quantity} items to the cart. "
-                          f"Only {stock_entry.stock - current_quantity_in_cart} items are available in stock."
+                          f"Only {available_stock - current_quantity_in_cart} items are available in stock."
             },
             status=status.HTTP_400_BAD_REQUEST
         )
@@ -224,11 +235,11 @@ class CreateOrderAPIView(APIView):
                 user.full_name = full_name
                 user.phone = phone
                 user.address = address
-                user.save()
+                user.save(update_fields=['full_name', 'phone', 'address', 'updated_at'])
 
                 # Tạo đơn hàng
                 order = Order.objects.create(
-                    order_id=f"OD{str(uuid4())[:8].upper()}",  # Tạo mã đơn hàng duy nhất
+                    order_id=ids.next_id('OD'),  # Tạo mã đơn hàng duy nhất
                     user=user,
                     status="pending",  # Trạng thái ban đầu là "pending"
                     total_price=0,
@@ -237,7 +248,6 @@ class CreateOrderAPIView(APIView):
 
                 total_price = 0
                 order_lines_data = []  # Thông tin chi tiết từng dòng sản phẩm
-                stock_updates = []  # Lưu trữ các cập nhật tồn kho để rollback nếu cần
                 errors = []  # Thu thập lỗi nếu có
 
                 # Duyệt qua từng sản phẩm được chọn
@@ -252,20 +262,19 @@ class CreateOrderAPIView(APIView):
                         product = Product.objects.get(product_id=product_id)
                         color = product.color.get(color_id=color_id)
                         size = product.size.get(size_id=size_id)
-                        stock = StockQuantity.objects.get(product=product, color=color, size=size)
+                        stock_id, shard_count = StockQuantity.objects.filter(
+                            product=product, color=color, size=size
+                        ).values_list('id', 'shard_count').get()
 
-                        # Kiểm tra tồn kho
-                        if stock.stock < quantity:
+                        # Trừ tồn kho có điều kiện ngay trong câu UPDATE và ghi sổ kho
+                        try:
+                            inventory.sell(stock_id, quantity, order.order_id, shard_count=shard_count)
+                        except inventory.InsufficientStock:
                             errors.append(
                                 f"Not enough stock for product '{product.name}', color '{color.name}', size '{size.name}'."
                             )
                             continue
 
-                        # Cập nhật tồn kho
-                        stock.stock -= quantity
-                        stock_updates.append((stock, quantity))  # Lưu thông tin để rollback nếu cần
-                        stock.save()
-
                         # Tính tổng giá
                         subtotal = product.sell_price * quantity
                         total_price += subtotal
@@ -277,7 +286,11 @@ class CreateOrderAPIView(APIView):
                             color=color,
                             size=size,
                             quantity=quantity,
-                            orderline_id=f"OL{str(uuid4())[:8].upper()}",
+                            orderline_id=ids.next_id('OL'),
+                            unit_price=product.sell_price,
+                            product_name=product.name,
+                            color_name=color.name,
+                            size_name=size.name,
                         )
 
                         # Lưu thông tin chi tiết
@@ -301,20 +314,19 @@ class CreateOrderAPIView(APIView):
                 if errors:
                     raise Exception(", ".join(errors))
 
-                # Cập nhật tổng giá trị đơn hàng
+                # Cộng vào bộ đếm bán hàng của tháng (bảng xếp hạng bán chạy) sau khi đơn hàng commit
+                sales.count_orders([order.order_id])
+
+                # Tổng giá trị đơn hàng đã được cộng dồn trong DB khi tạo từng dòng đơn hàng
                 order.total_price = total_price
-                order.save()
 
                 # Nếu thanh toán qua VNPAY
                 if payment_method == "vnpay":
                     vnpay_url = self.initiate_vnpay_payment(order)
 
-                    # Nếu không tạo được URL thanh toán, rollback tất cả thay đổi
+                    # Nếu không tạo được URL thanh toán, rollback tất cả thay đổi (tồn kho, sổ kho, đơn hàng)
                     if not vnpay_url:
-                        for stock, qty in stock_updates:
-                            stock.stock += qty  # Hoàn trả tồn kho
-                            stock.save()
-                        order.delete()  # Xóa đơn hàng
+                        transaction.set_rollback(True)
                         return Response({"error": "Failed to initiate VNPAY payment."}, status=status.HTTP_400_BAD_REQUEST)
 
                     return Response({"redirect_url": vnpay_url}, status=status.HTTP_302_FOUND)
@@ -338,153 +350,118 @@ class CreateOrderAPIView(APIView):
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+def acknowledge_vnpay_result(data):
+    """
+    Kiểm tra nhanh kết quả thanh toán VNPAY rồi đẩy việc cập nhật đơn hàng/tồn kho sang Celery.
+    Trả về (RspCode, Message) theo quy ước của VNPAY.
+    """
+    if not data or 'vnp_TxnRef' not in data or 'vnp_SecureHash' not in data:
+        return '99', 'Invalid request'
+
+    vnp = VNPay(data)
+    vnp.responseData = dict(data)
+    if not vnp.validate_response(settings.VNPAY_HASH_SECRET):
+        return '97', 'Invalid Signature'
+
+    order = Order.objects.filter(order_id=data['vnp_TxnRef']).only('total_price', 'vnp_TransactionNo').first()
+    if order is None:
+        return '01', 'Order not found'
+    if order.vnp_TransactionNo:
+        return '02', 'Order Already Update'
+    if int(data.get('vnp_Amount', 0)) != int(order.total_price * 100):
+        return '04', 'invalid amount'
+
+    # Bỏ qua callback trùng lặp trong lúc tác vụ trước còn đang chờ xử lý
+    dedupe_key = f"vnpay:{data['vnp_TxnRef']}:{data.get('vnp_TransactionNo', '')}"
+    if cache.add(dedupe_key, 1, timeout=VNPAY_DEDUPE_TIMEOUT):
+        try:
+            apply_vnpay_result.delay(vnp.responseData)
+        except Exception:
+            # Chưa đẩy được tác vụ (broker lỗi): bỏ khóa để lần gọi lại của VNPAY được xử lý
+            cache.delete(dedupe_key)
+            logger.exception("Không đẩy được kết quả VNPAY của đơn hàng %s", data['vnp_TxnRef'])
+            return '99', 'Unknown error'
+    return '00', 'Confirm Success'
+
+
 class VnpayReturn(APIView):
+    """
+    Nhận kết quả thanh toán do frontend chuyển tiếp từ trang return của VNPAY.
+    """
     permission_classes = [IsAuthenticated]
-    
-
 
     def post(self, request, *args, **kwargs):
-        # Lấy dữ liệu từ request
-        # data = request.data
-        data = json.loads(request.body)
-        if data is None:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
             return Response({'RspCode': '99', 'Message': 'Invalid JSON data'}, status=400)
+        code, message = acknowledge_vnpay_result(data)
+        return Response({'RspCode': code, 'Message': message})
 
+
+class VnpayIPN(APIView):
+    """
+    IPN do VNPAY gọi trực tiếp; xác thực bằng chữ ký nên không cần đăng nhập.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, *args, **kwargs):
+        code, message = acknowledge_vnpay_result(request.GET.dict())
+        return Response({'RspCode': code, 'Message': message})
         
-        try:
-            order = Order.objects.get(order_id=data['vnp_TxnRef'])
-        except Order.DoesNotExist:
-            return Response({'RspCode': '01', 'Message': 'Order not found'}, status=404)
-        if data:
-            vnp = VNPay(data)
-            vnp.responseData = data
-            order_id = data['vnp_TxnRef']
-            amount = data['vnp_Amount']
-            order_desc = data['vnp_OrderInfo']
-            vnp_TransactionNo = data['vnp_TransactionNo']
-            vnp_ResponseCode = data['vnp_ResponseCode']
-            vnp_TmnCode = data['vnp_TmnCode']
-            vnp_PayDate = data['vnp_PayDate']
-            vnp_BankCode = data['vnp_BankCode']
-            vnp_CardType = data['vnp_CardType']
-            if vnp.validate_response(settings.VNPAY_HASH_SECRET):
-                firstTimeUpdate = True
-                totalAmount = True
-                if totalAmount:
-                    if firstTimeUpdate:
-                        if vnp_ResponseCode == '00':
-                            print('Payment Success. Your code implement here')
-                            order.vnp_BankCode = data.get("vnp_BankCode")
-                            order.vnp_BankTranNo = data.get("vnp_BankTranNo")
-                            order.vnp_CardType = data.get("vnp_CardType")
-                            order.vnp_ResponseCode = data.get("vnp_ResponseCode")
-                            order.vnp_TransactionNo = data.get("vnp_TransactionNo")
-                            order.vnp_TransactionStatus = data.get("vnp_TransactionStatus")
-                            order.payment_method = 'bank_transfer'
-                            order.save()
-                        else:
-                            print('Payment Error. Your code implement here')
-                            try:
-                                with transaction.atomic():
-                                    for item in order.order_lines.all():  
-                                        product = item.product 
-                                        size = item.size 
-                                        color = item.color  
-                    
-                                    try:
-                                        stock_quantity = StockQuantity.objects.get(product=product, size=size, color=color)
-                                        stock_quantity.stock += item.quantity  
-                                        stock_quantity.save()  
-                                    except StockQuantity.DoesNotExist:
-                                        return Response({"error": f"Stock not found for {product.name} - {size.name} - {color.name}"}, status=404)
-                                    order.delete()
-
-                                return Response({"message": "Transaction failed, order deleted, stock updated"}, status=200)
-                            except Order.DoesNotExist:
-                                return Response({"error": "Order not found"}, status=404)
-                            except Exception as e:
-                                return Response({"error": str(e)}, status=500)
-                        result = Response({'RspCode': '00', 'Message': 'Confirm Success'})
-                    else:
-                        try:
-                            with transaction.atomic():
-                                for item in order.order_lines.all():  
-                                    product = item.product  
-                                    size = item.size  
-                                    color = item.color  
-                
-                                try:
-                                    stock_quantity = StockQuantity.objects.get(product=product, size=size, color=color)
-                                    stock_quantity.stock += item.quantity  
-                                    stock_quantity.save()  
-                                except StockQuantity.DoesNotExist:
-                                    return Response({"error": f"Stock not found for {product.name} - {size.name} - {color.name}"}, status=404)
-                                order.delete()
-
-                            return Response({"message": "Transaction failed, order deleted, stock updated"}, status=200)
-                        except Order.DoesNotExist:
-                            return Response({"error": "Order not found"}, status=404)
-                        except Exception as e:
-                            return Response({"error": str(e)}, status=500)
-                        result = Response({'RspCode': '02', 'Message': 'Order Already Update'})
-                else:
-                    try:
-                        with transaction.atomic():
-                            for item in order.order_lines.all():  
-                                product = item.product  
-                                size = item.size  
-                                color = item.color 
-            
-                            try:
-                                stock_quantity = StockQuantity.objects.get(product=product, size=size, color=color)
-                                stock_quantity.stock += item.quantity
-                                stock_quantity.save()  
-                            except StockQuantity.DoesNotExist:
-                                return Response({"error": f"Stock not found for {product.name} - {size.name} - {color.name}"}, status=404)
-                            order.delete()
-
-                        return Response({"message": "Transaction failed, order deleted, stock updated"}, status=200)
-                    except Order.DoesNotExist:
-                        return Response({"error": "Order not found"}, status=404)
-                    except Exception as e:
-                        return Response({"error": str(e)}, status=500)
-                    result = Response({'RspCode': '04', 'Message': 'invalid amount'})
-            else:
-                try:
-                    with transaction.atomic():
-                        for item in order.order_lines.all(): 
-                            product = item.product  
-                            size = item.size  
-                            color = item.color  
-        
-                        try:
-                            stock_quantity = StockQuantity.objects.get(product=product, size=size, color=color)
-                            stock_quantity.stock += item.quantity  
-                            stock_quantity.save()  
-                        except StockQuantity.DoesNotExist:
-                            return Response({"error": f"Stock not found for {product.name} - {size.name} - {color.name}"}, status=404)
-                        order.delete()
-
-                    return Response({"message": "Transaction failed, order deleted, stock updated"}, status=200)
-                except Order.DoesNotExist:
-                    return Response({"error": "Order not found"}, status=404)
-                except Exception as e:
-                    return Response({"error": str(e)}, status=500)
-                result = Response({'RspCode': '97', 'Message': 'Invalid Signature'})
-        else:
-            result = Response({'RspCode': '99', 'Message': 'Invalid request'})
-    
-        return result
-        
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Phân trang theo con trỏ (keyset) cho lịch sử đơn hàng: mỗi trang chỉ lọc
+    theo `created_at` của phần tử cuối, không dùng OFFSET và không COUNT(*).
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-created_at', '-order_id')
+
+
+def order_summary_queryset(user):
+    """
+    Đơn hàng của người dùng kèm số lượng sản phẩm và ảnh đại diện, tính trong cùng một truy vấn.
+    """
+    first_product = OrderLine.objects.filter(order=OuterRef(OuterRef('pk'))).order_by('created_at').values('product_id')[:1]
+    first_image = Image.objects.filter(product_id=Subquery(first_product)).order_by('id').values('url')[:1]
+    return Order.objects.filter(user=user).annotate(
+        item_count=Coalesce(Sum('order_lines__quantity'), 0),
+        first_image=Subquery(first_image),
+    )
+
+
+def order_detail_queryset(user):
+    """
+    Đơn hàng của người dùng với đầy đủ các dòng đơn hàng (2 truy vấn cho cả trang).
+    """
+    return Order.objects.filter(user=user).prefetch_related('order_lines')
+
 
 class OrderListView(APIView):
+    """
+    Lịch sử đơn hàng, phân trang bằng `?cursor=`.
+    `?mode=summary` chỉ trả về thông tin tóm tắt, không kèm các dòng đơn hàng.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        orders = Order.objects.filter(user=user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Lọc theo mã: không cần nạp bản ghi người dùng (xem `user.authentication.LazyUser`)
+        user_id = request.user.pk
+        summary = request.GET.get('mode') == 'summary'
+        if summary:
+            orders = order_summary_queryset(user_id)
+        else:
+            orders = order_detail_queryset(user_id)
+
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer_class = OrderSummarySerializer if summary else OrderSerializer
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class OrderDetailView(APIView):
     permission_classes = [IsAuthenticated] 
@@ -496,7 +473,7 @@ class OrderDetailView(APIView):
             return Response({'error': 'order_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            order = Order.objects.get(order_id=order_id, user=request.user)
+            order = order_detail_queryset(request.user).get(order_id=order_id)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
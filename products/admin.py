@@ -1,22 +1,47 @@
-import uuid
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from itertools import islice
 from import_export import fields, resources, widgets
 from django.utils import timezone
 from django.urls import path
 from django.utils.safestring import mark_safe
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
 from django.db.models import Sum, F
-from cart.models import Order, OrderLine
-from django.shortcuts import render
+from cart.models import Order, OrderLine, SalesRollup
+from django.shortcuts import redirect, render
 from .models import (
     Banner, Color, Size, Category, Product, Review, Image, 
-    StockQuantity, PurchaseInvoice, PurchaseInvoiceLine
+    StockQuantity, PurchaseInvoice, PurchaseInvoiceLine, InventoryMovement
 )
 from import_export.admin import ExportActionModelAdmin, ImportExportModelAdmin
+from . import inventory
+from .exports import EXPORT_CHUNK_SIZE, StreamingExportMixin
 from django.utils.html import format_html
 from django.contrib.admin import site
 from django.http import HttpResponse
 from django.utils.dateparse import parse_date
 from django.urls import reverse
+from shop_vivu import ids, streaming
+from shop_vivu.admin_paginator import EstimatedCountPaginator
+
+HOT_SKU_SHARDS = 8
+
+
+def _with_product_names(rows):
+    """Thêm tên sản phẩm vào các dòng (period_start, product_id, ...), tra theo từng khối dòng."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        names = dict(Product.objects.filter(pk__in={row[1] for row in chunk}).values_list('pk', 'name'))
+        for period_start, product_id, *values in chunk:
+            yield [period_start, product_id, names.get(product_id, ''), *values]
+
 
 class ImageInline(admin.TabularInline):
     model = Image
@@ -99,32 +124,106 @@ class CategoryAdmin(ImportExportModelAdmin,admin.ModelAdmin):
 
 @admin.register(Product)
 
-class ProductAdmin(ImportExportModelAdmin,admin.ModelAdmin):
+class ProductAdmin(StreamingExportMixin, ImportExportModelAdmin,admin.ModelAdmin):
     resource_class = ProductResource
     list_display = ('product_id', 'name', 'import_price', 'sell_price', 'created_at', 'updated_at')
     search_fields = ('name', 'product_id')
     list_filter = ('category', 'color', 'size')
     ordering = ('name',)
     inlines = [ImageInline, StockQuantityInline]  # Gắn ImageInline vào ProductAdmin
+
+    def get_urls(self):
+        urls = [
+            path('sales-stats/', self.admin_site.admin_view(self.sales_stats_view), name='product-sales-stats'),
+        ]
+        return urls + super().get_urls()
+
+    def _sales_rollups(self, request):
+        """Dòng tổng hợp doanh thu theo sản phẩm ứng với bộ lọc thời gian của trang thống kê."""
+        filter_type = request.GET.get('filter', 'all')
+        selected_month = request.GET.get('month', '')
+        today = timezone.localdate()
+        rollups = SalesRollup.objects.exclude(product_id='').exclude(orders=0)
+        try:
+            month = parse_date(f"{selected_month}-01") if selected_month else None
+        except ValueError:
+            month = None
+        if month:
+            rollups = rollups.filter(period=SalesRollup.MONTH, period_start=month)
+        elif filter_type == 'daily':
+            rollups = rollups.filter(period=SalesRollup.DAY, period_start=today)
+        elif filter_type == 'monthly':
+            rollups = rollups.filter(period=SalesRollup.MONTH, period_start=today.replace(day=1))
+        elif filter_type == 'yearly':
+            rollups = rollups.filter(period=SalesRollup.MONTH, period_start__year=today.year)
+        else:
+            rollups = rollups.filter(period=SalesRollup.MONTH)
+        return rollups, filter_type, selected_month
+
+    def sales_stats_view(self, request):
+        # `admin_view` chỉ kiểm tra is_staff; trang doanh thu cần thêm quyền xem sản phẩm
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        rollups, filter_type, selected_month = self._sales_rollups(request)
+        export = request.GET.get('export')
+        if export in ('csv', 'xlsx'):
+            return self._export_sales(rollups, export)
+
+        sales_data = list(
+            rollups.values('product_id')
+            .annotate(quantity_sold=Sum('units'), total_sales=Sum('revenue'))
+            .order_by('-quantity_sold')
+        )
+        names = dict(Product.objects.filter(pk__in=[item['product_id'] for item in sales_data]).values_list('pk', 'name'))
+        for item in sales_data:
+            item['product__product_id'] = item['product_id']
+            item['product__name'] = names.get(item['product_id'], '')
+        return render(request, 'admin/product_sales_stats.html', {
+            **self.admin_site.each_context(request),
+            'title': "Thống kê sản phẩm bán chạy",
+            'sales_data': sales_data,
+            'filter_type': filter_type,
+            'selected_month': selected_month,
+        })
+
+    def _export_sales(self, rollups, export):
+        header = ['Kỳ', 'Mã sản phẩm', 'Tên sản phẩm', 'Số đơn hàng', 'Số lượng đã bán', 'Doanh thu']
+        rows = _with_product_names(
+            rollups.order_by('period_start', 'product_id')
+            .values_list('period_start', 'product_id', 'orders', 'units', 'revenue')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        filename = f"product-sales-{timezone.localdate():%Y%m%d}.{export}"
+        if export == 'xlsx':
+            return streaming.stream_xlsx(header, rows, filename, sheet_title="Doanh thu")
+        return streaming.stream_csv(header, rows, filename)
     
 
 
 
 
 @admin.register(Review)
-class ReviewAdmin(ImportExportModelAdmin, admin.ModelAdmin):
+class ReviewAdmin(StreamingExportMixin, ImportExportModelAdmin, admin.ModelAdmin):
     resource_class = ReviewResource
     list_display = ('review_id', 'product', 'user', 'rating', 'created_at', 'updated_at')
-    search_fields = ('product__name', 'user__username')
+    search_fields = ('product__name', 'user__email', 'user__full_name')
     list_filter = ('rating', 'created_at')
     ordering = ('-created_at',)
+    list_select_related = ('product', 'user')
+    autocomplete_fields = ('product', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Image)
-class ImageAdmin(ImportExportModelAdmin,admin.ModelAdmin):
+class ImageAdmin(StreamingExportMixin, ImportExportModelAdmin,admin.ModelAdmin):
     list_display = ('image_preview', 'product', 'created_at', 'updated_at')  # Hiển thị ảnh
     search_fields = ('product__name',)
     ordering = ('product__name',)
+    list_select_related = ('product',)
+    autocomplete_fields = ('product',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def image_preview(self, obj):
         if obj.url:
@@ -135,28 +234,86 @@ class ImageAdmin(ImportExportModelAdmin,admin.ModelAdmin):
 
 
 @admin.register(StockQuantity)
-class StockQuantityAdmin(ImportExportModelAdmin,admin.ModelAdmin):
-    list_display = ('id', 'product', 'color', 'size', 'stock')
+class StockQuantityAdmin(StreamingExportMixin, ImportExportModelAdmin,admin.ModelAdmin):
+    list_display = ('id', 'product', 'color', 'size', 'stock', 'shard_count')
     search_fields = ('product__name', 'color__name', 'size__name')
     ordering = ('product',)
+    list_select_related = ('product', 'color', 'size')
+    autocomplete_fields = ('product',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('shard_count',)
+    actions = ['enable_hot_mode', 'disable_hot_mode']
+
+    @admin.action(description="Bật chế độ hot SKU (chia tồn kho thành %d bộ đếm con)" % HOT_SKU_SHARDS)
+    def enable_hot_mode(self, request, queryset):
+        for stock_id in queryset.values_list('id', flat=True):
+            inventory.enable_hot_mode(stock_id, HOT_SKU_SHARDS)
+        self.message_user(request, f"Đã bật chế độ hot SKU cho {queryset.count()} biến thể.")
+
+    @admin.action(description="Tắt chế độ hot SKU")
+    def disable_hot_mode(self, request, queryset):
+        for stock_id in queryset.values_list('id', flat=True):
+            inventory.disable_hot_mode(stock_id)
+        self.message_user(request, f"Đã tắt chế độ hot SKU cho {queryset.count()} biến thể.")
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'stock', 'kind', 'quantity', 'reference', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('reference', 'stock__product__product_id')
+    list_select_related = ('stock__product', 'stock__color', 'stock__size')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Sổ kho chỉ ghi thêm, không cho sửa/xóa từ trang quản trị
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 class PurchaseInvoiceLineInline(admin.TabularInline):
     model = PurchaseInvoiceLine
-    fields = ('product', 'quantity', 'price')
+    fields = ('product', 'color', 'size', 'quantity', 'price')
+    autocomplete_fields = ('product',)
     extra = 1
-    
+
+    # Hóa đơn đã nhập kho thì các dòng chỉ còn để xem: sửa dòng sẽ lệch với sổ kho
+    def has_add_permission(self, request, obj=None):
+        return super().has_add_permission(request, obj) and not (obj and obj.posted_at)
+
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and not (obj and obj.posted_at)
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and not (obj and obj.posted_at)
+
+
+class ReceiptUploadForm(forms.Form):
+    supplier = forms.CharField(label="Nhà cung cấp", max_length=255)
+    file = forms.FileField(label="Phiếu nhập (CSV: product,color,size,quantity,price)")
+    post_now = forms.BooleanField(label="Nhập kho ngay", required=False, initial=True)
+
 
 @admin.register(PurchaseInvoice)
 class PurchaseInvoiceAdmin(admin.ModelAdmin):
-    list_display = ('invoice_id', 'supplier', 'total_price', 'created_by', 'created_at', 'updated_at')
+    list_display = ('invoice_id', 'supplier', 'total_price', 'created_by', 'posted_at', 'created_at', 'updated_at')
     list_filter = ('supplier', 'created_at')  # Lọc theo nhà cung cấp và ngày tạo
-    search_fields = ('invoice_id', 'supplier__name', 'created_by__username')  # Tìm kiếm
+    search_fields = ('invoice_id', 'supplier', 'created_by__email')  # Tìm kiếm
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at', 'invoice_id')  # Các trường chỉ đọc
+    list_select_related = ('created_by',)
+    autocomplete_fields = ('created_by',)
+    readonly_fields = ('created_at', 'updated_at', 'invoice_id', 'total_price', 'posted_at')  # Các trường chỉ đọc
     inlines = [PurchaseInvoiceLineInline]
+    actions = ['post_invoices']
+    change_list_template = 'admin/products/purchaseinvoice_change_list.html'
     fieldsets = (
         ("Invoice Details", {
-            'fields': ('supplier', 'total_price', 'created_by')  # Thông tin chính
+            'fields': ('supplier', 'total_price', 'created_by', 'posted_at')  # Thông tin chính
         }),
         ("Timestamps", {
             'fields': ('created_at', 'updated_at'),  # Dấu thời gian
@@ -165,30 +322,117 @@ class PurchaseInvoiceAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         if not obj.invoice_id:  # Nếu chưa có invoice_id, tự tạo
-            obj.invoice_id = f"INV{str(uuid.uuid4())[:8].upper()}"
+            obj.invoice_id = ids.next_id('INV')
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Tổng tiền luôn được tính từ các dòng chi tiết
+        form.instance.update_total_price()
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # Ô chọn hóa đơn (autocomplete) của dòng hóa đơn chỉ gợi ý hóa đơn chưa nhập kho, như formfield_for_foreignkey
+        if (request.GET.get('model_name'), request.GET.get('field_name')) == ('purchaseinvoiceline', 'invoice'):
+            queryset = queryset.filter(posted_at__isnull=True)
+        return queryset, may_have_duplicates
+
     def get_readonly_fields(self, request, obj=None):
         if obj:  # Khi chỉnh sửa hóa đơn (đã tồn tại)
             return self.readonly_fields
-        return ('created_at', 'updated_at')  # Khi tạo mới
+        return ('created_at', 'updated_at', 'total_price', 'posted_at')  # Khi tạo mới
 
     def response_add(self, request, obj, post_url_continue=None):
         self.message_user(request, f"Hóa đơn {obj.invoice_id} đã được tạo thành công!")
         return super().response_add(request, obj, post_url_continue)
 
-    
+    @admin.action(description="Nhập kho các hóa đơn đã chọn")
+    def post_invoices(self, request, queryset):
+        for invoice in queryset.filter(posted_at__isnull=True):
+            try:
+                invoice.post()
+            except ValidationError as error:
+                self.message_user(request, f"{invoice.invoice_id}: {error.messages[0]}", level=messages.ERROR)
+            else:
+                self.message_user(request, f"Đã nhập kho hóa đơn {invoice.invoice_id}.")
+
+    def get_urls(self):
+        urls = [
+            path('upload-receipt/', self.admin_site.admin_view(self.upload_receipt_view), name='purchaseinvoice-upload-receipt'),
+        ]
+        return urls + super().get_urls()
+
+    def upload_receipt_view(self, request):
+        """Tạo hóa đơn nhập hàng từ một phiếu nhập CSV lớn: các dòng được ghi bằng bulk insert."""
+        form = ReceiptUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            lines, errors = _parse_receipt(form.cleaned_data['file'])
+            if errors:
+                for error in errors[:20]:
+                    self.message_user(request, error, level=messages.ERROR)
+            elif not lines:
+                self.message_user(request, "Phiếu nhập không có dòng nào.", level=messages.ERROR)
+            else:
+                with transaction.atomic():
+                    invoice = PurchaseInvoice.objects.create(
+                        invoice_id=ids.next_id('INV'),
+                        supplier=form.cleaned_data['supplier'],
+                        created_by=request.user,
+                    )
+                    invoice.add_lines(lines)
+                    invoice.update_total_price()
+                    if form.cleaned_data['post_now']:
+                        invoice.post()
+                self.message_user(request, f"Đã tạo hóa đơn {invoice.invoice_id} với {len(lines)} dòng.")
+                return redirect('admin:products_purchaseinvoice_change', invoice.pk)
+        return render(request, 'admin/products/purchaseinvoice/upload_receipt.html', {
+            **self.admin_site.each_context(request),
+            'title': "Tải phiếu nhập hàng",
+            'opts': self.model._meta,
+            'form': form,
+        })
+
+
+def _parse_receipt(uploaded_file):
+    """Đọc phiếu nhập CSV; mã sản phẩm/màu/kích cỡ được kiểm tra bằng ba truy vấn cho cả file."""
+    rows = list(csv.DictReader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig')))
+    known = {
+        column: set(model.objects.filter(pk__in={row.get(column) for row in rows}).values_list('pk', flat=True))
+        for column, model in (('product', Product), ('color', Color), ('size', Size))
+    }
+    lines, errors = [], []
+    for number, row in enumerate(rows, start=2):
+        unknown = [column for column in known if row.get(column) not in known[column]]
+        if unknown:
+            errors.append(f"Dòng {number}: không tìm thấy {', '.join(unknown)}.")
+            continue
+        try:
+            quantity, price = int(row['quantity']), Decimal(row['price'])
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            errors.append(f"Dòng {number}: số lượng hoặc giá không hợp lệ.")
+            continue
+        if quantity <= 0 or price < 0:
+            errors.append(f"Dòng {number}: số lượng phải lớn hơn 0 và giá không âm.")
+            continue
+        lines.append((row['product'], row['color'], row['size'], quantity, price))
+    return lines, errors
+
 
 @admin.register(PurchaseInvoiceLine)
 class PurchaseInvoiceLineAdmin(admin.ModelAdmin):
-    list_display = ('invoiceLine_id', 'invoice', 'product', 'quantity', 'price')  # Hiển thị thông tin chính
+    list_display = ('invoiceLine_id', 'invoice', 'product', 'color', 'size', 'quantity', 'price')  # Hiển thị thông tin chính
     search_fields = ('invoice__invoice_id', 'product__name')  # Tìm kiếm theo hóa đơn và sản phẩm
     ordering = ('invoice',)  # Sắp xếp theo hóa đơn
     readonly_fields = ('invoiceLine_id',)  # Các trường chỉ đọc
+    # PurchaseInvoice.__str__ dùng người tạo nên nạp kèm invoice__created_by
+    list_select_related = ('invoice__created_by', 'product', 'color', 'size')
+    autocomplete_fields = ('invoice', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ("Invoice Line Details", {
-            'fields': ('invoice', 'product', 'quantity', 'price')  # Thông tin dòng hóa đơn
+            'fields': ('invoice', 'product', 'color', 'size', 'quantity', 'price')  # Thông tin dòng hóa đơn
         }),
         ("Identifier", {
             'fields': ('invoiceLine_id',),  # Mã dòng hóa đơn
@@ -196,9 +440,24 @@ class PurchaseInvoiceLineAdmin(admin.ModelAdmin):
     )
 
     def save_model(self, request, obj, form, change):
-        if not obj.invoiceLine_id:  # Nếu chưa có invoiceLine_id, tự tạo
-            obj.invoiceLine_id = f"PIL{str(uuid.uuid4())[:8].upper()}"
         super().save_model(request, obj, form, change)
+        obj.invoice.update_total_price()
+
+    # Dòng của hóa đơn đã nhập kho không được sửa/xóa, và không thêm dòng mới vào hóa đơn đó
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and not (obj and obj.invoice.posted_at)
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and not (obj and obj.invoice.posted_at)
+
+    def delete_queryset(self, request, queryset):
+        # Hành động xóa hàng loạt bỏ qua has_delete_permission(obj): loại các dòng đã nhập kho ở đây
+        super().delete_queryset(request, queryset.filter(invoice__posted_at__isnull=True))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'invoice':
+            kwargs['queryset'] = PurchaseInvoice.objects.filter(posted_at__isnull=True)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     def get_readonly_fields(self, request, obj=None):
         if obj:  # Khi chỉnh sửa dòng hóa đơn (đã tồn tại)
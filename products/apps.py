@@ -5,5 +5,3 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
     verbose_name = 'Sản phẩm'
-    def ready(self):
-        import products.signals
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+Phiên bản async của các API đọc danh mục, dùng khi chạy dưới ASGI (`shop_vivu/asgi.py` bật `ASYNC_CATALOG`).
+
+Truy vấn dùng ORM async của Django; phần tính điểm nặng CPU (TF-IDF sản phẩm liên quan, dự đoán của
+mô hình gợi ý) chạy trong một thread pool giới hạn `CATALOG_SCORING_WORKERS` luồng, nên một request
+chậm không giữ event loop và số phép tính đồng thời có trần. Cây danh mục con được nạp một lần cho cả
+trang (`_with_category_tree`); serializer vẫn được chạy qua `sync_to_async` phòng khi còn truy vấn lười.
+
+Phân quyền giữ như view đồng bộ: xác thực và `DEFAULT_PERMISSION_CLASSES` của DRF. Các phương thức
+khác GET (ví dụ thêm banner) được chuyển cho view đồng bộ tương ứng.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from user.models import User
+
+from . import utils
+from .models import Banner, Category, Product, StockQuantity
+from .serializers import BannerSerializer, ProductSerializer
+from .views import new_products_queryset
+
+scoring_pool = ThreadPoolExecutor(max_workers=settings.CATALOG_SCORING_WORKERS, thread_name_prefix='catalog-scoring')
+
+
+def _catalog_products(products=None):
+    # Nạp trước mọi quan hệ ProductSerializer cần tới; cây danh mục con do `_with_category_tree` gắn vào
+    return (Product.objects.all() if products is None else products).prefetch_related(
+        'images', 'color', 'size', 'category',
+        Prefetch('stock_quantities', StockQuantity.objects.select_related('color', 'size').prefetch_related('shards')),
+    )
+
+
+def _set_subcategories(category, children):
+    # Như kết quả của prefetch_related('subcategories'): `category.subcategories.all()` không truy vấn nữa
+    queryset = category.subcategories.all()
+    queryset._result_cache, queryset._prefetch_done = children, True
+    category._prefetched_objects_cache = {**getattr(category, '_prefetched_objects_cache', {}), 'subcategories': queryset}
+
+
+async def _with_category_tree(products):
+    """
+    Gắn cây danh mục con (mọi cấp) cho danh mục của các sản phẩm bằng một truy vấn, thay vì
+    CategorySerializer truy vấn danh mục con theo từng cấp của từng sản phẩm.
+    """
+    children = {}
+    categories = [category async for category in Category.objects.all()]
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+    for category in categories:
+        _set_subcategories(category, children.get(category.category_id, []))
+    for product in products:
+        for category in product.category.all():
+            _set_subcategories(category, children.get(category.category_id, []))
+    return products
+
+
+async def _score(func, *args):
+    """Chạy phần tính toán trong pool giới hạn; luồng của pool tự đóng kết nối DB nếu lỡ mở."""
+    def run():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+    return await asyncio.get_running_loop().run_in_executor(scoring_pool, run)
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+async def _serialize(serializer_class, instance, many=False, context=None):
+    return await sync_to_async(lambda: serializer_class(instance, many=many, context=context or {}).data)()
+
+
+async def _check_access(request):
+    """Xác thực và kiểm tra quyền như APIView; trả về response lỗi hoặc None."""
+    authenticators = [authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        await sync_to_async(lambda: drf_request.user)()
+        for permission_class in api_settings.DEFAULT_PERMISSION_CLASSES:
+            if not permission_class().has_permission(drf_request, None):
+                if not drf_request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+    except exceptions.APIException as exc:
+        response = _response({'detail': str(exc.detail)}, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)) and authenticators:
+            response.status_code = 401
+            response['WWW-Authenticate'] = authenticators[0].authenticate_header(drf_request)
+        return response
+    request.user = drf_request.user
+    return None
+
+
+def catalog_view(sync_view):
+    """GET chạy bằng view async bên dưới; phương thức khác chuyển cho `sync_view` (view đồng bộ cũ)."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            denied = await _check_access(request)
+            if denied is not None:
+                return denied
+            return await view(request, *args, **kwargs)
+        # Như APIView: CSRF do lớp xác thực của DRF tự kiểm tra
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _sync(view_name):
+    from . import views
+    return getattr(views, view_name).as_view()
+
+
+@catalog_view(_sync('ProductListView'))
+async def product_list(request):
+    products = await _with_category_tree([product async for product in _catalog_products()])
+    # Như ListAPIView: có request trong context nên URL ảnh là đường dẫn tuyệt đối
+    return _response(await _serialize(ProductSerializer, products, many=True, context={'request': request}))
+
+
+@catalog_view(_sync('NewProductsView'))
+async def new_products(request):
+    products = await _with_category_tree([product async for product in _catalog_products(new_products_queryset())[:10]])
+    return _response(await _serialize(ProductSerializer, products, many=True))
+
+
+@catalog_view(_sync('ProductDetail'))
+async def product_detail(request, product_id):
+    product = await _catalog_products().filter(product_id=product_id).afirst()
+    if product is None:
+        return _response({'detail': 'Product not found.'}, status=404)
+    await _with_category_tree([product])
+    return _response(await _serialize(ProductSerializer, product))
+
+
+@catalog_view(_sync('BannerList'))
+async def banner_list(request):
+    banners = [banner async for banner in Banner.objects.all()]
+    return _response(await _serialize(BannerSerializer, banners, many=True))
+
+
+@catalog_view(_sync('CategoryListView'))
+async def category_list(request):
+    # Cả cây danh mục trong một truy vấn, dựng cây trong bộ nhớ thay vì truy vấn con theo từng cấp
+    children = {}
+    async for category in Category.objects.all():
+        children.setdefault(category.parent_id, []).append(category)
+
+    def node(category):
+        return {
+            'category_id': category.category_id, 'name': category.name, 'description': category.description,
+            'parent': category.parent_id, 'children': [node(child) for child in children.get(category.category_id, [])],
+        }
+    return _response([node(category) for category in children.get(None, [])])
+
+
+@catalog_view(_sync('RelatedProductsView'))
+async def related_products(request, product_id):
+    try:
+        product = await Product.objects.aget(product_id=product_id)
+        products = [p async for p in Product.objects.exclude(product_id=product_id)]
+        stopwords = await _score(utils.get_vietnamese_stopwords)
+        ranked = await _score(utils.rank_related_products, product, products, stopwords)
+        order = {p.pk: index for index, p in enumerate(ranked)}
+        related = await _with_category_tree([p async for p in _catalog_products().filter(pk__in=order)])
+        related.sort(key=lambda p: order[p.pk])
+        return _response(await _serialize(ProductSerializer, related, many=True))
+    except Product.DoesNotExist:
+        return _response({"error": "Product not found"}, status=404)
+    except Exception as e:
+        return _response({"error": str(e)}, status=500)
+
+
+@catalog_view(_sync('RecommendProductsView'))
+async def recommend_products(request, user_id):
+    if not await User.objects.filter(user_id=user_id).aexists():
+        return _response({'error': 'User not found'}, status=404)
+    try:
+        product_ids = None
+        # Lần gọi đầu tiên tải mô hình và truy vấn danh sách người dùng (đồng bộ)
+        if await sync_to_async(utils.has_recommendations)(user_id):
+            product_ids = [product_id async for product_id in Product.objects.values_list('product_id', flat=True)]
+        if product_ids:
+            recommended = await _score(utils.predict_top_products, user_id, product_ids)
+        else:
+            recommended = [row['product__product_id'] async for row in utils.popular_products_queryset()]
+        return _response({'recommended_products': recommended})
+    except Exception as e:
+        return _response({'error': f'Internal server error: {str(e)}'}, status=500)
@@ -0,0 +1,112 @@
+"""
+Bảng tồn kho khả dụng trong bộ nhớ của từng process, dùng cho các truy vấn đọc nhiều
+(trang sản phẩm, giỏ hàng). Checkout vẫn kiểm tra chính xác bằng `products.inventory.sell`.
+
+Số liệu được làm mới theo sự kiện thay đổi tồn kho (các dòng sổ kho mới) và không cũ hơn
+`AVAILABILITY_STALENESS_SECONDS`; thay đổi do chính process ghi được áp dụng ngay sau commit.
+"""
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryMovement, StockQuantity, StockShard
+
+STALENESS_SECONDS = getattr(settings, 'AVAILABILITY_STALENESS_SECONDS', 2)
+FULL_RELOAD_SECONDS = getattr(settings, 'AVAILABILITY_FULL_RELOAD_SECONDS', 300)
+# Đọc lùi thêm một khoảng để không bỏ sót dòng sổ kho commit muộn hơn dòng có id lớn hơn
+EVENT_LOOKBACK = timedelta(seconds=5)
+
+
+def _balances(stocks):
+    shard_total = StockShard.objects.filter(stock=OuterRef('pk')).values('stock').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return stocks.annotate(available=F('stock') + Coalesce(Subquery(shard_total), 0))
+
+
+class AvailabilityMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._variant_ids = {}  # (product_id, color_id, size_id) -> StockQuantity.id
+        self._available = array('i')  # _available[StockQuantity.id] = tồn kho khả dụng
+        self._dirty = set()
+        self._refreshed_at = 0.0
+        self._loaded_at = 0.0
+        self._events_since = None
+
+    def lookup(self, variants):
+        """Trả về tồn kho khả dụng cho từng (product_id, color_id, size_id); None nếu không có biến thể."""
+        self._refresh()
+        result = []
+        for variant in variants:
+            variant_id = self._variant_ids.get(variant)
+            result.append(self._available[variant_id] if variant_id is not None else None)
+        return result
+
+    def get(self, product_id, color_id, size_id):
+        return self.lookup([(product_id, color_id, size_id)])[0]
+
+    def mark_dirty(self, stock_ids):
+        """Biến thể vừa được process này ghi: làm mới ở lần đọc kế tiếp."""
+        with self._lock:
+            self._dirty.update(stock_ids)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._refreshed_at < STALENESS_SECONDS and not self._dirty:
+            return
+        with self._lock:
+            # Chưa nạp lần nào (`time.monotonic()` có thể nhỏ hơn FULL_RELOAD_SECONDS ngay sau khi khởi động máy)
+            if self._events_since is None or now - self._loaded_at >= FULL_RELOAD_SECONDS:
+                self._full_reload()
+            elif now - self._refreshed_at >= STALENESS_SECONDS or self._dirty:
+                self._apply_events()
+            self._refreshed_at = now
+
+    def _full_reload(self):
+        # Dựng lại toàn bộ bảng: biến thể đã bị xóa không còn trong kết quả
+        events_since = timezone.now() - EVENT_LOOKBACK
+        rows = list(_balances(StockQuantity.objects.all()).values_list('id', 'product_id', 'color_id', 'size_id', 'available'))
+        available = array('i', bytes(array('i').itemsize * (max((row[0] for row in rows), default=0) + 1)))
+        variant_ids = {}
+        for stock_id, product_id, color_id, size_id, quantity in rows:
+            variant_ids[(product_id, color_id, size_id)] = stock_id
+            available[stock_id] = quantity
+        self._variant_ids, self._available = variant_ids, available
+        self._dirty.clear()
+        self._events_since = events_since
+        self._loaded_at = time.monotonic()
+
+    def _apply_events(self):
+        events_since = timezone.now() - EVENT_LOOKBACK
+        changed = set(
+            InventoryMovement.objects.filter(created_at__gte=self._events_since)
+            .values_list('stock_id', flat=True).distinct()
+        )
+        changed |= self._dirty
+        self._dirty = set()
+        self._events_since = events_since
+        if not changed:
+            return
+        rows = _balances(StockQuantity.objects.filter(pk__in=changed)).values_list('id', 'product_id', 'color_id', 'size_id', 'available')
+        for stock_id, product_id, color_id, size_id, quantity in rows:
+            if stock_id >= len(self._available):
+                self._available.extend([0] * (stock_id + 1 - len(self._available)))
+            self._variant_ids[(product_id, color_id, size_id)] = stock_id
+            self._available[stock_id] = quantity
+            changed.discard(stock_id)
+        if changed:
+            # Biến thể đã bị xóa
+            self._variant_ids = {variant: stock_id for variant, stock_id in self._variant_ids.items() if stock_id not in changed}
+            for stock_id in changed:
+                if stock_id < len(self._available):
+                    self._available[stock_id] = 0
+
+
+availability_map = AvailabilityMap()
@@ -0,0 +1,276 @@
+"""
+Sổ kho: mọi thay đổi tồn kho được ghi thêm vào `InventoryMovement`,
+còn số dư `StockQuantity.stock` được cập nhật bằng UPDATE nguyên tử (stock = stock + delta),
+không đọc - sửa - ghi trong Python.
+"""
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .availability import availability_map
+from .models import InventoryMovement, InventorySnapshot, StockQuantity, StockShard
+
+REBALANCE_INTERVAL = 1  # giây
+
+
+class InsufficientStock(Exception):
+    """Không đủ tồn kho để trừ."""
+
+
+def append(stock_id, quantity, kind, reference=''):
+    """Chỉ ghi thêm một dòng sổ kho (số dư đã được cập nhật ở nơi khác)."""
+    if quantity:
+        InventoryMovement.objects.create(stock_id=stock_id, kind=kind, quantity=quantity, reference=reference)
+        _notify_availability([stock_id])
+
+
+def _notify_availability(stock_ids):
+    # Bảng tồn kho trong bộ nhớ của process này thấy thay đổi ngay sau commit
+    transaction.on_commit(lambda: availability_map.mark_dirty(stock_ids))
+
+
+def record(stock_id, quantity, kind, reference=''):
+    """Ghi một dòng sổ kho và cộng `quantity` (có dấu) vào số dư."""
+    if not quantity:
+        return
+    with transaction.atomic():
+        StockQuantity.objects.filter(pk=stock_id).update(stock=F('stock') + quantity)
+        append(stock_id, quantity, kind, reference)
+
+
+def sell(stock_id, quantity, reference='', shard_count=None):
+    """
+    Trừ tồn kho khi bán. Điều kiện `stock >= quantity` nằm trong chính câu UPDATE
+    nên hai đơn hàng đồng thời không thể cùng trừ quá số lượng còn lại.
+    Với biến thể hot SKU (`shard_count` > 0) thì trừ vào một bộ đếm con.
+
+    `shard_count` do bên gọi đọc trước (không khóa) nên có thể đã cũ: câu UPDATE ở chế độ thường chỉ khớp
+    khi `shard_count = 0`, và khi không trừ được thì chế độ được đọc lại có khóa trước khi kết luận hết hàng.
+    """
+    with transaction.atomic():
+        if shard_count is None:
+            shard_count = StockQuantity.objects.filter(pk=stock_id).values_list('shard_count', flat=True).first() or 0
+        while True:
+            if shard_count:
+                sold = _sell_from_shards(stock_id, quantity, shard_count)
+            else:
+                sold = StockQuantity.objects.filter(pk=stock_id, shard_count=0, stock__gte=quantity).update(
+                    stock=F('stock') - quantity
+                )
+            if sold:
+                break
+            current = _locked_shard_count(stock_id)
+            if bool(current) == bool(shard_count):
+                raise InsufficientStock(stock_id)
+            # Chế độ hot SKU vừa được bật/tắt: thử lại theo chế độ hiện tại
+            shard_count = current
+        append(stock_id, -quantity, InventoryMovement.SALE, reference)
+
+
+def _locked_shard_count(stock_id):
+    # Đọc có khóa: thấy giá trị mới nhất kể cả trong transaction REPEATABLE READ đã đọc trước đó
+    shard_count = StockQuantity.objects.select_for_update().filter(pk=stock_id).values_list('shard_count', flat=True).first()
+    if shard_count is None:
+        raise InsufficientStock(stock_id)
+    return shard_count
+
+
+def _sell_from_shards(stock_id, quantity, shard_count):
+    """
+    Bắt đầu từ một bộ đếm con ngẫu nhiên và thử lần lượt từng bộ còn đủ hàng.
+    Nếu không bộ nào đủ thì chia lại tồn kho (rebalance) một lần rồi thử lại.
+    Trả về False nếu không trừ được (không đủ hàng hoặc biến thể không còn bộ đếm con).
+    """
+    start = random.randrange(shard_count)
+    order = [(start + offset) % shard_count for offset in range(shard_count)]
+    for position, index in enumerate(order):
+        updated = StockShard.objects.filter(stock_id=stock_id, index=index, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity
+        )
+        if updated:
+            if position:
+                # Bộ đếm được chọn đầu tiên đã cạn: chia lại sau khi transaction hiện tại commit
+                transaction.on_commit(lambda: _schedule_rebalance(stock_id))
+            return True
+    if not rebalance(stock_id, reserve=quantity):
+        return False
+    StockShard.objects.filter(stock_id=stock_id, index=0).update(quantity=F('quantity') - quantity)
+    return True
+
+
+def _schedule_rebalance(stock_id):
+    # Tránh nhiều request cùng lúc chia lại một biến thể: tối đa một lần mỗi REBALANCE_INTERVAL giây
+    if cache.add(f"stock-rebalance:{stock_id}", 1, timeout=REBALANCE_INTERVAL):
+        rebalance(stock_id)
+
+
+def rebalance(stock_id, reserve=0):
+    """
+    Gom phần chưa chia (`StockQuantity.stock`) và các bộ đếm con rồi chia đều lại.
+    `reserve` đảm bảo bộ đếm đầu tiên có ít nhất số lượng đó (cho một đơn hàng lớn).
+    Trả về False nếu tổng tồn kho không đủ `reserve`.
+    """
+    with transaction.atomic():
+        # Khóa các bộ đếm con trước rồi mới tới dòng StockQuantity, cùng thứ tự với luồng bán hàng
+        shards = list(StockShard.objects.select_for_update().filter(stock_id=stock_id).order_by('index'))
+        pool = StockQuantity.objects.select_for_update().filter(pk=stock_id).values_list('stock', flat=True).first()
+        if pool is None or not shards:
+            return False
+        total = pool + sum(shard.quantity for shard in shards)
+        if total < reserve:
+            return False
+        share, remainder = divmod(total - reserve, len(shards))
+        for position, shard in enumerate(shards):
+            shard.quantity = share + (1 if position < remainder else 0)
+        shards[0].quantity += reserve
+        StockShard.objects.bulk_update(shards, ['quantity'])
+        StockQuantity.objects.filter(pk=stock_id).update(stock=0)
+    return True
+
+
+def enable_hot_mode(stock_id, shard_count):
+    """Chuyển một biến thể sang chế độ hot SKU với `shard_count` bộ đếm con."""
+    with transaction.atomic():
+        disable_hot_mode(stock_id)
+        StockShard.objects.bulk_create([StockShard(stock_id=stock_id, index=index) for index in range(shard_count)])
+        StockQuantity.objects.filter(pk=stock_id).update(shard_count=shard_count)
+        rebalance(stock_id)
+
+
+def disable_hot_mode(stock_id):
+    """Gộp các bộ đếm con về lại `StockQuantity.stock` và tắt chế độ hot SKU."""
+    with transaction.atomic():
+        shards = StockShard.objects.filter(stock_id=stock_id)
+        remaining = sum(shards.select_for_update().values_list('quantity', flat=True))
+        shards.delete()
+        StockQuantity.objects.filter(pk=stock_id).update(stock=F('stock') + remaining, shard_count=0)
+
+
+def record_many(deltas, kind, reference=''):
+    """
+    Áp dụng nhiều thay đổi {stock_id: delta} cùng lúc: một `bulk_create` cho sổ kho
+    và một câu UPDATE duy nhất cho số dư.
+    """
+    deltas = {stock_id: quantity for stock_id, quantity in deltas.items() if quantity}
+    if not deltas:
+        return
+    with transaction.atomic():
+        StockQuantity.objects.filter(pk__in=deltas).update(
+            stock=F('stock') + Case(*[When(pk=stock_id, then=Value(quantity)) for stock_id, quantity in deltas.items()])
+        )
+        InventoryMovement.objects.bulk_create([
+            InventoryMovement(stock_id=stock_id, kind=kind, quantity=quantity, reference=reference)
+            for stock_id, quantity in deltas.items()
+        ])
+        _notify_availability(list(deltas))
+
+
+def ledger_balances(stock_ids=None):
+    """Số dư tính từ sổ kho: số dư đã chốt + tổng các dòng sổ kho còn lại, theo `stock_id`."""
+    stocks = StockQuantity.objects.all()
+    if stock_ids is not None:
+        stocks = stocks.filter(pk__in=stock_ids)
+    snapshots = dict(
+        InventorySnapshot.objects.filter(stock__in=stocks).values_list('stock_id', 'balance')
+    )
+    movements = dict(
+        InventoryMovement.objects.filter(stock__in=stocks)
+        .values('stock_id').annotate(total=Sum('quantity')).values_list('stock_id', 'total')
+    )
+    return {
+        stock_id: snapshots.get(stock_id, 0) + movements.get(stock_id, 0)
+        for stock_id in stocks.values_list('id', flat=True)
+    }
+
+
+def compact(older_than=timedelta(days=30), batch_size=1000):
+    """
+    Gộp các dòng sổ kho cũ hơn `older_than` vào `InventorySnapshot` rồi xóa chúng,
+    để bảng sổ kho không phình mãi. Trả về số dòng đã gộp.
+
+    Mỗi lô khóa các bộ đếm con rồi các dòng tồn kho (cùng thứ tự với luồng bán hàng), nên không còn
+    bút toán nào của các biến thể đó đang chờ commit; chỉ xóa các dòng có id không vượt quá id lớn nhất
+    đã đọc khi tính tổng.
+    """
+    cutoff = timezone.now() - older_than
+    cutoff_id = InventoryMovement.objects.filter(created_at__lt=cutoff).order_by('-id').values_list('id', flat=True).first()
+    if cutoff_id is None:
+        return 0
+
+    compacted = 0
+    last_stock_id = 0
+    while True:
+        stock_ids = list(
+            InventoryMovement.objects.filter(id__lte=cutoff_id, stock_id__gt=last_stock_id)
+            .order_by('stock_id').values_list('stock_id', flat=True).distinct()[:batch_size]
+        )
+        if not stock_ids:
+            break
+        last_stock_id = stock_ids[-1]
+        with transaction.atomic():
+            list(StockShard.objects.select_for_update().filter(stock_id__in=stock_ids).order_by('stock_id', 'index').values_list('pk'))
+            list(StockQuantity.objects.select_for_update().filter(pk__in=stock_ids).order_by('pk').values_list('pk'))
+            read = {
+                stock_id: (total, last_id)
+                for stock_id, total, last_id in InventoryMovement.objects.filter(id__lte=cutoff_id, stock_id__in=stock_ids)
+                .values('stock_id').annotate(total=Sum('quantity'), last_id=Max('id'))
+                .values_list('stock_id', 'total', 'last_id')
+            }
+            if not read:
+                continue
+            max_id = max(last_id for _, last_id in read.values())
+            existing = set(InventorySnapshot.objects.filter(stock_id__in=read).values_list('stock_id', flat=True))
+            if existing:
+                InventorySnapshot.objects.filter(stock_id__in=existing).update(
+                    balance=F('balance') + Case(*[When(stock_id=stock_id, then=Value(read[stock_id][0])) for stock_id in existing]),
+                    last_movement_id=Case(*[When(stock_id=stock_id, then=Value(read[stock_id][1])) for stock_id in existing]),
+                )
+            InventorySnapshot.objects.bulk_create([
+                InventorySnapshot(stock_id=stock_id, balance=total, last_movement_id=last_id)
+                for stock_id, (total, last_id) in read.items() if stock_id not in existing
+            ])
+            deleted, _ = InventoryMovement.objects.filter(stock_id__in=list(read), id__lte=max_id).delete()
+            compacted += deleted
+    return compacted
+
+
+def reconcile(fix=False, batch_size=1000):
+    """
+    So sánh số dư `StockQuantity.stock` với số dư tính từ sổ kho.
+    Trả về danh sách (stock_id, số dư hiện tại, số dư theo sổ kho) bị lệch; `fix=True`
+    thì ghi lại số dư theo sổ kho (sổ kho là nguồn đúng).
+    """
+    mismatches = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            stocks = StockQuantity.objects.filter(id__gt=last_id).order_by('id')
+            if fix:
+                # Khóa các dòng tồn kho của lô để số dư và sổ kho không đổi trong lúc so sánh
+                stocks = stocks.select_for_update()
+            # Ở chế độ hot SKU số dư gồm cả các bộ đếm con
+            shard_total = StockShard.objects.filter(stock=OuterRef('pk')).values('stock').annotate(
+                total=Sum('quantity')
+            ).values('total')
+            current = dict(
+                stocks.annotate(balance=F('stock') + Coalesce(Subquery(shard_total), 0))
+                .values_list('id', 'balance')[:batch_size]
+            )
+            if not current:
+                break
+            last_id = max(current)
+            expected = ledger_balances(current.keys())
+            batch = [(stock_id, stock, expected[stock_id]) for stock_id, stock in current.items() if stock != expected[stock_id]]
+            if batch and fix:
+                # Phần lệch được cộng vào phần chưa chia, không động tới các bộ đếm con
+                StockQuantity.objects.filter(pk__in=[stock_id for stock_id, _, _ in batch]).update(
+                    stock=F('stock') + Case(*[When(pk=stock_id, then=Value(ledger - balance)) for stock_id, balance, ledger in batch])
+                )
+                _notify_availability([stock_id for stock_id, _, _ in batch])
+        mismatches.extend(batch)
+    return mismatches
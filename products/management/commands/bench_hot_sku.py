@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from products import inventory
+from products.models import Color, Product, Size, StockQuantity
+
+BENCH_ID = 'BENCHHOT'
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thông lượng trừ tồn kho đồng thời trên một biến thể với số bộ đếm con khác nhau. "
+        "Nên chạy trên MySQL: SQLite chỉ cho một luồng ghi tại một thời điểm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='0,2,4,8,16', help="Danh sách số bộ đếm con, 0 là chế độ thường")
+        parser.add_argument('--threads', type=int, default=32, help="Số luồng checkout đồng thời")
+        parser.add_argument('--orders', type=int, default=2000, help="Số lần trừ tồn kho mỗi lượt đo")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        orders = options['orders']
+        self.stdout.write(f"{'shards':>8} {'orders/s':>10} {'failed':>8}  ({connection.vendor}, {threads} luồng)")
+        for shard_count in [int(value) for value in options['shards'].split(',')]:
+            stock = self._setup(orders)
+            try:
+                if shard_count:
+                    inventory.enable_hot_mode(stock.id, shard_count)
+                elapsed, failed = self._run(stock.id, shard_count, threads, orders)
+            finally:
+                Product.objects.filter(product_id=BENCH_ID).delete()
+            self.stdout.write(f"{shard_count:>8} {orders / elapsed:>10.1f} {failed:>8}")
+        Color.objects.filter(color_id=BENCH_ID).delete()
+        Size.objects.filter(size_id=BENCH_ID).delete()
+
+    def _setup(self, orders):
+        color, _ = Color.objects.get_or_create(color_id=BENCH_ID, defaults={'name': BENCH_ID, 'slug': 'bench-hot-color'})
+        size, _ = Size.objects.get_or_create(size_id=BENCH_ID, defaults={'name': BENCH_ID, 'slug': 'bench-hot-size'})
+        product = Product.objects.create(product_id=BENCH_ID, name=BENCH_ID, import_price=0, sell_price=0)
+        stock = StockQuantity(product=product, color=color, size=size, stock=orders)
+        stock.save()
+        return stock
+
+    def _run(self, stock_id, shard_count, threads, orders):
+        def checkout(_):
+            try:
+                inventory.sell(stock_id, 1, BENCH_ID, shard_count=shard_count)
+                return True
+            except Exception:
+                return False
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(checkout, range(orders)))
+        return time.perf_counter() - started, results.count(False)
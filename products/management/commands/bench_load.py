@@ -0,0 +1,313 @@
+import csv
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from cart.models import OrderLine
+from products import inventory
+from products.models import Category, InventoryMovement, Product, StockQuantity
+from user.models import IdSequence, User
+
+# Tỉ trọng các loại request, gần với lưu lượng thật: chủ yếu là xem hàng
+TRAFFIC_MIX = {
+    'browse_new': 8,
+    'browse_category': 10,
+    'categories': 4,
+    'search': 10,
+    'product_detail': 25,
+    'product_reviews': 6,
+    'related': 5,
+    'recommend': 5,
+    'cart_add': 12,
+    'checkout': 5,
+    'review_post': 3,
+}
+BENCH_USERS = 50
+BENCH_STOCK = 1_000_000
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo tải đầu-cuối: nạp CSDL SQLite từ data/*.csv rồi chạy hỗn hợp request (xem hàng, tìm kiếm, "
+        "chi tiết, liên quan, gợi ý, thêm giỏ, đặt hàng, đánh giá) qua Django test client hoặc server "
+        "đang chạy (--url). Ghi báo cáo JSON p50/p95/p99, thông lượng và số truy vấn mỗi request theo "
+        "endpoint, so sánh được giữa các commit (--compare). "
+        "Chạy với DJANGO_SETTINGS_MODULE=shop_vivu.bench_settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Số request được đo")
+        parser.add_argument('--warmup', type=int, default=100, help="Số request làm nóng, không tính vào kết quả")
+        parser.add_argument('--seed', type=int, default=42, help="Hạt giống ngẫu nhiên: cùng seed cho cùng chuỗi request")
+        parser.add_argument('--url', help="Đo server đang chạy (cùng CSDL bench) thay vì test client")
+        parser.add_argument('--concurrency', type=int, default=1, help="Số request đồng thời khi dùng --url")
+        parser.add_argument('--reuse-db', action='store_true', help="Dùng lại CSDL đã nạp thay vì nạp lại từ đầu")
+        parser.add_argument('--output', help="Ghi báo cáo JSON vào file này")
+        parser.add_argument('--compare', help="Báo cáo JSON cũ để so sánh")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("bench_load chỉ chạy trên CSDL SQLite riêng: DJANGO_SETTINGS_MODULE=shop_vivu.bench_settings")
+        if not options['reuse_db']:
+            self._seed()
+        self._load_pools()
+
+        seed = options['seed']
+        send = self._http_sender(options['url']) if options['url'] else self._client_sender()
+        concurrency = options['concurrency'] if options['url'] else 1
+
+        def run(index):
+            rng = random.Random(f'{seed}:{index}')
+            scenario = rng.choices(list(TRAFFIC_MIX), weights=list(TRAFFIC_MIX.values()))[0]
+            method, path, body, user = getattr(self, f'_{scenario}')(rng)
+            started = time.perf_counter()
+            status, queries = send(method, path, body, self.tokens[user])
+            return scenario, status, (time.perf_counter() - started) * 1000, queries
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run, range(-options['warmup'], 0)))
+            started = time.perf_counter()
+            results = list(pool.map(run, range(options['requests'])))
+            duration = time.perf_counter() - started
+
+        report = self._report(results, duration, options)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True) + '\n')
+        self._print(report, json.loads(Path(options['compare']).read_text()) if options['compare'] else None)
+
+    # Dữ liệu
+
+    def _seed(self):
+        name = settings.DATABASES['default']['NAME']
+        connection.close()
+        if os.path.exists(name):
+            os.remove(name)
+        call_command('migrate', verbosity=0, skip_checks=True)
+
+        # Người dùng được nhắc tới trong review.csv phải có trước khi nạp đánh giá
+        data_dir = Path(settings.BASE_DIR) / 'data'
+        with open(data_dir / 'review.csv', newline='', encoding='utf-8-sig') as csv_file:
+            user_ids = {row['user'] for row in csv.DictReader(csv_file)}
+        user_ids.update(f'KH{n:04d}' for n in range(1, BENCH_USERS + 1))
+        password = make_password('bench')
+        users = User.objects.bulk_create([
+            User(user_id=user_id, email=f'{user_id.lower()}@bench.local', full_name=f'Khách {user_id}', password=password)
+            for user_id in sorted(user_ids)
+        ])
+        Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+        IdSequence.objects.filter(name='KH').update(next_value=max(int(user_id[2:]) for user_id in user_ids))
+
+        call_command('load_catalog', dir=str(data_dir), stdout=self.stdout)
+        # Tồn kho đủ lớn để đặt hàng không thất bại vì hết hàng giữa chừng
+        stock = dict(StockQuantity.objects.values_list('id', 'stock'))
+        inventory.record_many({stock_id: BENCH_STOCK - value for stock_id, value in stock.items()}, InventoryMovement.ADJUSTMENT, 'bench_load')
+
+    def _load_pools(self):
+        self.tokens = dict(Token.objects.values_list('user_id', 'key'))
+        self.users = sorted(self.tokens)
+        self.products = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        self.categories = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+        self.words = sorted({
+            word for name in Product.objects.values_list('name', flat=True) for word in name.lower().split() if len(word) >= 3
+        })
+        # Chỉ các biến thể có màu/kích cỡ thuộc sản phẩm (checkout kiểm tra điều này)
+        colors = set(Product.color.through.objects.values_list('product_id', 'color_id'))
+        sizes = set(Product.size.through.objects.values_list('product_id', 'size_id'))
+        self.variants = [
+            (product_id, color_id, size_id)
+            for product_id, color_id, size_id in StockQuantity.objects.order_by('pk').values_list('product_id', 'color_id', 'size_id')
+            if (product_id, color_id) in colors and (product_id, size_id) in sizes
+        ]
+        if not (self.users and self.products and self.variants):
+            raise CommandError("CSDL bench chưa có dữ liệu: chạy lại không kèm --reuse-db")
+
+    # Các loại request: trả về (method, path, body, user_id)
+
+    def _browse_new(self, rng):
+        return 'GET', '/api/products/new/', None, rng.choice(self.users)
+
+    def _browse_category(self, rng):
+        return 'GET', f'/api/products/by-category/{rng.choice(self.categories)}/', None, rng.choice(self.users)
+
+    def _categories(self, rng):
+        return 'GET', '/api/categories/', None, rng.choice(self.users)
+
+    def _search(self, rng):
+        return 'GET', f'/api/products/search/?q={urllib.parse.quote(rng.choice(self.words))}', None, rng.choice(self.users)
+
+    def _product_detail(self, rng):
+        return 'GET', f'/api/product/{rng.choice(self.products)}/', None, rng.choice(self.users)
+
+    def _product_reviews(self, rng):
+        return 'GET', f'/api/reviews/product/{rng.choice(self.products)}/', None, rng.choice(self.users)
+
+    def _related(self, rng):
+        return 'GET', f'/api/related_products/{rng.choice(self.products)}/', None, rng.choice(self.users)
+
+    def _recommend(self, rng):
+        user = rng.choice(self.users)
+        return 'GET', f'/api/recommend/{user}/', None, user
+
+    def _cart_add(self, rng):
+        product_id, color_id, size_id = rng.choice(self.variants)
+        body = {'product_id': product_id, 'color_id': color_id, 'size_id': size_id, 'quantity': 1}
+        return 'POST', '/cart/add/', body, rng.choice(self.users)
+
+    def _checkout(self, rng):
+        items = [
+            {'product_id': product_id, 'color_id': color_id, 'size_id': size_id, 'quantity': rng.randint(1, 3)}
+            for product_id, color_id, size_id in rng.sample(self.variants, rng.randint(1, 3))
+        ]
+        user = rng.choice(self.users)
+        # Số điện thoại là duy nhất theo người dùng
+        body = {
+            'items': items, 'full_name': f'Khách {user}', 'phone': f'09{int(user[2:]):08d}', 'address': 'Hà Nội',
+            'payment_method': 'cash_on_delivery',
+        }
+        return 'POST', '/cart/create_order/', body, user
+
+    def _review_post(self, rng):
+        lines = list(OrderLine.objects.filter(status_review=0).order_by('pk').values_list('orderline_id', 'product_id', 'order__user_id')[:50])
+        if not lines:
+            return self._product_detail(rng)
+        orderline_id, product_id, user = rng.choice(lines)
+        body = {'orderline_id': orderline_id, 'product_id': product_id, 'rating': rng.randint(1, 5), 'comment': 'Bench'}
+        return 'POST', '/api/reviews/', body, user
+
+    # Gửi request
+
+    def _client_sender(self):
+        client = Client(raise_request_exception=False)
+
+        def send(method, path, body, token):
+            headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+            if method == 'GET':
+                response = client.get(path, **headers)
+            else:
+                response = client.post(path, data=json.dumps(body), content_type='application/json', **headers)
+            return response.status_code, self._queries(response.get('Server-Timing', ''))
+        return send
+
+    def _http_sender(self, base_url):
+        def send(method, path, body, token):
+            request = urllib.request.Request(
+                base_url.rstrip('/') + path, method=method,
+                data=json.dumps(body).encode() if body is not None else None,
+                headers={'Authorization': f'Token {token}', 'Content-Type': 'application/json'},
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    return response.status, self._queries(response.headers.get('Server-Timing', ''))
+            except urllib.error.HTTPError as error:
+                return error.code, self._queries(error.headers.get('Server-Timing', ''))
+        return send
+
+    @staticmethod
+    def _queries(server_timing):
+        # Số truy vấn do RequestMetricsMiddleware ghi trong header Server-Timing
+        match = SERVER_TIMING_QUERIES.search(server_timing)
+        return int(match.group(1)) if match else None
+
+    # Báo cáo
+
+    def _report(self, results, duration, options):
+        by_scenario = defaultdict(list)
+        for scenario, status, latency, queries in results:
+            by_scenario[scenario].append((status, latency, queries))
+
+        endpoints = {}
+        for scenario, rows in sorted(by_scenario.items()):
+            latencies = [latency for _, latency, _ in rows]
+            queries = [count for _, _, count in rows if count is not None]
+            endpoints[scenario] = {
+                'count': len(rows),
+                'errors': sum(status >= 400 for status, _, _ in rows),
+                'statuses': {str(status): count for status, count in sorted(Counter(status for status, _, _ in rows).items())},
+                'mean_ms': round(statistics.fmean(latencies), 2),
+                'p50_ms': round(_percentile(latencies, 50), 2),
+                'p95_ms': round(_percentile(latencies, 95), 2),
+                'p99_ms': round(_percentile(latencies, 99), 2),
+                'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+            }
+        all_queries = [count for _, _, _, count in results if count is not None]
+        return {
+            'meta': {
+                'commit': self._commit(),
+                'target': options['url'] or 'test-client',
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'] if options['url'] else 1,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'summary': {
+                'duration_s': round(duration, 3),
+                'throughput_rps': round(len(results) / duration, 2),
+                'errors': sum(status >= 400 for _, status, _, _ in results),
+                'p50_ms': round(_percentile([row[2] for row in results], 50), 2),
+                'p95_ms': round(_percentile([row[2] for row in results], 95), 2),
+                'p99_ms': round(_percentile([row[2] for row in results], 99), 2),
+                'queries_per_request': round(statistics.fmean(all_queries), 2) if all_queries else None,
+            },
+            'endpoints': endpoints,
+        }
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _print(self, report, previous=None):
+        def cell(row, old, key):
+            value = row[key]
+            if value is None:
+                return '-'
+            if old.get(key) is None:
+                return f'{value:.1f}'
+            return f'{value:.1f} ({value - old[key]:+.1f})'
+
+        old_endpoints = previous['endpoints'] if previous else {}
+        columns = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+        self.stdout.write(f"{'endpoint':<16} {'n':>5} {'lỗi':>5} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'truy vấn/req':>16}")
+        for scenario, row in report['endpoints'].items():
+            old = old_endpoints.get(scenario, {})
+            cells = ' '.join(f'{cell(row, old, key):>16}' for key in columns)
+            self.stdout.write(f"{scenario:<16} {row['count']:>5} {row['errors']:>5} {cells}")
+        summary = report['summary']
+        old = previous['summary'] if previous else {}
+        self.stdout.write(
+            f"Tổng: {cell(summary, old, 'throughput_rps')} req/s, p95 {cell(summary, old, 'p95_ms')} ms, "
+            f"{summary['errors']} lỗi, {cell(summary, old, 'queries_per_request')} truy vấn/request"
+        )
@@ -0,0 +1,80 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh thông lượng và độ trễ các API danh mục giữa server WSGI và ASGI đang chạy. "
+        "Ví dụ khởi động hai server trên cùng một CSDL: "
+        "`gunicorn shop_vivu.wsgi -w 4 -b :8000` và "
+        "`gunicorn shop_vivu.asgi -k uvicorn.workers.UvicornWorker -w 4 -b :8001` "
+        "(asgi.py tự bật ASYNC_CATALOG), rồi chạy "
+        "`manage.py bench_servers --wsgi-url http://localhost:8000 --asgi-url http://localhost:8001 --token <key>`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help="Địa chỉ gốc của server WSGI")
+        parser.add_argument('--asgi-url', help="Địa chỉ gốc của server ASGI")
+        parser.add_argument(
+            '--path', action='append',
+            help="Đường dẫn cần đo, lặp lại được (mặc định: api/products/, api/products/new/, api/categories/, api/banners/)",
+        )
+        parser.add_argument('--token', help="Token xác thực; access token ký số thì truyền kèm --keyword Bearer")
+        parser.add_argument('--keyword', default='Token', help="Tiền tố header Authorization")
+        parser.add_argument('--concurrency', type=int, default=32, help="Số request đồng thời")
+        parser.add_argument('--requests', type=int, default=1000, help="Số request mỗi đường dẫn")
+
+    def handle(self, *args, **options):
+        servers = [(name, options[f'{name}_url']) for name in ('wsgi', 'asgi') if options[f'{name}_url']]
+        if not servers:
+            raise CommandError("Cần ít nhất một trong --wsgi-url, --asgi-url")
+        paths = options['path'] or ['api/products/', 'api/products/new/', 'api/categories/', 'api/banners/']
+        headers = {'Authorization': f"{options['keyword']} {options['token']}"} if options['token'] else {}
+
+        self.stdout.write(
+            f"{'server':<6} {'đường dẫn':<24} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lỗi':>6}"
+            f"  ({options['concurrency']} đồng thời, {options['requests']} request)"
+        )
+        for path in paths:
+            for name, base_url in servers:
+                url = f"{base_url.rstrip('/')}/{path.lstrip('/')}"
+                elapsed, latencies, errors = self._run(url, headers, options['concurrency'], options['requests'])
+                if not latencies:
+                    self.stdout.write(f"{name:<6} {path:<24} {'-':>9} {'-':>8} {'-':>8} {'-':>8} {errors:>6}")
+                    continue
+                p50, p95, p99 = self._percentiles(latencies)
+                self.stdout.write(
+                    f"{name:<6} {path:<24} {len(latencies) / elapsed:>9.1f} "
+                    f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {errors:>6}"
+                )
+
+    def _run(self, url, headers, concurrency, count):
+        def fetch(_):
+            request = urllib.request.Request(url, headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                return None
+            return (time.perf_counter() - started) * 1000
+
+        fetch(None)  # làm nóng (kết nối CSDL, cache của worker)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(fetch, range(count)))
+            elapsed = time.perf_counter() - started
+        latencies = [latency for latency in results if latency is not None]
+        return elapsed, latencies, len(results) - len(latencies)
+
+    @staticmethod
+    def _percentiles(latencies):
+        if len(latencies) == 1:
+            return latencies * 3
+        cuts = statistics.quantiles(latencies, n=100)
+        return cuts[49], cuts[94], cuts[98]
@@ -0,0 +1,191 @@
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench_load import Command as BenchLoadCommand
+
+# Thư viện nặng của phần gợi ý: chỉ được nạp khi dùng tới sản phẩm liên quan/gợi ý. numpy (openpyxl qua
+# django-import-export) và requests (rest_framework.compat) vẫn do thư viện khác nạp lúc khởi động.
+HEAVY_MODULES = ['sklearn', 'scipy', 'numpy', 'pandas', 'joblib', 'surprise', 'requests']
+DEFAULT_PATHS = ['api/products/', 'api/recommend/{user_id}/']
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+# Chạy trong một tiến trình mới: đo django.setup(), nạp URLconf, nạp task Celery và request đầu tiên
+# tới từng đường dẫn qua test client. In kết quả JSON ở dòng cuối.
+FIRST_REQUEST_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+import shop_vivu  # shop_vivu/celery.py gọi django.setup(), như khi chạy manage.py
+django.setup()
+from django.test import Client
+from django.urls import get_resolver
+from rest_framework.authtoken.models import Token
+
+def heavy():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+def elapsed(since):
+    return round((time.perf_counter() - since) * 1000, 2)
+
+result = {'setup_ms': elapsed(started)}
+step = time.perf_counter()
+get_resolver().url_patterns
+result['urlconf_ms'] = elapsed(step)
+step = time.perf_counter()
+from shop_vivu.celery import app
+app.loader.import_default_modules()
+result['celery_tasks_ms'] = elapsed(step)
+result['heavy_after_startup'] = heavy()
+result['startup_ms'] = elapsed(started)
+
+token = Token.objects.select_related('user').first()
+client = Client(headers={'Authorization': f'Token {token.key}'} if token else {})
+user_id = token.user.user_id if token else ''
+result['requests'] = []
+for path in PATHS:
+    url = '/' + path.format(user_id=user_id).lstrip('/')
+    timings = []
+    for _ in range(2):
+        step = time.perf_counter()
+        status = client.get(url).status_code
+        timings.append(elapsed(step))
+    result['requests'].append({'path': path, 'status': status, 'first_ms': timings[0], 'warm_ms': timings[1]})
+result['heavy_after_requests'] = heavy()
+print(json.dumps(result))
+'''
+
+
+def _median(values):
+    return round(statistics.median(values), 2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian khởi động: `manage.py check` trong tiến trình mới (lạnh), các module import tốn thời gian nhất, "
+        "django.setup()/URLconf/task Celery và request đầu tiên. Ghi thêm một dòng vào file lịch sử JSONL (--history) "
+        "và so sánh với lần đo trước để theo dõi qua các commit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Số lần chạy mỗi phép đo (lấy trung vị)")
+        parser.add_argument('--path', action='append', help="Đường dẫn cho request đầu tiên ({user_id}: người dùng có token), lặp lại được")
+        parser.add_argument('--top', type=int, default=10, help="Số module import lâu nhất được liệt kê")
+        parser.add_argument('--history', help="File JSONL lưu kết quả các lần đo; so sánh với dòng cuối")
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        paths = options['path'] or DEFAULT_PATHS
+        check_ms = [self._time_check() for _ in range(runs)]
+        first_requests = [self._first_request(paths) for _ in range(runs)]
+
+        report = {
+            'meta': {
+                'commit': BenchLoadCommand._commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'settings': os.environ.get('DJANGO_SETTINGS_MODULE'),
+                'runs': runs,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'check_ms': _median(check_ms),
+            'setup_ms': _median([run['setup_ms'] for run in first_requests]),
+            'urlconf_ms': _median([run['urlconf_ms'] for run in first_requests]),
+            'celery_tasks_ms': _median([run['celery_tasks_ms'] for run in first_requests]),
+            'startup_ms': _median([run['startup_ms'] for run in first_requests]),
+            'heavy_after_startup': first_requests[-1]['heavy_after_startup'],
+            'heavy_after_requests': first_requests[-1]['heavy_after_requests'],
+            'requests': [
+                {
+                    'path': path,
+                    'status': first_requests[-1]['requests'][index]['status'],
+                    'first_ms': _median([run['requests'][index]['first_ms'] for run in first_requests]),
+                    'warm_ms': _median([run['requests'][index]['warm_ms'] for run in first_requests]),
+                }
+                for index, path in enumerate(paths)
+            ],
+            'slowest_imports': self._slowest_imports(options['top']),
+        }
+
+        previous = None
+        if options['history']:
+            history = Path(options['history'])
+            if history.exists():
+                lines = history.read_text().splitlines()
+                previous = json.loads(lines[-1]) if lines else None
+            with history.open('a') as history_file:
+                history_file.write(json.dumps(report, ensure_ascii=False, sort_keys=True) + '\n')
+        self._print(report, previous)
+
+    # Đo
+
+    def _run(self, args):
+        # Cùng môi trường (DJANGO_SETTINGS_MODULE, PYTHONPATH) với lệnh đang chạy
+        result = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if result.returncode:
+            raise CommandError(f"`python {' '.join(args)[:60]}` lỗi:\n{result.stderr[-2000:]}")
+        return result
+
+    def _time_check(self):
+        started = time.perf_counter()
+        self._run(['manage.py', 'check'])
+        return (time.perf_counter() - started) * 1000
+
+    def _first_request(self, paths):
+        script = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nPATHS = {paths!r}\n' + FIRST_REQUEST_SCRIPT
+        return json.loads(self._run(['-c', script]).stdout.strip().splitlines()[-1])
+
+    def _slowest_imports(self, top):
+        """Module cấp cao nhất tốn thời gian import nhất khi chạy `manage.py check` (theo `python -X importtime`)."""
+        stderr = self._run(['-X', 'importtime', 'manage.py', 'check']).stderr
+        totals = []
+        for line in stderr.splitlines():
+            match = IMPORT_TIME.match(line)
+            if match and not match.group(3):
+                totals.append((int(match.group(2)), match.group(4)))
+        totals.sort(reverse=True)
+        return [{'module': name, 'ms': round(micros / 1000, 1)} for micros, name in totals[:top]]
+
+    # Báo cáo
+
+    def _print(self, report, previous=None):
+        previous = previous or {}
+
+        def cell(value, old):
+            if old is None:
+                return f'{value:.0f} ms'
+            return f'{value:.0f} ms ({value - old:+.0f})'
+
+        for key, label in [
+            ('check_ms', 'manage.py check (lạnh)'),
+            ('setup_ms', 'django.setup()'),
+            ('urlconf_ms', 'nạp URLconf'),
+            ('celery_tasks_ms', 'nạp task Celery'),
+            ('startup_ms', 'khởi động tới request đầu'),
+        ]:
+            self.stdout.write(f"{label:<28} {cell(report[key], previous.get(key))}")
+        old_requests = {row['path']: row for row in previous.get('requests', [])}
+        for row in report['requests']:
+            old = old_requests.get(row['path'], {})
+            self.stdout.write(
+                f"GET {row['path']:<24} [{row['status']}] đầu tiên {cell(row['first_ms'], old.get('first_ms'))}, "
+                f"lần sau {cell(row['warm_ms'], old.get('warm_ms'))}"
+            )
+        self.stdout.write(f"Thư viện nặng đã nạp khi khởi động: {', '.join(report['heavy_after_startup']) or 'không'}")
+        self.stdout.write(f"Sau các request: {', '.join(report['heavy_after_requests']) or 'không'}")
+        self.stdout.write("Import lâu nhất:")
+        for row in report['slowest_imports']:
+            self.stdout.write(f"  {row['ms']:>8.1f} ms  {row['module']}")
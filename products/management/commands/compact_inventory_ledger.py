@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from products import inventory
+
+
+class Command(BaseCommand):
+    help = "Gộp các dòng sổ kho cũ vào số dư đã chốt (InventorySnapshot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30, help="Chỉ gộp các dòng cũ hơn số ngày này")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Số biến thể mỗi lô")
+
+    def handle(self, *args, **options):
+        compacted = inventory.compact(
+            older_than=timedelta(days=options['older_than_days']),
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Đã gộp {compacted} dòng sổ kho."))
@@ -0,0 +1,538 @@
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from cart.models import Order, OrderLine
+from products.management.commands.load_catalog import CATALOG_FILES, _batches, _names, _read_csv
+from products.models import Category, Color, Image, InventoryMovement, Product, Review, Size, StockQuantity
+from shop_vivu.ids import SEQUENCES
+from user.models import IdSequence, User
+
+# Cột được ghi cho từng bảng, theo thứ tự giá trị trong mỗi dòng sinh ra
+TABLES = {
+    'user': (User, ['user_id', 'full_name', 'email', 'password', 'gender', 'phone', 'address', 'role',
+                    'is_active', 'is_staff', 'is_superuser', 'created_at', 'updated_at']),
+    'product': (Product, ['product_id', 'name', 'import_price', 'sell_price', 'description', 'created_at', 'updated_at']),
+    'product_category': (Product.category.through, ['product', 'category']),
+    'product_color': (Product.color.through, ['product', 'color']),
+    'product_size': (Product.size.through, ['product', 'size']),
+    'image': (Image, ['id', 'url', 'product', 'created_at', 'updated_at']),
+    'stock': (StockQuantity, ['id', 'stock', 'size', 'color', 'product', 'shard_count']),
+    'movement': (InventoryMovement, ['id', 'stock', 'kind', 'quantity', 'reference', 'created_at']),
+    'order': (Order, ['order_id', 'user', 'status', 'note', 'total_price', 'payment_method', 'created_at', 'updated_at']),
+    'orderline': (OrderLine, ['orderline_id', 'order', 'product', 'color', 'size', 'quantity', 'created_at', 'updated_at',
+                              'status_review', 'unit_price', 'product_name', 'color_name', 'size_name']),
+    'review': (Review, ['review_id', 'product', 'user', 'rating', 'comment', 'created_at', 'updated_at']),
+}
+# Các bước sinh theo thứ tự khóa ngoại: bảng được ghi trong mỗi bước
+PHASES = {
+    'users': ['user'],
+    'products': ['product', 'product_category', 'product_color', 'product_size', 'image', 'stock', 'movement'],
+    'orders': ['order', 'orderline'],
+    'reviews': ['review'],
+}
+
+ORDER_STATUSES = {'delivered': 70, 'cancelled': 10, 'shipped': 8, 'confirmed': 6, 'pending': 6}
+PAYMENT_METHODS = {'cash_on_delivery': 65, 'bank_transfer': 35}
+LINES_PER_ORDER = {1: 45, 2: 28, 3: 15, 4: 8, 5: 4}
+QUANTITIES = {1: 80, 2: 15, 3: 5}
+# Số đơn/đánh giá theo khách hàng cũng lệch (số mũ nhỏ hơn độ phổ biến sản phẩm)
+USER_ACTIVITY_EXPONENT = 0.8
+PRICE_JITTER = 0.15
+PASSWORD = 'shopvivu123'
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương']
+GIVEN_NAMES = {
+    'Female': (['Thị', 'Ngọc', 'Thu', 'Minh', 'Thanh', 'Phương'],
+               ['Anh', 'Trang', 'Linh', 'Hương', 'Lan', 'Mai', 'Hà', 'Ngân', 'Vy', 'Thảo', 'Nhung', 'Yến']),
+    'Male': (['Văn', 'Minh', 'Đức', 'Quốc', 'Thanh', 'Hữu'],
+             ['Nam', 'Hùng', 'Dũng', 'Tuấn', 'Long', 'Sơn', 'Khoa', 'Phúc', 'Hiếu', 'Quân', 'Bảo', 'Huy']),
+}
+# Khách hàng của cửa hàng thời trang nữ: phần lớn là nữ
+GENDERS = {'Female': 82, 'Male': 15, 'Other': 3}
+CITIES = ['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Huế', 'Nha Trang', 'Biên Hòa', 'Vinh', 'Quy Nhơn']
+STREETS = ['Lê Lợi', 'Trần Hưng Đạo', 'Nguyễn Trãi', 'Hai Bà Trưng', 'Lý Thường Kiệt', 'Điện Biên Phủ', 'Quang Trung', 'Bạch Đằng']
+
+_job = None
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class ZipfSampler:
+    """Chọn chỉ số 0..n-1 theo phân phối Zipf; hạng phổ biến được xáo trộn để không trùng thứ tự mã."""
+
+    def __init__(self, n, exponent, seed):
+        weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+        self.order = np.random.default_rng(seed).permutation(n)
+
+    def sample(self, rng, size):
+        ranks = np.searchsorted(self.cdf, rng.random(size), side='right')
+        return self.order[np.minimum(ranks, len(self.order) - 1)]
+
+
+class DatasetProfile:
+    """Phân phối lấy từ data/*.csv: sản phẩm mẫu (danh mục, kích cỡ, giá, ảnh), màu, tồn kho, số sao, bình luận."""
+
+    def __init__(self, directory):
+        files = {
+            kind: next((directory / name for name in candidates if (directory / name).exists()), None)
+            for kind, candidates in CATALOG_FILES
+        }
+        if files['product'] is None:
+            raise CommandError(f"Không tìm thấy products.csv trong {directory}")
+        color_ids = dict(Color.objects.values_list('name', 'color_id'))
+        size_ids = dict(Size.objects.values_list('name', 'size_id'))
+        category_ids = dict(Category.objects.values_list('name', 'category_id'))
+        if not (color_ids and size_ids and category_ids):
+            raise CommandError("Chưa có màu/kích cỡ/danh mục trong CSDL: chạy load_catalog trước")
+        self.color_names = {color_id: name for name, color_id in color_ids.items()}
+        self.size_names = {size_id: name for name, size_id in size_ids.items()}
+
+        images = defaultdict(list)
+        if files['image'] is not None:
+            for row in _read_csv(files['image']):
+                images[row['product']].append(row['url'])
+        color_counts = Counter()
+        self.templates = []
+        for row in _read_csv(files['product']):
+            colors = [color_ids[name] for name in _names(row['color']) if name in color_ids]
+            sizes = [size_ids[name] for name in _names(row['size']) if name in size_ids]
+            categories = [category_ids[name] for name in _names(row['category']) if name in category_ids]
+            if not (colors and sizes and categories):
+                continue
+            color_counts.update(colors)
+            sell_price = Decimal(row['sell_price'])
+            self.templates.append({
+                'name': row['name'], 'description': row.get('description') or None,
+                'sell_price': sell_price, 'import_ratio': Decimal(row['import_price']) / sell_price,
+                'categories': categories, 'sizes': sizes, 'color_count': len(colors),
+                'images': images.get(row['product_id'], [])[:5],
+            })
+        if not self.templates:
+            raise CommandError(f"{files['product'].name} không có sản phẩm nào khớp màu/kích cỡ/danh mục trong CSDL")
+        self.color_weights = dict(color_counts)
+
+        self.stock_values = [int(row['stock']) for row in _read_csv(files['stock'])] if files['stock'] else [10]
+        self.ratings, self.comments = Counter(), defaultdict(list)
+        if files['review'] is not None:
+            for row in _read_csv(files['review']):
+                rating = int(row['rating'])
+                if 1 <= rating <= 5:
+                    self.ratings[rating] += 1
+                    if row.get('comment'):
+                        self.comments[rating].append(row['comment'])
+        if not self.ratings:
+            self.ratings = Counter({5: 60, 4: 25, 3: 10, 2: 3, 1: 2})
+
+        # Số chỗ dành cho mỗi sản phẩm trong dải mã tồn kho/ảnh, để các tiến trình tự tính mã không cần hỏi CSDL
+        self.variant_slots = max(template['color_count'] for template in self.templates) * \
+            max(len(template['sizes']) for template in self.templates)
+        self.image_slots = max(len(template['images']) for template in self.templates) or 1
+
+
+class SqlWriter:
+    """Ghi thẳng vào CSDL bằng INSERT nhiều dòng theo lô."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, table, rows, chunk):
+        model, fields = TABLES[table]
+        fields = [model._meta.get_field(name) for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with connection.cursor() as cursor:
+            for batch in _batches(rows, self.batch_size):
+                cursor.executemany(sql, [
+                    [field.get_db_prep_value(value, connection) for field, value in zip(fields, row)] for row in batch
+                ])
+
+
+class TsvWriter:
+    """Ghi file TSV theo định dạng mặc định của `LOAD DATA INFILE` (MySQL), mỗi bảng một thư mục."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def _format(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+    def write(self, table, rows, chunk):
+        model, fields = TABLES[table]
+        fields = [model._meta.get_field(name) for name in fields]
+        path = self.directory / table / f'{chunk:06d}.tsv'
+        with open(path, 'w', encoding='utf-8', newline='\n') as tsv_file:
+            for row in rows:
+                values = [field.get_db_prep_value(value, connection) for field, value in zip(fields, row)]
+                tsv_file.write('\t'.join(map(self._format, values)) + '\n')
+
+
+def _init_worker(job):
+    global _job
+    job['products'] = ZipfSampler(job['counts']['products'], job['zipf'], [job['seed'], 1])
+    job['users'] = ZipfSampler(job['counts']['users'], USER_ACTIVITY_EXPONENT, [job['seed'], 2])
+    job['writer'] = TsvWriter(job['out']) if job['format'] == 'tsv' else SqlWriter(job['batch_size'])
+    _job = job
+    _product.cache_clear()
+
+
+def _format_id(prefix, number):
+    return f"{prefix}{number:0{SEQUENCES[prefix][0]}d}" if prefix in SEQUENCES else f"{prefix}{number:07d}"
+
+
+def _created_at(kind, index):
+    """Mã tăng dần theo thời gian tạo: bản ghi đầu dải được tạo `days` ngày trước, bản ghi cuối gần hiện tại."""
+    count = _job['counts'][kind]
+    return _job['started'] - _job['span'] * (1 - (index + random.Random(f"{_job['seed']}:{kind}:{index}").random()) / count)
+
+
+@lru_cache(maxsize=200_000)
+def _product(index):
+    """Thuộc tính sản phẩm thứ `index`, tính lại được ở mọi tiến trình từ cùng seed (không cần đọc CSDL)."""
+    profile = _job['profile']
+    rng = random.Random(f"{_job['seed']}:product:{index}")
+    template = profile.templates[rng.randrange(len(profile.templates))]
+    colors = set()
+    while len(colors) < template['color_count']:
+        colors.add(_weighted(rng, profile.color_weights))
+    sell_price = _round_price(template['sell_price'] * Decimal(1 + rng.uniform(-PRICE_JITTER, PRICE_JITTER)))
+    return {
+        'product_id': _format_id('M', _job['bases']['products'] + index + 1),
+        'name': f"{template['name']} #{index + 1}"[:255],
+        'template': template,
+        'colors': sorted(colors),
+        'sell_price': sell_price,
+        'import_price': _round_price(sell_price * template['import_ratio']),
+    }
+
+
+def _round_price(price):
+    # Giá làm tròn tới trăm đồng như giá thật
+    return (price / 100).to_integral_value() * 100
+
+
+def _user_id(index):
+    return _format_id('KH', _job['bases']['users'] + index + 1)
+
+
+def _generate_users(rng, start, stop):
+    rows = []
+    for index in range(start, stop):
+        gender = _weighted(rng, GENDERS)
+        middle_names, given_names = GIVEN_NAMES['Male' if gender == 'Male' else 'Female']
+        full_name = f"{rng.choice(FAMILY_NAMES)} {rng.choice(middle_names)} {rng.choice(given_names)}"
+        created_at = _created_at('users', index)
+        number = _job['bases']['users'] + index + 1
+        rows.append((
+            _user_id(index), full_name, f'kh{number}@example.com', _job['password'], gender, f'+849{number:08d}',
+            f"{rng.randint(1, 500)} {rng.choice(STREETS)}, {rng.choice(CITIES)}", 'Customer',
+            True, False, False, created_at, created_at,
+        ))
+    return {'user': rows}
+
+
+def _generate_products(rng, start, stop):
+    profile, bases = _job['profile'], _job['bases']
+    tables = {table: [] for table in PHASES['products']}
+    for index in range(start, stop):
+        product = _product(index)
+        template, product_id = product['template'], product['product_id']
+        created_at = _created_at('products', index)
+        tables['product'].append((
+            product_id, product['name'], product['import_price'], product['sell_price'],
+            template['description'], created_at, created_at,
+        ))
+        tables['product_category'] += [(product_id, category_id) for category_id in template['categories']]
+        tables['product_color'] += [(product_id, color_id) for color_id in product['colors']]
+        tables['product_size'] += [(product_id, size_id) for size_id in template['sizes']]
+        image_id = bases['images'] + index * profile.image_slots
+        tables['image'] += [
+            (image_id + offset + 1, url, product_id, created_at, created_at) for offset, url in enumerate(template['images'])
+        ]
+        stock_id = bases['stocks'] + index * profile.variant_slots
+        movement_id = bases['movements'] + index * profile.variant_slots
+        variants = [(color_id, size_id) for color_id in product['colors'] for size_id in template['sizes']]
+        for offset, (color_id, size_id) in enumerate(variants, start=1):
+            stock = rng.choice(profile.stock_values)
+            tables['stock'].append((stock_id + offset, stock, size_id, color_id, product_id, 0))
+            # Số dư tồn kho khớp với sổ kho (xem reconcile_inventory)
+            if stock:
+                tables['movement'].append((
+                    movement_id + offset, stock_id + offset, InventoryMovement.ADJUSTMENT, stock, 'generate_dataset', created_at,
+                ))
+    return tables
+
+
+def _order_sizes(chunk, start, stop):
+    # Cùng hạt giống ở tiến trình cha (tính dải mã dòng đơn hàng) và ở tiến trình sinh dữ liệu
+    rng = np.random.default_rng([_job['seed'], 3, chunk])
+    weights = np.array(list(LINES_PER_ORDER.values()), dtype=np.float64)
+    return rng.choice(list(LINES_PER_ORDER), size=stop - start, p=weights / weights.sum())
+
+
+def _generate_orders(rng, start, stop, chunk):
+    profile, bases = _job['profile'], _job['bases']
+    sizes = _order_sizes(chunk, start, stop)
+    sampler = np.random.default_rng([_job['seed'], 4, chunk])
+    products = _job['products'].sample(sampler, int(sizes.sum())).tolist()
+    users = _job['users'].sample(sampler, len(sizes)).tolist()
+    line_number = bases['orderlines'] + _job['line_offsets'][chunk]
+    orders, lines = [], []
+    for position, (index, size) in enumerate(zip(range(start, stop), sizes.tolist())):
+        user_index = users[position]
+        # Đơn hàng đặt sau khi khách hàng đăng ký
+        user_created = _created_at('users', user_index)
+        created_at = user_created + (_job['started'] - user_created) * rng.random()
+        order_id = _format_id('OD', bases['orders'] + index + 1)
+        total = Decimal('0')
+        for _ in range(size):
+            product = _product(products.pop())
+            color_id = rng.choice(product['colors'])
+            size_id = rng.choice(product['template']['sizes'])
+            quantity = _weighted(rng, QUANTITIES)
+            total += product['sell_price'] * quantity
+            line_number += 1
+            lines.append((
+                _format_id('OL', line_number), order_id, product['product_id'], color_id, size_id, quantity,
+                created_at, created_at, 0, product['sell_price'], product['name'],
+                profile.color_names[color_id], profile.size_names[size_id],
+            ))
+        orders.append((
+            order_id, _user_id(user_index), _weighted(rng, ORDER_STATUSES), '', total,
+            _weighted(rng, PAYMENT_METHODS), created_at, created_at,
+        ))
+    return {'order': orders, 'orderline': lines}
+
+
+def _generate_reviews(rng, start, stop, chunk):
+    profile = _job['profile']
+    sampler = np.random.default_rng([_job['seed'], 5, chunk])
+    products = _job['products'].sample(sampler, stop - start).tolist()
+    users = _job['users'].sample(sampler, stop - start).tolist()
+    rows = []
+    for position, index in enumerate(range(start, stop)):
+        product_index, user_index = products[position], users[position]
+        rating = _weighted(rng, profile.ratings)
+        comments = profile.comments.get(rating)
+        since = max(_created_at('users', user_index), _created_at('products', product_index))
+        created_at = since + (_job['started'] - since) * rng.random()
+        rows.append((
+            _job['bases']['reviews'] + index + 1, _product(product_index)['product_id'], _user_id(user_index),
+            rating, rng.choice(comments) if comments else None, created_at, created_at,
+        ))
+    return {'review': rows}
+
+
+def _run_chunk(task):
+    phase, chunk, start, stop = task
+    rng = random.Random(f"{_job['seed']}:{phase}:{chunk}")
+    if phase == 'users':
+        tables = _generate_users(rng, start, stop)
+    elif phase == 'products':
+        tables = _generate_products(rng, start, stop)
+    elif phase == 'orders':
+        tables = _generate_orders(rng, start, stop, chunk)
+    else:
+        tables = _generate_reviews(rng, start, stop, chunk)
+    with transaction.atomic():
+        for table in PHASES[phase]:
+            _job['writer'].write(table, tables[table], chunk)
+    return {table: len(rows) for table, rows in tables.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Sinh dữ liệu giả lập quy mô lớn (sản phẩm, khách hàng, đơn hàng, đánh giá) để thử tải và kế hoạch truy vấn. "
+        "Giữ phân phối danh mục/màu/kích cỡ/giá/tồn kho/số sao của data/*.csv, độ phổ biến sản phẩm theo Zipf. "
+        "Nhiều tiến trình sinh song song, ghi thẳng vào CSDL hoặc ra file TSV cho LOAD DATA INFILE. "
+        "Cần chạy load_catalog trước (màu, kích cỡ, danh mục)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000, help="Số sản phẩm")
+        parser.add_argument('--users', type=int, default=50_000, help="Số khách hàng")
+        parser.add_argument('--order-lines', type=int, default=200_000, help="Số dòng đơn hàng (xấp xỉ; số đơn suy ra từ số dòng mỗi đơn)")
+        parser.add_argument('--reviews', type=int, default=50_000, help="Số đánh giá")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Số mũ Zipf cho độ phổ biến sản phẩm")
+        parser.add_argument('--days', type=int, default=730, help="Dữ liệu trải đều trong bấy nhiêu ngày gần nhất")
+        parser.add_argument('--seed', type=int, default=42, help="Hạt giống ngẫu nhiên: cùng seed cho cùng dữ liệu")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Số tiến trình sinh dữ liệu")
+        parser.add_argument('--chunk-size', type=int, default=20_000, help="Số bản ghi mỗi phần việc của một tiến trình")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Số dòng mỗi câu INSERT")
+        parser.add_argument('--format', choices=['db', 'tsv'], default='db', help="Ghi vào CSDL hay ra file TSV")
+        parser.add_argument('--out', default='dataset', help="Thư mục ghi file TSV và load.sql (với --format tsv)")
+        parser.add_argument('--dir', default=str(Path(settings.BASE_DIR) / 'data'), help="Thư mục chứa các file CSV mẫu")
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'])
+        if not directory.is_dir():
+            raise CommandError(f"Không tìm thấy thư mục {directory}")
+        workers = max(1, options['workers'])
+        if options['format'] == 'db' and connection.vendor == 'sqlite' and workers > 1:
+            # SQLite chỉ cho một tiến trình ghi tại một thời điểm
+            self.stdout.write("SQLite: ghi bằng 1 tiến trình")
+            workers = 1
+
+        profile = DatasetProfile(directory)
+        mean_lines = sum(size * weight for size, weight in LINES_PER_ORDER.items()) / sum(LINES_PER_ORDER.values())
+        counts = {
+            'users': options['users'], 'products': options['products'],
+            'orders': round(options['order_lines'] / mean_lines), 'reviews': options['reviews'],
+        }
+        if (counts['orders'] or counts['reviews']) and not (counts['users'] and counts['products']):
+            raise CommandError("Sinh đơn hàng/đánh giá cần --users và --products lớn hơn 0")
+        bases = self._bases()
+        for kind, prefix in [('users', 'KH'), ('products', 'M')]:
+            model, fields = TABLES[kind[:-1]]
+            if len(_format_id(prefix, bases[kind] + counts[kind])) > model._meta.get_field(fields[0]).max_length:
+                raise CommandError(f"--{kind} quá lớn so với độ dài mã {model._meta.verbose_name}")
+
+        chunk_size = options['chunk_size']
+        job = {
+            'profile': profile, 'counts': counts, 'bases': bases, 'seed': options['seed'], 'zipf': options['zipf'],
+            'started': timezone.now(), 'span': timedelta(days=options['days']),
+            'password': make_password(PASSWORD), 'format': options['format'], 'out': options['out'],
+            'batch_size': options['batch_size'],
+        }
+        tasks = {
+            phase: [(phase, chunk, start, min(start + chunk_size, counts[phase]))
+                    for chunk, start in enumerate(range(0, counts[phase], chunk_size))]
+            for phase in PHASES
+        }
+        # Dải mã dòng đơn hàng của từng phần việc, để các tiến trình cấp mã OL liên tục mà không trùng nhau
+        _init_worker(job)
+        offsets, total_lines = [], 0
+        for _, chunk, start, stop in tasks['orders']:
+            offsets.append(total_lines)
+            total_lines += int(_order_sizes(chunk, start, stop).sum())
+        job['line_offsets'] = offsets
+        counts['orderlines'] = total_lines
+
+        if options['format'] == 'tsv':
+            for table in TABLES:
+                (Path(options['out']) / table).mkdir(parents=True, exist_ok=True)
+        self.stdout.write(
+            f"Sinh {counts['users']} khách hàng, {counts['products']} sản phẩm, {counts['orders']} đơn hàng "
+            f"({total_lines} dòng), {counts['reviews']} đánh giá bằng {workers} tiến trình..."
+        )
+        total_rows, started = 0, time.perf_counter()
+        pool = None
+        if workers > 1:
+            # Tiến trình con mở kết nối riêng: không được kế thừa kết nối đang mở của tiến trình cha
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers, initializer=_init_worker, initargs=(job,))
+        run = map if pool is None else pool.imap_unordered
+        try:
+            # Các bước chạy lần lượt theo khóa ngoại, trong mỗi bước các phần việc chạy song song
+            for phase, phase_tasks in tasks.items():
+                phase_started, written = time.perf_counter(), Counter()
+                for result in run(_run_chunk, phase_tasks):
+                    written.update(result)
+                elapsed = time.perf_counter() - phase_started
+                rows = sum(written.values())
+                total_rows += rows
+                self.stdout.write(
+                    f"{phase:>9}: {rows} dòng trong {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} dòng/s) "
+                    + ', '.join(f"{table}={count}" for table, count in written.items())
+                )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        sequences = {
+            'KH': bases['users'] + counts['users'], 'OD': bases['orders'] + counts['orders'],
+            'OL': bases['orderlines'] + counts['orderlines'],
+        }
+        if options['format'] == 'tsv':
+            self._write_load_script(Path(options['out']), sequences)
+        else:
+            self._advance_sequences(sequences)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã sinh {total_rows} dòng trong {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} dòng/s). "
+            "Chạy backfill_sales_rollups và rebuild_sales_counters để tính lại bảng doanh thu."
+        ))
+
+    @staticmethod
+    def _bases():
+        """Số cuối đã dùng của mỗi loại mã: dữ liệu sinh ra nối tiếp sau, không trùng dữ liệu đang có."""
+        sequences = dict(IdSequence.objects.values_list('name', 'next_value'))
+
+        def last_number(model, prefix):
+            # Mã cùng tiền tố được đệm số 0: mã dài nhất rồi lớn nhất theo chuỗi là số lớn nhất
+            pk = model.objects.filter(pk__startswith=prefix).order_by(Length('pk').desc(), '-pk').values_list('pk', flat=True).first()
+            return int(pk[len(prefix):]) if pk and pk[len(prefix):].isdigit() else 0
+
+        def last_id(model):
+            return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        return {
+            'users': max(sequences.get('KH', 0), last_number(User, 'KH')),
+            'products': last_number(Product, 'M'),
+            'orders': sequences.get('OD', 0),
+            'orderlines': sequences.get('OL', 0),
+            'images': last_id(Image),
+            'stocks': last_id(StockQuantity),
+            'movements': last_id(InventoryMovement),
+            'reviews': last_id(Review),
+        }
+
+    @staticmethod
+    def _advance_sequences(sequences):
+        with transaction.atomic():
+            for name, value in sequences.items():
+                IdSequence.objects.update_or_create(name=name, defaults={'next_value': value})
+            # PostgreSQL: đưa sequence của khóa tự tăng về sau các mã đã ghi (MySQL/SQLite tự điều chỉnh)
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Image, StockQuantity, InventoryMovement, Review]):
+                    cursor.execute(sql)
+
+    def _write_load_script(self, directory, sequences):
+        quote = connection.ops.quote_name
+        lines = ['SET foreign_key_checks = 0;', 'SET unique_checks = 0;']
+        for tables in PHASES.values():
+            for table in tables:
+                model, fields = TABLES[table]
+                columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+                for path in sorted((directory / table).glob('*.tsv')):
+                    lines.append(
+                        f"LOAD DATA LOCAL INFILE '{path.resolve()}' INTO TABLE {quote(model._meta.db_table)} "
+                        f"CHARACTER SET utf8mb4 ({columns});"
+                    )
+        table = quote(IdSequence._meta.db_table)
+        lines += [
+            f"INSERT INTO {table} (name, next_value) VALUES ('{name}', {value}) "
+            f"ON DUPLICATE KEY UPDATE next_value = GREATEST(next_value, {value});"
+            for name, value in sequences.items()
+        ]
+        lines += ['SET unique_checks = 1;', 'SET foreign_key_checks = 1;']
+        script = directory / 'load.sql'
+        script.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        self.stdout.write(f"Nạp vào MySQL: mysql --local-infile=1 <tên CSDL> < {script}")
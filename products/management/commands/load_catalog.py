@@ -0,0 +1,268 @@
+import csv
+import time
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from products import inventory
+from products.models import (
+    Category, Color, Image, InventoryMovement, Product, Review, Size, StockQuantity, StockShard,
+)
+from user.models import User
+
+# Thứ tự nạp theo phụ thuộc; mỗi loại dữ liệu nhận file đầu tiên tồn tại trong danh sách
+CATALOG_FILES = [
+    ('color', ['color.csv']),
+    ('size', ['size.csv']),
+    ('category', ['categories.csv', 'category.csv']),
+    ('product', ['products.csv']),
+    ('image', ['images.csv', 'image.csv']),
+    ('stock', ['stock.csv']),
+    ('review', ['review.csv']),
+]
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        yield from csv.DictReader(csv_file)
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+MAX_REPORTED_ERRORS = 20
+
+
+def _names(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Nạp danh mục từ các file CSV trong thư mục data/ theo thứ tự phụ thuộc, bằng bulk insert theo lô. "
+        "Chạy lại được: dòng đã có được cập nhật (upsert), không tạo trùng."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(Path(settings.BASE_DIR) / 'data'), help="Thư mục chứa các file CSV")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Số dòng mỗi lô ghi")
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'])
+        if not directory.is_dir():
+            raise CommandError(f"Không tìm thấy thư mục {directory}")
+        self.batch_size = options['batch_size']
+        total_rows, started = 0, time.perf_counter()
+        for kind, candidates in CATALOG_FILES:
+            path = next((directory / name for name in candidates if (directory / name).exists()), None)
+            if path is None:
+                self.stdout.write(f"{kind:>9}: bỏ qua (không có {' / '.join(candidates)})")
+                continue
+            step_started = time.perf_counter()
+            loaded, skipped = getattr(self, f'_load_{kind}')(_read_csv(path))
+            elapsed = time.perf_counter() - step_started
+            total_rows += loaded
+            self.stdout.write(
+                f"{kind:>9}: {loaded} dòng từ {path.name} trong {elapsed:.2f}s "
+                f"({loaded / elapsed if elapsed else 0:.0f} dòng/s), bỏ qua {skipped}"
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã nạp {total_rows} dòng trong {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} dòng/s)."
+        ))
+
+    def _upsert(self, model, objects, unique_field, update_fields):
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size,
+            update_conflicts=True, unique_fields=[unique_field], update_fields=update_fields,
+        )
+
+    def _load_slugged(self, model, id_field, rows):
+        loaded = 0
+        for batch in _batches(rows, self.batch_size):
+            self._upsert(model, [
+                model(**{id_field: row[id_field]}, name=row['name'], slug=slugify(row['name']) or row[id_field].lower())
+                for row in batch
+            ], id_field, ['name', 'updated_at'])
+            loaded += len(batch)
+        return loaded, 0
+
+    def _load_color(self, rows):
+        return self._load_slugged(Color, 'color_id', rows)
+
+    def _load_size(self, rows):
+        return self._load_slugged(Size, 'size_id', rows)
+
+    def _load_category(self, rows):
+        # Danh mục cha phải được ghi trước danh mục con (khóa ngoại tới chính bảng này)
+        pending = list(rows)
+        known = set(Category.objects.values_list('category_id', flat=True))
+        loaded = 0
+        while pending:
+            ready = [row for row in pending if not row.get('parent') or row['parent'] in known]
+            if not ready:
+                break
+            with transaction.atomic():
+                self._upsert(Category, [
+                    Category(category_id=row['category_id'], name=row['name'], parent_id=row.get('parent') or None)
+                    for row in ready
+                ], 'category_id', ['name', 'parent', 'updated_at'])
+            known.update(row['category_id'] for row in ready)
+            loaded += len(ready)
+            pending = [row for row in pending if row['category_id'] not in known]
+        return loaded, len(pending)
+
+    def _load_product(self, rows):
+        # Tên màu/kích cỡ/danh mục được đổi sang mã bằng bảng tra trong bộ nhớ, không truy vấn từng dòng
+        lookups = {
+            'color': (Product.color.through, 'color_id', dict(Color.objects.values_list('name', 'color_id'))),
+            'size': (Product.size.through, 'size_id', dict(Size.objects.values_list('name', 'size_id'))),
+            'category': (Product.category.through, 'category_id', dict(Category.objects.values_list('name', 'category_id'))),
+        }
+        loaded = skipped = 0
+        for batch in _batches(rows, self.batch_size):
+            links = {column: [] for column in lookups}
+            for row in batch:
+                for column, (through, target_field, ids) in lookups.items():
+                    for name in _names(row[column]):
+                        if name in ids:
+                            links[column].append(through(product_id=row['product_id'], **{target_field: ids[name]}))
+                        else:
+                            skipped += 1
+            with transaction.atomic():
+                self._upsert(Product, [
+                    Product(
+                        product_id=row['product_id'], name=row['name'], description=row.get('description') or None,
+                        import_price=Decimal(row['import_price']), sell_price=Decimal(row['sell_price']),
+                    )
+                    for row in batch
+                ], 'product_id', ['name', 'import_price', 'sell_price', 'description', 'updated_at'])
+                for column, (through, _, _) in lookups.items():
+                    through.objects.bulk_create(links[column], batch_size=self.batch_size, ignore_conflicts=True)
+            loaded += len(batch)
+        return loaded, skipped
+
+    def _load_image(self, rows):
+        products = set(Product.objects.values_list('product_id', flat=True))
+        existing = set(Image.objects.values_list('product_id', 'url'))
+        loaded = skipped = 0
+        for batch in _batches(rows, self.batch_size):
+            images = []
+            for row in batch:
+                key = (row['product'], row['url'])
+                if row['product'] not in products or ('id' not in row and key in existing):
+                    skipped += 1
+                    continue
+                existing.add(key)
+                images.append(Image(id=row.get('id') or None, product_id=row['product'], url=row['url']))
+            if 'id' in batch[0]:
+                self._upsert(Image, images, 'id', ['url', 'product', 'updated_at'])
+            else:
+                Image.objects.bulk_create(images, batch_size=self.batch_size)
+            loaded += len(images)
+        return loaded, skipped
+
+    def _validate_stock(self, rows):
+        """Kiểm tra cả file trước khi ghi: màu/kích cỡ phải tồn tại, số lượng là số nguyên, mỗi biến thể một dòng."""
+        known = {
+            'color': set(Color.objects.values_list('color_id', flat=True)),
+            'size': set(Size.objects.values_list('size_id', flat=True)),
+        }
+        seen, errors = {}, []
+        for number, row in enumerate(rows, start=2):
+            unknown = [column for column in known if row.get(column) not in known[column]]
+            if unknown:
+                errors.append(f"Dòng {number}: không tìm thấy {', '.join(unknown)}.")
+            try:
+                if int(row.get('stock')) < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                errors.append(f"Dòng {number}: số lượng không hợp lệ ({row.get('stock')!r}).")
+            key = (row.get('product'), row.get('color'), row.get('size'))
+            if key in seen:
+                errors.append(f"Dòng {number}: trùng biến thể với dòng {seen[key]}.")
+            seen.setdefault(key, number)
+        if errors:
+            more = len(errors) - MAX_REPORTED_ERRORS
+            raise CommandError("stock: file có dòng không hợp lệ, chưa nạp gì.\n" + "\n".join(
+                errors[:MAX_REPORTED_ERRORS] + ([f"... và {more} lỗi khác."] if more > 0 else [])
+            ))
+
+    def _load_stock(self, rows):
+        rows = list(rows)
+        self._validate_stock(rows)
+        products = set(Product.objects.values_list('product_id', flat=True))
+        # File ghi tồn kho có thể bán; ở chế độ hot SKU đó là phần chưa chia + các bộ đếm con
+        shard_total = StockShard.objects.filter(stock=OuterRef('pk')).values('stock').annotate(
+            total=Sum('quantity')
+        ).values('total')
+        variants = {
+            (product_id, color_id, size_id): (stock_id, available, shard_count)
+            for stock_id, product_id, color_id, size_id, available, shard_count
+            in StockQuantity.objects.annotate(available=F('stock') + Coalesce(Subquery(shard_total), 0))
+            .values_list('id', 'product_id', 'color_id', 'size_id', 'available', 'shard_count')
+        }
+        loaded = skipped = 0
+        for batch in _batches(rows, self.batch_size):
+            new, deltas, hot = {}, {}, []
+            for row in batch:
+                key = (row['product'], row['color'], row['size'])
+                if row['product'] not in products:
+                    skipped += 1
+                    continue
+                if key in variants:
+                    stock_id, available, shard_count = variants[key]
+                    deltas[stock_id] = int(row['stock']) - available
+                    if shard_count and deltas[stock_id]:
+                        hot.append(stock_id)
+                else:
+                    new[key] = int(row['stock'])
+            with transaction.atomic():
+                # Số lượng đi qua sổ kho như mọi thay đổi tồn kho khác
+                inventory.record_many(deltas, InventoryMovement.ADJUSTMENT, 'load_catalog')
+                # Phần chênh lệch của hot SKU vào phần chưa chia (có thể âm): chia lại cho các bộ đếm con
+                for stock_id in hot:
+                    inventory.rebalance(stock_id)
+                StockQuantity.objects.bulk_create([
+                    StockQuantity(product_id=product_id, color_id=color_id, size_id=size_id, stock=stock)
+                    for (product_id, color_id, size_id), stock in new.items()
+                ], batch_size=self.batch_size)
+                created = {
+                    (product_id, color_id, size_id): (stock_id, stock, 0)
+                    for stock_id, product_id, color_id, size_id, stock in StockQuantity.objects.filter(
+                        product_id__in={key[0] for key in new}
+                    ).values_list('id', 'product_id', 'color_id', 'size_id', 'stock')
+                    if (product_id, color_id, size_id) in new
+                }
+                InventoryMovement.objects.bulk_create([
+                    InventoryMovement(stock_id=stock_id, kind=InventoryMovement.ADJUSTMENT, quantity=stock, reference='load_catalog')
+                    for stock_id, stock, _ in created.values() if stock
+                ], batch_size=self.batch_size)
+            loaded += len(deltas) + len(new)
+        return loaded, skipped
+
+    def _load_review(self, rows):
+        products = set(Product.objects.values_list('product_id', flat=True))
+        users = set(User.objects.values_list('pk', flat=True))
+        loaded = skipped = 0
+        for batch in _batches(rows, self.batch_size):
+            reviews = [
+                Review(review_id=row['review_id'], product_id=row['product'], user_id=row['user'],
+                       rating=int(row['rating']), comment=row.get('comment') or None)
+                for row in batch
+                if row['product'] in products and row['user'] in users and 1 <= int(row['rating']) <= 5
+            ]
+            self._upsert(Review, reviews, 'review_id', ['product', 'user', 'rating', 'comment', 'updated_at'])
+            loaded += len(reviews)
+            skipped += len(batch) - len(reviews)
+        return loaded, skipped
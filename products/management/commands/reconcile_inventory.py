@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products import inventory
+
+
+class Command(BaseCommand):
+    help = "Đối soát số dư tồn kho với sổ kho (số dư đã chốt + các dòng sổ kho)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Ghi lại số dư theo sổ kho cho các biến thể bị lệch")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Số biến thể mỗi lô")
+
+    def handle(self, *args, **options):
+        mismatches = inventory.reconcile(fix=options['fix'], batch_size=options['batch_size'])
+        for stock_id, stock, ledger in mismatches:
+            self.stdout.write(f"StockQuantity {stock_id}: số dư {stock}, theo sổ kho {ledger}")
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Số dư tồn kho khớp với sổ kho."))
+        elif options['fix']:
+            self.stdout.write(self.style.WARNING(f"Đã sửa {len(mismatches)} biến thể theo sổ kho."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)} biến thể bị lệch (chạy lại với --fix để sửa)."))
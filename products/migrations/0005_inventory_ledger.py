@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_alter_model_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='products.stockquantity', verbose_name='Tồn kho')),
+                ('balance', models.IntegerField(default=0, verbose_name='Số dư đã chốt')),
+                ('last_movement_id', models.BigIntegerField(default=0, verbose_name='Dòng sổ kho cuối đã gộp')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Số dư chốt kho',
+                'verbose_name_plural': 'Số dư chốt kho',
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('sale', 'Bán hàng'), ('restock', 'Hoàn kho'), ('purchase_receipt', 'Nhập hàng'), ('adjustment', 'Điều chỉnh')], max_length=20, verbose_name='Loại')),
+                ('quantity', models.IntegerField(verbose_name='Số lượng thay đổi')),
+                ('reference', models.CharField(blank=True, default='', max_length=50, verbose_name='Chứng từ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Thời gian')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='products.stockquantity', verbose_name='Tồn kho')),
+            ],
+            options={
+                'verbose_name': 'Sổ kho',
+                'verbose_name_plural': 'Sổ kho',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
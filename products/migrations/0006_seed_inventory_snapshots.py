@@ -0,0 +1,35 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def seed_snapshots(apps, schema_editor):
+    """
+    Số dư hiện có trước khi có sổ kho được chốt thành số dư ban đầu,
+    để đối soát sổ kho khớp ngay từ đầu.
+    """
+    StockQuantity = apps.get_model('products', 'StockQuantity')
+    InventorySnapshot = apps.get_model('products', 'InventorySnapshot')
+    last_id = 0
+    while True:
+        batch = list(
+            StockQuantity.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'stock')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        InventorySnapshot.objects.bulk_create(
+            [InventorySnapshot(stock_id=stock_id, balance=stock) for stock_id, stock in batch],
+            ignore_conflicts=True,
+        )
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
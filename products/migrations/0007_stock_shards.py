@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_seed_inventory_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockquantity',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Số bộ đếm con'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Thứ tự')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Số lượng')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='products.stockquantity', verbose_name='Tồn kho')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm tồn kho con',
+                'verbose_name_plural': 'Bộ đếm tồn kho con',
+                'constraints': [models.UniqueConstraint(fields=('stock', 'index'), name='unique_stock_shard_index')],
+            },
+        ),
+    ]
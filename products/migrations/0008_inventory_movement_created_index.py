@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stock_shards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['created_at'], name='inventory_movement_created'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_inventory_movement_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseinvoice',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Ngày nhập kho'),
+        ),
+        migrations.AddField(
+            model_name='purchaseinvoiceline',
+            name='color',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='products.color', verbose_name='Màu sắc'),
+        ),
+        migrations.AddField(
+            model_name='purchaseinvoiceline',
+            name='size',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='products.size', verbose_name='Kích cỡ'),
+        ),
+        migrations.AlterField(
+            model_name='purchaseinvoice',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Tổng tiền'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def merge_duplicate_variants(apps, schema_editor):
+    """
+    Gộp các dòng tồn kho trùng (product, color, size) vào dòng có id nhỏ nhất trước khi thêm
+    ràng buộc unique: cộng số dư (kể cả bộ đếm con), chuyển sổ kho và số dư đã chốt sang dòng giữ lại.
+    """
+    StockQuantity = apps.get_model('products', 'StockQuantity')
+    StockShard = apps.get_model('products', 'StockShard')
+    InventoryMovement = apps.get_model('products', 'InventoryMovement')
+    InventorySnapshot = apps.get_model('products', 'InventorySnapshot')
+    duplicates = (
+        StockQuantity.objects.values('product', 'color', 'size')
+        .annotate(rows=Count('id'), keep_id=Min('id')).filter(rows__gt=1)
+    )
+    for group in duplicates:
+        keep_id = group['keep_id']
+        others = list(StockQuantity.objects.filter(
+            product=group['product'], color=group['color'], size=group['size'],
+        ).exclude(pk=keep_id).values_list('id', flat=True))
+        stock = StockQuantity.objects.filter(pk__in=others).aggregate(total=Sum('stock'))['total'] or 0
+        sharded = StockShard.objects.filter(stock_id__in=others).aggregate(total=Sum('quantity'))['total'] or 0
+        StockQuantity.objects.filter(pk=keep_id).update(stock=F('stock') + stock + sharded)
+        InventoryMovement.objects.filter(stock_id__in=others).update(stock_id=keep_id)
+        snapshots = InventorySnapshot.objects.filter(stock_id__in=others)
+        balance = snapshots.aggregate(total=Sum('balance'))['total']
+        if balance is not None:
+            snapshot, _ = InventorySnapshot.objects.get_or_create(stock_id=keep_id)
+            InventorySnapshot.objects.filter(pk=snapshot.pk).update(balance=F('balance') + balance)
+        StockQuantity.objects.filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_purchase_invoice_posting'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at'], name='product_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sell_price'], name='product_sell_price'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'created_at'], name='review_product_created'),
+        ),
+        migrations.RunPython(merge_duplicate_variants, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stockquantity',
+            constraint=models.UniqueConstraint(fields=('product', 'color', 'size'), name='unique_stock_variant'),
+        ),
+    ]
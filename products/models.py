@@ -1,9 +1,14 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from django.utils.timezone import now
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 
+from shop_vivu import ids
+
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -75,6 +80,11 @@ class Product(BaseModel):
     class Meta:
         verbose_name = "Sản phẩm"
         verbose_name_plural = "Quản lý sản phẩm"
+        indexes = [
+            # Hàng mới về (ORDER BY created_at DESC LIMIT ...) và lọc theo khoảng giá
+            models.Index(fields=['created_at'], name='product_created'),
+            models.Index(fields=['sell_price'], name='product_sell_price'),
+        ]
 
 class Review(BaseModel):
     review_id = models.AutoField(primary_key=True,verbose_name="Mã đánh giá",)
@@ -93,6 +103,7 @@ class Review(BaseModel):
             )
         ]
         ordering = ['created_at']
+        indexes = [models.Index(fields=['product', 'created_at'], name='review_product_created')]
 
     def __str__(self):
         return f"Review {self.review_id} for {self.product.name} by {self.user}"
@@ -117,33 +128,130 @@ class StockQuantity(models.Model):
     size = models.ForeignKey(Size, on_delete=models.CASCADE, related_name='stock_quantities', verbose_name="Kích cỡ",)
     color = models.ForeignKey(Color, on_delete=models.CASCADE, related_name='stock_quantities',verbose_name="Màu sắc",)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_quantities', verbose_name="Sản phẩm",)
+    # > 0: biến thể bán chạy, tồn kho có thể bán được chia ra `shard_count` bộ đếm con (StockShard)
+    shard_count = models.PositiveSmallIntegerField(default=0, verbose_name="Số bộ đếm con",)
 
     def __str__(self):
         return f"{self.product.name} - {self.color.name} - {self.size.name}: {self.stock}"
 
+    @property
+    def available_stock(self):
+        """Tồn kho có thể bán: ở chế độ hot SKU là phần chưa chia + tổng các bộ đếm con."""
+        if not self.shard_count:
+            return self.stock
+        return self.stock + sum(shard.quantity for shard in self.shards.all())
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock = instance.__dict__.get('stock')
+        return instance
+
     def save(self, *args, **kwargs):
+        # Mọi thay đổi số lượng đều đi qua sổ kho (`products.inventory`) để có thể đối soát
+        from products import inventory
+
         if self.id:  # Nếu bản ghi hiện tại đã tồn tại
-        # Lưu thay đổi trực tiếp
-            super().save(*args, **kwargs)
-        else:  # Nếu là bản ghi mới
-        # Truy vấn xem đã có bản ghi trùng lặp hay chưa
-            existing_stock = StockQuantity.objects.filter(
-                product=self.product,
-                size=self.size,
-                color=self.color
-            ).first()
-
-            if existing_stock:
-                # Nếu tồn tại, cập nhật số lượng cho bản ghi trùng
-                existing_stock.stock += self.stock
-                existing_stock.save()
-            else:
-            # Nếu không tồn tại, lưu bản ghi mới
+            # Lưu các trường khác, phần chênh lệch tồn kho ghi thành một bút toán điều chỉnh
+            delta = self.stock - getattr(self, '_loaded_stock', self.stock)
+            kwargs.setdefault('update_fields', [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'stock'
+            ])
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                inventory.record(self.id, delta, InventoryMovement.ADJUSTMENT)
+            self._loaded_stock = self.stock
+            return
+
+        try:
+            with transaction.atomic():
+                # Lưu bản ghi mới và ghi nhận số lượng ban đầu vào sổ kho
                 super().save(*args, **kwargs)
+                inventory.append(self.id, self.stock, InventoryMovement.ADJUSTMENT)
+        except IntegrityError:
+            # Biến thể đã có (ràng buộc unique_stock_variant): cộng số lượng vào bản ghi hiện có
+            existing_id = StockQuantity.objects.filter(
+                product_id=self.product_id, color_id=self.color_id, size_id=self.size_id,
+            ).values_list('id', flat=True).first()
+            if existing_id is None:
+                raise
+            inventory.record(existing_id, self.stock, InventoryMovement.ADJUSTMENT)
+            return
+        self._loaded_stock = self.stock
 
     class Meta:
         verbose_name = "Số lượng tồn kho"
         verbose_name_plural = "Số lượng tồn kho"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'color', 'size'], name='unique_stock_variant')
+        ]
+
+
+class StockShard(models.Model):
+    """
+    Bộ đếm con của một biến thể ở chế độ hot SKU: các đơn hàng đồng thời trừ vào
+    những dòng khác nhau thay vì cùng tranh khóa một dòng StockQuantity.
+    """
+    id = models.BigAutoField(primary_key=True)
+    stock = models.ForeignKey(StockQuantity, on_delete=models.CASCADE, related_name='shards', verbose_name="Tồn kho",)
+    index = models.PositiveSmallIntegerField(verbose_name="Thứ tự",)
+    quantity = models.IntegerField(default=0, verbose_name="Số lượng",)
+
+    class Meta:
+        verbose_name = "Bộ đếm tồn kho con"
+        verbose_name_plural = "Bộ đếm tồn kho con"
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'index'], name='unique_stock_shard_index')
+        ]
+
+
+class InventoryMovement(models.Model):
+    """
+    Sổ kho chỉ ghi thêm: mỗi thay đổi tồn kho là một dòng với số lượng có dấu.
+    `StockQuantity.stock` là số dư được cộng dồn nguyên tử từ các dòng này.
+    """
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    PURCHASE_RECEIPT = 'purchase_receipt'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [
+        (SALE, 'Bán hàng'),
+        (RESTOCK, 'Hoàn kho'),
+        (PURCHASE_RECEIPT, 'Nhập hàng'),
+        (ADJUSTMENT, 'Điều chỉnh'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    stock = models.ForeignKey(StockQuantity, on_delete=models.CASCADE, related_name='movements', verbose_name="Tồn kho",)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Loại",)
+    quantity = models.IntegerField(verbose_name="Số lượng thay đổi",)
+    reference = models.CharField(max_length=50, blank=True, default='', verbose_name="Chứng từ",)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Thời gian",)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} ({self.reference})"
+
+    class Meta:
+        verbose_name = "Sổ kho"
+        verbose_name_plural = "Sổ kho"
+        ordering = ['-id']
+        indexes = [models.Index(fields=['created_at'], name='inventory_movement_created')]
+
+
+class InventorySnapshot(models.Model):
+    """
+    Số dư đã chốt của một biến thể sau khi gộp (compaction) các dòng sổ kho cũ.
+    Số dư đúng = `balance` + tổng các dòng sổ kho còn lại.
+    """
+    stock = models.OneToOneField(StockQuantity, on_delete=models.CASCADE, primary_key=True, related_name='snapshot', verbose_name="Tồn kho",)
+    balance = models.IntegerField(default=0, verbose_name="Số dư đã chốt",)
+    last_movement_id = models.BigIntegerField(default=0, verbose_name="Dòng sổ kho cuối đã gộp",)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Số dư chốt kho"
+        verbose_name_plural = "Số dư chốt kho"
 
 
 
@@ -175,8 +283,9 @@ class ProductCategory(BaseModel):
 class PurchaseInvoice(BaseModel):
     invoice_id = models.CharField(max_length=50, primary_key=True,verbose_name="Mã hóa đơn",)
     supplier = models.CharField(max_length=255, verbose_name="Nhà cung cấp",)
-    total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Tổng tiền",)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Tổng tiền",)
     created_by = models.ForeignKey('user.User', on_delete=models.CASCADE, verbose_name="Nhập bởi",)
+    posted_at = models.DateTimeField(null=True, blank=True, verbose_name="Ngày nhập kho",)
 
     class Meta:
         verbose_name = "Hóa đơn nhập hàng"
@@ -185,12 +294,78 @@ class PurchaseInvoice(BaseModel):
 
     def __str__(self):
         return f"Purchase Invoice {self.invoice_id} by {self.created_by}"
-    
+
+    def add_lines(self, lines):
+        """Thêm nhiều dòng (product_id, color_id, size_id, quantity, price) bằng một `bulk_create`."""
+        return PurchaseInvoiceLine.objects.bulk_create([
+            PurchaseInvoiceLine(
+                invoiceLine_id=PurchaseInvoiceLine.new_id(), invoice=self, product_id=product_id,
+                color_id=color_id, size_id=size_id, quantity=quantity, price=price,
+            )
+            for product_id, color_id, size_id, quantity, price in lines
+        ], batch_size=1000)
+
+    def update_total_price(self):
+        """Tính lại tổng tiền hóa đơn từ các dòng chi tiết (trong SQL)."""
+        line_total = PurchaseInvoiceLine.objects.filter(invoice=models.OuterRef('pk')).values('invoice').annotate(
+            total=models.Sum(models.F('quantity') * models.F('price'))
+        ).values('total')
+        PurchaseInvoice.objects.filter(pk=self.pk).update(
+            total_price=Coalesce(models.Subquery(line_total), models.Value(Decimal('0')))
+        )
+        self.refresh_from_db(fields=['total_price'])
+
+    def post(self):
+        """
+        Nhập kho toàn bộ hóa đơn: cộng số lượng của mọi dòng vào tồn kho bằng một câu UPDATE
+        (qua sổ kho), tạo biến thể còn thiếu và tính lại tổng tiền. Mỗi hóa đơn chỉ nhập kho một lần.
+        """
+        from products import inventory
+
+        with transaction.atomic():
+            invoice = PurchaseInvoice.objects.select_for_update().get(pk=self.pk)
+            if invoice.posted_at:
+                raise ValidationError(f"Hóa đơn {self.pk} đã được nhập kho.")
+            lines = self.purchaseinvoiceline_set.all()
+            if lines.filter(models.Q(color__isnull=True) | models.Q(size__isnull=True)).exists():
+                raise ValidationError("Mỗi dòng nhập hàng cần có màu sắc và kích cỡ.")
+            received = {
+                (product_id, color_id, size_id): quantity
+                for product_id, color_id, size_id, quantity in lines.order_by().values('product', 'color', 'size')
+                .annotate(total=models.Sum('quantity')).values_list('product', 'color', 'size', 'total')
+            }
+            variants = self._variant_ids(received)
+            missing = [key for key in received if key not in variants]
+            StockQuantity.objects.bulk_create([
+                StockQuantity(product_id=product_id, color_id=color_id, size_id=size_id, stock=0)
+                for product_id, color_id, size_id in missing
+            ], ignore_conflicts=True)
+            if missing:
+                variants = self._variant_ids(received)
+            inventory.record_many(
+                {variants[key]: quantity for key, quantity in received.items()},
+                InventoryMovement.PURCHASE_RECEIPT, self.pk,
+            )
+            self.update_total_price()
+            self.posted_at = now()
+            PurchaseInvoice.objects.filter(pk=self.pk).update(posted_at=self.posted_at)
+
+    @staticmethod
+    def _variant_ids(keys):
+        return {
+            (product_id, color_id, size_id): stock_id
+            for stock_id, product_id, color_id, size_id in StockQuantity.objects.filter(
+                product_id__in={key[0] for key in keys}
+            ).values_list('id', 'product_id', 'color_id', 'size_id')
+        }
+
 
 class PurchaseInvoiceLine(models.Model):
     invoiceLine_id = models.CharField(max_length=50, primary_key=True,verbose_name="Mã chi tiết hóa đơn",)
     invoice = models.ForeignKey(PurchaseInvoice, on_delete=models.CASCADE, verbose_name="Mã hóa đơn",)
     product = models.ForeignKey(Product, on_delete=models.CASCADE,verbose_name="Sản phẩm",)
+    color = models.ForeignKey(Color, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Màu sắc",)
+    size = models.ForeignKey(Size, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Kích cỡ",)
     quantity = models.IntegerField(verbose_name="Số lượng",)
     price = models.DecimalField(max_digits=10, decimal_places=2,verbose_name="Giá",)
 
@@ -201,6 +376,16 @@ class PurchaseInvoiceLine(models.Model):
 
     def __str__(self):
         return f"Invoice Line {self.invoiceLine_id} for {self.product.name}"
+
+    @staticmethod
+    def new_id():
+        return ids.next_id('PIL')
+
+    def save(self, *args, **kwargs):
+        # Tự động sinh `invoiceLine_id` nếu chưa có (ví dụ dòng thêm từ inline của hóa đơn)
+        if not self.invoiceLine_id:
+            self.invoiceLine_id = self.new_id()
+        super().save(*args, **kwargs)
     
 class Banner(models.Model):
     banner_id = models.CharField(max_length=10, primary_key=True)
@@ -1,40 +1,42 @@
 from rest_framework import serializers
 from django.conf import settings
+from shop_vivu.metrics import TimedSerializerMixin
 from .models import Banner, Product, Category, Color, Review, Size, StockQuantity, Image
 
 
-class ColorSerializer(serializers.ModelSerializer):
+class ColorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Color
         fields = ['color_id', 'name']
 
 
-class SizeSerializer(serializers.ModelSerializer):
+class SizeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Size
         fields = ['size_id', 'name']
 
 
-class StockQuantitySerializer(serializers.ModelSerializer):
+class StockQuantitySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     color = ColorSerializer()
     size = SizeSerializer()
+    stock = serializers.IntegerField(source='available_stock', read_only=True)
 
     class Meta:
         model = StockQuantity
         fields = ['color', 'size', 'stock']
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
     class Meta:
         model = Category
         fields = ['category_id', 'name', 'description', 'parent', 'children']
 
     def get_children(self, obj):
-        # Lấy các danh mục con
-        children = Category.objects.filter(parent=obj)
+        # Lấy các danh mục con (dùng kết quả prefetch `subcategories` nếu có)
+        children = obj.subcategories.all()
         return CategorySerializer(children, many=True).data
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Image
         fields = ['id', 'url']
@@ -43,7 +45,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
         domain = settings.BASE_URL
         return domain + obj.url
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     colors = ColorSerializer(source='color', many=True, read_only=True)
     sizes = SizeSerializer(source='size', many=True, read_only=True)
     categories = CategorySerializer(source='category', many=True, read_only=True)
@@ -57,7 +59,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'colors', 'sizes', 'categories', 'stock_quantities', 'created_at', 'updated_at'
         ]
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_id = serializers.CharField(write_only=True) 
     full_name = serializers.CharField(source='user.full_name', read_only=True)
     class Meta:
@@ -76,7 +78,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         review = Review.objects.create(product=product, **validated_data)
         return review
     
-class BannerSerializer(serializers.ModelSerializer):
+class BannerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Banner
         fields = ['banner_id', 'image']
@@ -0,0 +1,10 @@
+from datetime import timedelta
+from celery import shared_task
+from products import inventory
+
+
+@shared_task
+def compact_inventory_ledger(older_than_days=30):
+    """Gộp định kỳ các dòng sổ kho cũ vào số dư đã chốt."""
+    compacted = inventory.compact(older_than=timedelta(days=older_than_days))
+    return f"Compacted {compacted} inventory movements"
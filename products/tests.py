@@ -1,3 +1,688 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from import_export.formats import base_formats
+from openpyxl import load_workbook
+from rest_framework.authtoken.models import Token
+
+from cart.models import Order, OrderLine, SalesRollup
+from shop_vivu import streaming
+from shop_vivu.admin_paginator import EstimatedCountPaginator
+from shop_vivu.db_router import ReplicaPinningMiddleware, read_scope
+from shop_vivu.metrics import registry
+from user.models import IdSequence, User
+
+from . import async_views, inventory, utils, views
+from .availability import AvailabilityMap
+from .models import Banner, Category, Color, Image, InventoryMovement, InventorySnapshot, Product, PurchaseInvoice, PurchaseInvoiceLine, Review, Size, StockQuantity
+from .views import category_products_queryset, new_products_queryset, price_filter_queryset, product_reviews_queryset
+
+
+class ChangelistQueryCountMixin:
+    """Số truy vấn của trang danh sách quản trị không được tăng theo số dòng hiển thị (chặn lỗi N+1)."""
+
+    sequence = count(1)
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@shop.vn', full_name='Admin', password='x')
+        self.client.force_login(self.admin)
+        self.color = Color.objects.create(color_id='C1', name='Đỏ')
+        self.size = Size.objects.create(size_id='S1', name='M')
+
+    def make_product(self):
+        n = next(self.sequence)
+        return Product.objects.create(
+            product_id=f'P{n}', name=f'Sản phẩm {n}', import_price=Decimal('5'), sell_price=Decimal('10'),
+        )
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertChangelistQueriesConstant(self, model, add_rows):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        add_rows(2)
+        self.changelist_queries(url)  # làm nóng cache (ContentType, quyền)
+        baseline = self.changelist_queries(url)
+        add_rows(10)
+        self.assertEqual(self.changelist_queries(url), baseline)
+
+
+def _mysql_full_scans(node):
+    """Các bảng có `access_type: ALL` (quét toàn bảng) trong kế hoạch EXPLAIN FORMAT=JSON của MySQL."""
+    if isinstance(node, dict):
+        if node.get('access_type') == 'ALL':
+            yield node.get('table_name')
+        for value in node.values():
+            yield from _mysql_full_scans(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_full_scans(value)
+
+
+class QueryPlanMixin:
+    """
+    Kiểm tra kế hoạch thực thi (EXPLAIN) của các truy vấn nóng: không được quét toàn bảng.
+    Bảng trong test gần như trống nên MySQL/PostgreSQL được chỉnh để ưu tiên chỉ mục
+    khi có chỉ mục phù hợp; quét toàn bảng khi đó nghĩa là thiếu chỉ mục.
+    """
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('SET SESSION max_seeks_for_key = 1')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SET enable_seqscan = off')
+
+    def full_scans(self, queryset):
+        if connection.vendor == 'mysql':
+            return list(_mysql_full_scans(json.loads(queryset.explain(format='json'))))
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            return re.findall(r'Seq Scan on (\w+)', plan)
+        # SQLite: "SCAN <bảng>" không kèm "USING ... INDEX" là quét toàn bảng
+        return re.findall(r'\bSCAN (\w+)$', plan, re.MULTILINE)
+
+    def assertNoFullScan(self, queryset):
+        scans = self.full_scans(queryset)
+        self.assertFalse(scans, f"Truy vấn quét toàn bảng {scans}:\n{queryset.query}\n{queryset.explain()}")
+
+
+class ProductsQueryPlanTests(QueryPlanMixin, TestCase):
+    # Dùng đúng các queryset mà view danh mục chạy
+    def test_new_arrivals(self):
+        self.assertNoFullScan(new_products_queryset()[:10])
+
+    def test_price_filter(self):
+        self.assertNoFullScan(price_filter_queryset(100, 500))
+
+    def test_price_filter_in_category(self):
+        self.assertNoFullScan(price_filter_queryset(100, 500, 'DM1'))
+
+    def test_category_products(self):
+        self.assertNoFullScan(category_products_queryset('DM1'))
+
+    def test_product_reviews(self):
+        self.assertNoFullScan(product_reviews_queryset('P1'))
+
+
+class ProductsAdminChangelistTests(ChangelistQueryCountMixin, TestCase):
+    def test_review_changelist(self):
+        def add_rows(n):
+            for _ in range(n):
+                Review.objects.create(product=self.make_product(), user=self.admin, rating=5)
+        self.assertChangelistQueriesConstant(Review, add_rows)
+
+    def test_image_changelist(self):
+        def add_rows(n):
+            for _ in range(n):
+                Image.objects.create(product=self.make_product(), url='products/x.webp')
+        self.assertChangelistQueriesConstant(Image, add_rows)
+
+    def test_stock_quantity_changelist(self):
+        def add_rows(n):
+            for _ in range(n):
+                StockQuantity.objects.create(product=self.make_product(), color=self.color, size=self.size, stock=3)
+        self.assertChangelistQueriesConstant(StockQuantity, add_rows)
+
+    def test_purchase_invoice_line_changelist(self):
+        invoice = PurchaseInvoice.objects.create(invoice_id='INV1', supplier='NCC', created_by=self.admin)
+
+        def add_rows(n):
+            for _ in range(n):
+                PurchaseInvoiceLine.objects.create(
+                    invoice=invoice, product=self.make_product(), color=self.color, size=self.size,
+                    quantity=1, price=Decimal('5'),
+                )
+        self.assertChangelistQueriesConstant(PurchaseInvoiceLine, add_rows)
+
+
+class StreamingExportTests(ChangelistQueryCountMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.admin
+
+    def add_products(self, n):
+        for _ in range(n):
+            product = self.make_product()
+            product.color.add(self.color)
+            product.size.add(self.size)
+
+    def export(self, file_format):
+        response = admin.site._registry[Product]._do_file_export(file_format, self.request, Product.objects.all())
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        self.add_products(2)
+        response, content = self.export(base_formats.CSV())
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('.csv', response['Content-Disposition'])
+        rows = list(csv.reader(content.decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0][:4], ['product_id', 'name', 'import_price', 'sell_price'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(dict(zip(rows[0], rows[1]))['color'], 'Đỏ')
+
+    def test_xlsx_export(self):
+        self.add_products(2)
+        response, content = self.export(base_formats.XLSX())
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], streaming.XLSX_CONTENT_TYPE)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        rows = list(load_workbook(io.BytesIO(content)).active.values)
+        self.assertEqual(len(rows), 3)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual((row['size'], row['sell_price']), ('M', 10))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def export_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.export(base_formats.CSV())
+                self.export(base_formats.XLSX())
+            return len(queries)
+
+        self.add_products(2)
+        baseline = export_queries()
+        self.add_products(10)
+        self.assertEqual(export_queries(), baseline)
+
+    def test_xlsx_starts_before_rows_are_read(self):
+        read = []
+
+        def rows():
+            for n in range(3):
+                read.append(n)
+                yield [n, f'dòng {n}', datetime(2024, 1, 2), None]
+
+        response = streaming.stream_xlsx(['n', 'tên', 'ngày', 'trống'], rows(), 'x.xlsx', sheet_title='Doanh [thu]')
+        chunks = iter(response.streaming_content)
+        first = next(chunks)
+        self.assertEqual(read, [])
+        workbook = load_workbook(io.BytesIO(first + b''.join(chunks)))
+        self.assertEqual(workbook.sheetnames, ['Doanh thu'])
+        self.assertEqual(list(workbook.active.values)[1:], [(n, f'dòng {n}', datetime(2024, 1, 2), None) for n in range(3)])
+
+
+class SalesStatsViewTests(ChangelistQueryCountMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('admin:product-sales-stats')
+        self.today = timezone.localdate()
+        self.month = self.today.replace(day=1)
+        self.last_year = self.month.replace(year=self.month.year - 1)
+
+    def add_rollup(self, product, period, start, units, revenue):
+        SalesRollup.objects.create(
+            period=period, period_start=start, product_id=product.pk, orders=1, units=units, revenue=revenue,
+        )
+
+    def add_sales(self, n):
+        for _ in range(n):
+            product = self.make_product()
+            self.add_rollup(product, SalesRollup.DAY, self.today, 1, Decimal('10'))
+            self.add_rollup(product, SalesRollup.MONTH, self.month, 3, Decimal('30'))
+            self.add_rollup(product, SalesRollup.MONTH, self.last_year, 2, Decimal('20'))
+
+    def totals(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        rows = response.context['sales_data']
+        return sum(row['quantity_sold'] for row in rows), sum(row['total_sales'] for row in rows)
+
+    def test_requires_view_permission(self):
+        staff = User.objects.create_user(email='nv@shop.vn', full_name='Nhân viên', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)  # về trang đăng nhập
+
+    def test_filters_match_rollups(self):
+        self.add_sales(2)
+        self.assertEqual(self.totals(filter='daily'), (2, Decimal('20')))
+        self.assertEqual(self.totals(filter='monthly'), (6, Decimal('60')))
+        self.assertEqual(self.totals(month=f'{self.last_year:%Y-%m}'), (4, Decimal('40')))
+        self.assertEqual(self.totals(filter='all'), (10, Decimal('100')))
+        monthly = SalesRollup.objects.filter(period=SalesRollup.MONTH, period_start__year=self.today.year)
+        self.assertEqual(self.totals(filter='yearly'), tuple(monthly.aggregate(Sum('units'), Sum('revenue')).values()))
+
+    def test_export_matches_rollups(self):
+        self.add_sales(2)
+        response = self.client.get(self.url, {'filter': 'monthly', 'export': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0][-1], 'Doanh thu')
+        self.assertEqual([row[1:] for row in rows[1:]], [
+            [product.pk, product.name, '1', '3', '30.00'] for product in Product.objects.order_by('pk')
+        ])
+        response = self.client.get(self.url, {'filter': 'all', 'export': 'xlsx'})
+        rows = list(load_workbook(io.BytesIO(b''.join(response.streaming_content))).active.values)[1:]
+        self.assertEqual(sum(row[-1] for row in rows), 100)
+
+    def test_query_count_does_not_grow_with_products(self):
+        def queries(**params):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(self.url, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            return len(captured)
+
+        self.add_sales(2)
+        modes = [{'filter': 'all'}, {'filter': 'all', 'export': 'csv'}, {'filter': 'all', 'export': 'xlsx'}]
+        queries()  # làm nóng cache (ContentType, quyền)
+        baseline = [queries(**params) for params in modes]
+        self.add_sales(10)
+        self.assertEqual([queries(**params) for params in modes], baseline)
+
+
+@mock.patch.object(utils, 'get_vietnamese_stopwords', lambda: ('và',))
+@mock.patch('products.views.get_vietnamese_stopwords', lambda: ('và',))
+class AsyncCatalogViewTests(ChangelistQueryCountMixin, TestCase):
+    """View async (chạy dưới ASGI) trả về đúng như view đồng bộ tương ứng."""
+
+    views = {
+        'product_list': ('ProductListView', {}),
+        'new_products': ('NewProductsView', {}),
+        'product_detail': ('ProductDetail', {'product_id': None}),
+        'banner_list': ('BannerList', {}),
+        'category_list': ('CategoryListView', {}),
+        'related_products': ('RelatedProductsView', {'product_id': None}),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.parent = Category.objects.create(category_id='CAT1', name='Áo')
+        Category.objects.create(category_id='CAT2', name='Áo thun', parent=self.parent)
+        self.header = f'Token {Token.objects.create(user=self.admin).key}'
+        self.add_products(3)
+
+    def add_products(self, n):
+        for _ in range(n):
+            product = self.make_product()
+            product.description = f'Mô tả {product.name}'
+            product.save()
+            product.color.add(self.color)
+            product.size.add(self.size)
+            product.category.add(self.parent)
+            Image.objects.create(product=product, url='products/x.webp')
+            StockQuantity.objects.create(product=product, color=self.color, size=self.size, stock=3)
+
+    def sync_response(self, view_name, kwargs, header=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=header or self.header)
+        response = getattr(views, view_name).as_view()(request, **kwargs)
+        response.render()
+        return response
+
+    async def async_response(self, view_name, kwargs, header=None):
+        request = AsyncRequestFactory().get('/', headers={'Authorization': header or self.header})
+        return await getattr(async_views, view_name)(request, **kwargs)
+
+    async def test_same_body_as_sync_view(self):
+        product_id = await Product.objects.values_list('pk', flat=True).afirst()
+        for async_name, (sync_name, kwargs) in self.views.items():
+            kwargs = {name: product_id for name in kwargs}
+            with self.subTest(view=async_name):
+                expected = await sync_to_async(self.sync_response)(sync_name, kwargs)
+                response = await self.async_response(async_name, kwargs)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    async def test_missing_product_is_404(self):
+        for async_name, sync_name in (('product_detail', 'ProductDetail'), ('related_products', 'RelatedProductsView')):
+            with self.subTest(view=async_name):
+                expected = await sync_to_async(self.sync_response)(sync_name, {'product_id': 'KHONG-CO'})
+                response = await self.async_response(async_name, {'product_id': 'KHONG-CO'})
+                self.assertEqual((response.status_code, expected.status_code), (404, 404))
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    async def test_same_auth_behaviour(self):
+        for header in ('Token sai', 'Token'):
+            with self.subTest(header=header):
+                expected = await sync_to_async(self.sync_response)('ProductListView', {}, header=header)
+                response = await self.async_response('product_list', {}, header=header)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+        # Không gửi token: cũng bị từ chối như view đồng bộ
+        request = AsyncRequestFactory().get('/')
+        self.assertEqual((await async_views.product_list(request)).status_code, 401)
+
+    def test_prefetch_queries_do_not_grow_with_products(self):
+        # Gọi view async từ test đồng bộ: truy vấn của ORM async quay về luồng này và dùng cùng kết nối
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                response = async_to_sync(self.async_response)('product_list', {})
+            self.assertEqual(response.status_code, 200)
+            return len(captured)
+
+        queries()  # làm nóng cache xác thực
+        baseline = queries()
+        self.assertGreater(baseline, 0)
+        self.add_products(5)
+        self.assertEqual(queries(), baseline)
+
+
+class PostedPurchaseInvoiceAdminTests(ChangelistQueryCountMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice = PurchaseInvoice.objects.create(invoice_id='INV1', supplier='NCC', created_by=self.admin)
+        self.line = PurchaseInvoiceLine.objects.create(
+            invoice=self.invoice, product=self.make_product(), color=self.color, size=self.size,
+            quantity=2, price=Decimal('5'),
+        )
+        PurchaseInvoice.objects.filter(pk=self.invoice.pk).update(posted_at=timezone.now())
+
+    def test_line_of_posted_invoice_cannot_be_changed_or_deleted(self):
+        url = reverse('admin:products_purchaseinvoiceline_change', args=[self.line.pk])
+        response = self.client.post(url, {
+            'invoice': self.invoice.pk, 'product': self.line.product_id, 'color': 'C1', 'size': 'S1',
+            'quantity': 50, 'price': '5',
+        })
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('admin:products_purchaseinvoiceline_delete', args=[self.line.pk]),
+                                    {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        self.line.refresh_from_db()
+        self.assertEqual(self.line.quantity, 2)
+
+    def test_bulk_delete_skips_posted_lines(self):
+        self.client.post(reverse('admin:products_purchaseinvoiceline_changelist'), {
+            'action': 'delete_selected', '_selected_action': [self.line.pk], 'post': 'yes',
+        })
+        self.assertTrue(PurchaseInvoiceLine.objects.filter(pk=self.line.pk).exists())
+
+    def test_invoice_change_page_shows_lines_read_only(self):
+        response = self.client.get(reverse('admin:products_purchaseinvoice_change', args=[self.invoice.pk]))
+        self.assertEqual(response.status_code, 200)
+        formset = response.context['inline_admin_formsets'][0]
+        self.assertFalse(formset.has_add_permission or formset.has_change_permission or formset.has_delete_permission)
+
+    def test_line_autocomplete_offers_only_open_invoices(self):
+        PurchaseInvoice.objects.create(invoice_id='INV2', supplier='NCC', created_by=self.admin)
+        params = {'term': 'INV', 'app_label': 'products', 'model_name': 'purchaseinvoiceline', 'field_name': 'invoice'}
+        response = self.client.get(reverse('admin:autocomplete'), params)
+        self.assertEqual([result['id'] for result in response.json()['results']], ['INV2'])
+        # Tìm kiếm trên trang danh sách hóa đơn vẫn thấy cả hóa đơn đã nhập kho
+        response = self.client.get(reverse('admin:products_purchaseinvoice_changelist'), {'q': 'INV'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_unfiltered_large_table_uses_estimate(self):
+        with mock.patch('shop_vivu.admin_paginator.estimated_row_count', return_value=2_000_000):
+            self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('pk'), 100).count, 2_000_000)
+
+    def test_filtered_queryset_is_counted_exactly(self):
+        with mock.patch('shop_vivu.admin_paginator.estimated_row_count', return_value=2_000_000) as estimate:
+            paginator = EstimatedCountPaginator(Product.objects.filter(name='x').order_by('pk'), 100)
+            self.assertEqual(paginator.count, 0)
+        estimate.assert_not_called()
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_catalog_and_analytics_reads_use_replica_in_request(self):
+        with read_scope():
+            self.assertEqual(router.db_for_read(Product), 'replica1')
+            self.assertEqual(router.db_for_read(SalesRollup), 'replica1')
+            self.assertEqual(router.db_for_read(StockQuantity), 'default')
+
+    def test_reads_outside_request_use_primary(self):
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_read_after_write_is_pinned(self):
+        with read_scope() as state:
+            router.db_for_write(Review)
+            self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertTrue(state.wrote)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTransactionTests(TransactionTestCase):
+    # TestCase bọc mỗi test trong giao dịch nên không kiểm tra được trường hợp ngoài giao dịch
+    def test_reads_in_transaction_use_primary(self):
+        with read_scope(), transaction.atomic():
+            self.assertEqual(router.db_for_read(Product), 'default')
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaPinningMiddlewareTests(SimpleTestCase):
+    def request_reads(self, request, write=False):
+        def view(request):
+            if write:
+                router.db_for_write(Review)
+            return HttpResponse(router.db_for_read(Product))
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.request_reads(RequestFactory().get('/'), write=True)
+        self.assertEqual(response.cookies['db_pin']['max-age'], 5)
+
+    def test_pin_cookie_and_unsafe_methods_read_primary(self):
+        factory = RequestFactory()
+        self.assertEqual(self.request_reads(factory.get('/')).content, b'replica1')
+        factory.cookies['db_pin'] = '1'
+        self.assertEqual(self.request_reads(factory.get('/')).content, b'default')
+        self.assertEqual(self.request_reads(RequestFactory().post('/')).content, b'default')
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='metrics@shop.vn', full_name='Metrics', password='x')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=user).key}'
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('banner-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=')
+
+    def test_query_budget_exceeded_is_logged(self):
+        with override_settings(QUERY_BUDGETS={'banner-list': 0}), self.assertLogs('shop_vivu.metrics', 'WARNING'):
+            self.client.get(reverse('banner-list'))
+
+
+    def test_serializer_time_is_recorded(self):
+        Banner.objects.create(banner_id='B1', image='banners/b1.webp')
+        registry.reset()
+        self.client.get(reverse('banner-list'))
+        self.assertGreater(registry.snapshot()['banner-list']['serializer_seconds'], 0)
+
+    @override_settings(METRICS_TOKEN='bi-mat')
+    def test_metrics_endpoint_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer sai').status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer bi-mat')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds', response.content)
+
+class GenerateDatasetTests(TestCase):
+    def test_generates_consistent_dataset(self):
+        call_command('load_catalog', stdout=StringIO())
+        products, users, reviews = Product.objects.count(), User.objects.count(), Review.objects.count()
+        call_command(
+            'generate_dataset', products=50, users=30, order_lines=200, reviews=40, workers=1, chunk_size=20,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Product.objects.count(), products + 50)
+        self.assertEqual(User.objects.count(), users + 30)
+        self.assertEqual(Review.objects.count(), reviews + 40)
+        lines = OrderLine.objects.count()
+        self.assertGreater(lines, 100)
+        # Bộ đếm mã được đẩy tới sau dải mã đã sinh
+        self.assertEqual(IdSequence.objects.get(name='KH').next_value, users + 30)
+        self.assertEqual(IdSequence.objects.get(name='OL').next_value, lines)
+        for order in Order.objects.annotate(lines_total=Sum(F('order_lines__quantity') * F('order_lines__unit_price'))):
+            self.assertEqual(order.total_price, order.lines_total)
+        for stock in StockQuantity.objects.annotate(ledger=Sum('movements__quantity')):
+            self.assertEqual(stock.stock, stock.ledger or 0)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        Color.objects.create(color_id='C1', name='Đỏ')
+        Size.objects.create(size_id='S1', name='M')
+        Size.objects.create(size_id='S2', name='L')
+        Product.objects.create(product_id='P1', name='Áo', import_price=Decimal('5'), sell_price=Decimal('10'))
+        self.stock = StockQuantity.objects.create(product_id='P1', color_id='C1', size_id='S1', stock=20)
+        self.other = StockQuantity.objects.create(product_id='P1', color_id='C1', size_id='S2', stock=5)
+
+    def test_compact_keeps_ledger_balances(self):
+        inventory.sell(self.stock.pk, 3)
+        inventory.record(self.other.pk, 2, InventoryMovement.ADJUSTMENT)
+        InventoryMovement.objects.update(created_at=timezone.now() - timedelta(days=40))
+        inventory.sell(self.stock.pk, 1)
+        before = inventory.ledger_balances()
+
+        self.assertEqual(inventory.compact(batch_size=1), 4)
+        self.assertEqual(inventory.ledger_balances(), before)
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+        self.assertEqual(InventorySnapshot.objects.get(stock=self.stock).balance, 17)
+        # Gộp lần nữa: các dòng mới đều chưa đủ cũ
+        self.assertEqual(inventory.compact(), 0)
+        self.assertEqual(inventory.ledger_balances(), before)
+
+
+    def available(self):
+        self.stock.refresh_from_db()
+        return self.stock.available_stock
+
+    def test_sell_from_shards(self):
+        inventory.enable_hot_mode(self.stock.pk, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(7):
+                inventory.sell(self.stock.pk, 2, shard_count=4)
+        self.assertEqual(self.available(), 6)
+        self.assertEqual(inventory.ledger_balances([self.stock.pk]), {self.stock.pk: 6})
+
+    def test_oversell_is_rejected(self):
+        with self.assertRaises(inventory.InsufficientStock):
+            inventory.sell(self.other.pk, 6)
+        inventory.enable_hot_mode(self.stock.pk, 4)
+        # Không bộ đếm con nào đủ 15, nhưng tổng đủ: chia lại rồi bán
+        inventory.sell(self.stock.pk, 15, shard_count=4)
+        with self.assertRaises(inventory.InsufficientStock):
+            inventory.sell(self.stock.pk, 6, shard_count=4)
+        self.assertEqual(self.available(), 5)
+
+    def test_stale_mode_is_rechecked(self):
+        inventory.enable_hot_mode(self.stock.pk, 4)
+        inventory.sell(self.stock.pk, 1, shard_count=0)
+        inventory.disable_hot_mode(self.stock.pk)
+        inventory.sell(self.stock.pk, 1, shard_count=4)
+        self.assertEqual(self.available(), 18)
+        self.assertEqual(inventory.ledger_balances([self.stock.pk]), {self.stock.pk: 18})
+
+    def test_mode_changes_keep_total(self):
+        inventory.enable_hot_mode(self.stock.pk, 3)
+        inventory.sell(self.stock.pk, 4)
+        self.assertEqual(self.available(), 16)
+        self.assertTrue(inventory.rebalance(self.stock.pk))
+        self.assertEqual(self.available(), 16)
+        self.assertEqual(sorted(self.stock.shards.values_list('quantity', flat=True)), [5, 5, 6])
+        inventory.disable_hot_mode(self.stock.pk)
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.stock, self.stock.shard_count, self.stock.shards.count()), (16, 0, 0))
+
+class LoadCatalogStockTests(TestCase):
+    def setUp(self):
+        Color.objects.create(color_id='C1', name='Đỏ')
+        Size.objects.create(size_id='S1', name='M')
+        Size.objects.create(size_id='S2', name='L')
+        Product.objects.create(product_id='P1', name='Áo', import_price=Decimal('5'), sell_price=Decimal('10'))
+
+    def load_stock(self, *rows):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'stock.csv'), 'w', encoding='utf-8') as stock_file:
+                stock_file.write('product,color,size,stock\n' + ''.join(f'{row}\n' for row in rows))
+            call_command('load_catalog', dir=directory, stdout=StringIO())
+
+    def test_invalid_rows_are_reported_before_loading(self):
+        with self.assertRaisesMessage(CommandError, 'Dòng 3: không tìm thấy color') as error:
+            self.load_stock('P1,C1,S1,4', 'P1,XX,S2,1', 'P1,C1,S1,2', 'P1,C1,S2,abc')
+        self.assertIn('Dòng 4: trùng biến thể với dòng 2', str(error.exception))
+        self.assertIn('Dòng 5: số lượng không hợp lệ', str(error.exception))
+        self.assertFalse(StockQuantity.objects.exists())
+
+    def test_hot_variant_is_compared_with_available_stock(self):
+        stock = StockQuantity.objects.create(product_id='P1', color_id='C1', size_id='S1', stock=10)
+        inventory.enable_hot_mode(stock.pk, 4)
+        self.load_stock('P1,C1,S1,6')
+        stock.refresh_from_db()
+        self.assertEqual(stock.available_stock, 6)
+        self.assertEqual(inventory.ledger_balances([stock.pk]), {stock.pk: 6})
+
+
+class RecommenderLoadTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(utils, _recommender=None, _recommender_failed_at=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_load_is_logged_and_remembered(self):
+        with mock.patch('joblib.load', side_effect=FileNotFoundError) as load, \
+                self.assertLogs('products.utils', 'ERROR') as logs:
+            self.assertFalse(utils.has_recommendations('KH1'))
+            self.assertEqual(utils.get_recommender(), (None, {}))
+        self.assertEqual(load.call_count, 1)
+        self.assertIn('Traceback', logs.output[0])
+        # Hết thời gian chờ thì thử tải lại
+        utils._recommender_failed_at -= utils.RECOMMENDER_RETRY_SECONDS
+        with mock.patch('joblib.load', return_value=object()):
+            self.assertIsNotNone(utils.get_recommender()[0])
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_startup_does_not_load_ml_stack(self):
+        # Tiến trình mới: trong tiến trình test các module có thể đã được nạp từ trước
+        script = (
+            "import sys, django, shop_vivu; django.setup(); import products.urls, recommendation.tasks; "
+            "print('loaded:', ','.join(sorted(name for name in ('sklearn', 'joblib', 'surprise', 'pandas') if name in sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines()[-1].strip(), 'loaded:')
+
+
+class AvailabilityMapTests(TestCase):
+    def setUp(self):
+        color = Color.objects.create(color_id='C1', name='Đỏ')
+        size = Size.objects.create(size_id='S1', name='M')
+        product = Product.objects.create(product_id='P1', name='Áo', import_price=Decimal('5'), sell_price=Decimal('10'))
+        self.stock = StockQuantity.objects.create(product=product, color=color, size=size, stock=3)
+
+    def test_fresh_map_right_after_boot(self):
+        # time.monotonic() nhỏ hơn FULL_RELOAD_SECONDS ngay sau khi máy khởi động
+        with mock.patch('products.availability.time.monotonic', return_value=10.0):
+            self.assertEqual(AvailabilityMap().get('P1', 'C1', 'S1'), 3)
+
+    def test_deleted_variant_is_dropped(self):
+        availability = AvailabilityMap()
+        self.assertEqual(availability.get('P1', 'C1', 'S1'), 3)
+        stock_id = self.stock.pk
+        self.stock.delete()
+        availability.mark_dirty([stock_id])
+        self.assertIsNone(availability.get('P1', 'C1', 'S1'))
@@ -1,26 +1,52 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 from .views import (
     BannerList, ProductListView, ProductReviewListView, ProductSearchView, CategoryListView,
-    NewProductsView, FilterProductsByPriceView, ProductsByCategoryView, ProductDetail, RecommendProductsView, RelatedProductsView, ReviewCreateAPIView, TopSalesRealTimeAPIView
+    NewProductsView, FilterProductsByPriceView, ProductsByCategoryView, ProductDetail, RecommendProductsView, RelatedProductsView, ReviewCreateAPIView, TopSalesRealTimeAPIView,
+    AvailabilityView
 )
 
+if settings.ASYNC_CATALOG:
+    # Chạy dưới ASGI: các API đọc danh mục dùng view async (products/async_views.py)
+    from . import async_views
+    catalog = {
+        'product-list': async_views.product_list,
+        'product-detail': async_views.product_detail,
+        'category-list': async_views.category_list,
+        'new-products': async_views.new_products,
+        'banner-list': async_views.banner_list,
+        'related-products': async_views.related_products,
+        'recommend_products': async_views.recommend_products,
+    }
+else:
+    catalog = {
+        'product-list': ProductListView.as_view(),
+        'product-detail': ProductDetail.as_view(),
+        'category-list': CategoryListView.as_view(),
+        'new-products': NewProductsView.as_view(),
+        'banner-list': BannerList.as_view(),
+        'related-products': RelatedProductsView.as_view(),
+        'recommend_products': RecommendProductsView.as_view(),
+    }
+
 urlpatterns = [
-    path('products/', ProductListView.as_view(), name='product-list'),
-    path('product/<str:product_id>/', ProductDetail.as_view(), name='product-detail'),
+    path('products/', catalog['product-list'], name='product-list'),
+    path('product/<str:product_id>/', catalog['product-detail'], name='product-detail'),
     path('products/search/', ProductSearchView.as_view(), name='product-search'),
-    path('categories/', CategoryListView.as_view(), name='category-list'),
-    path('products/new/', NewProductsView.as_view(), name='new-products'),
+    path('categories/', catalog['category-list'], name='category-list'),
+    path('products/new/', catalog['new-products'], name='new-products'),
     path('products/filter-by-price/', FilterProductsByPriceView.as_view(), name='filter-products-by-price'),
     path('products/by-category/<str:category_id>/', ProductsByCategoryView.as_view(), name='products-by-category'),
     path('reviews/product/<str:product_id>/', ProductReviewListView.as_view(), name='product-reviews'),
     path('reviews/', ReviewCreateAPIView.as_view(), name='review-create'),
-    path('banners/', BannerList.as_view(), name='banner-list'),
+    path('banners/', catalog['banner-list'], name='banner-list'),
+    path('availability/', AvailabilityView.as_view(), name='availability'),
     path('top-sales-realtime/', TopSalesRealTimeAPIView.as_view(), name='top-sales-realtime'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
-    path('related_products/<str:product_id>/', RelatedProductsView.as_view(), name='related-products'),
-    path('recommend/<str:user_id>/', RecommendProductsView.as_view(), name='recommend_products'),
+    path('related_products/<str:product_id>/', catalog['related-products'], name='related-products'),
+    path('recommend/<str:user_id>/', catalog['recommend_products'], name='recommend_products'),
 
      # API để tạo thanh toán VNPAY
     path('create_payment/', views.create_payment, name='create_payment'),
@@ -1,32 +1,57 @@
-import requests, re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+"""
+Sản phẩm liên quan (TF-IDF) và gợi ý sản phẩm (mô hình SVD).
+
+scikit-learn, NumPy, requests và mô hình chỉ được import/tải ở lần đầu dùng tới, không phải khi
+import module: mọi lệnh `manage.py`, lần chạy test và worker khởi động đều import module này qua URLconf.
+"""
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
 from products.models import Product, Review
 from django.db.models import Count, Avg
-import joblib
 from user.models import User
 
+logger = logging.getLogger(__name__)
 
+MODEL_PATH = "recommendation/svd_model.pkl"
+# Tải mô hình lỗi (thiếu file, file hỏng): dùng gợi ý phổ biến, chỉ thử tải lại sau bấy nhiêu giây
+RECOMMENDER_RETRY_SECONDS = 300
+
+_recommender = None
+_recommender_failed_at = None
+_recommender_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
 def get_vietnamese_stopwords():
+    # Tải một lần cho mỗi tiến trình (trước đây tải lại từ GitHub ở mỗi request)
+    import requests
+
     url = "https://raw.githubusercontent.com/stopwords/vietnamese-stopwords/master/vietnamese-stopwords.txt"
     response = requests.get(url)
     stopwords = response.text.splitlines()
 
     stopwords = [word for word in stopwords if word.isalpha()]
-    return stopwords
+    return tuple(stopwords)
 
 def clean_description(text):
     cleaned_text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
     return cleaned_text
 
 def calculate_cosine_similarity(features, vietnamese_stopwords):
-    tfidf = TfidfVectorizer(stop_words=vietnamese_stopwords)
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    tfidf = TfidfVectorizer(stop_words=list(vietnamese_stopwords))
     tfidf_matrix = tfidf.fit_transform(features)
     cosine_sim = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
     return cosine_sim
 
 def calculate_weighted_scores(cosine_sim, product, products):
+    import numpy as np
+
     prices = [float(p.sell_price) for p in products]
     price_differences = np.abs(np.array(prices, dtype=float) - float(product.sell_price))
 
@@ -38,18 +63,49 @@ def calculate_weighted_scores(cosine_sim, product, products):
 
     return weighted_scores
 
-# Tải mô hình đã huấn luyện
-model = joblib.load("recommendation/svd_model.pkl")
-
-# Ánh xạ user_id và product_id thành chỉ mục
-users = User.objects.values('user_id')
-products = Product.objects.values('product_id')
-
-user_id_to_index = {user['user_id']: idx for idx, user in enumerate(users)}
-product_id_to_index = {product['product_id']: idx for idx, product in enumerate(products)}
+def rank_related_products(product, products, vietnamese_stopwords, k=5):
+    """Top K sản phẩm gần `product` nhất theo mô tả (TF-IDF cosine) và giá; chỉ tính toán, không truy vấn."""
+    features = [f"{p.name} {p.category} {clean_description(p.description)}" for p in products] + [f"{product.name} {product.category} {clean_description(product.description)}"]
+    # Tính độ tương đồng cosine
+    cosine_sim = calculate_cosine_similarity(features, vietnamese_stopwords)
+    # Tính sự khác biệt về giá và điểm trọng số
+    weighted_scores = calculate_weighted_scores(cosine_sim, product, products)
+    # Sắp xếp các sản phẩm theo điểm tương đồng (cả mô tả và giá)
+    sorted_indices = weighted_scores.argsort()[-k:][::-1]
+    return [products[i] for i in sorted_indices]
+
+def get_recommender():
+    """
+    (mô hình, ánh xạ user_id -> chỉ mục), tải ở lần gọi đầu tiên trong mỗi tiến trình rồi dùng lại.
+    Tải lỗi thì trả về (None, {}) và ghi nhớ lỗi `RECOMMENDER_RETRY_SECONDS` giây.
+    Có truy vấn CSDL: trong code async gọi qua `sync_to_async`.
+    """
+    global _recommender, _recommender_failed_at
+    if _recommender is None and not _recommender_failed_recently():
+        with _recommender_lock:
+            if _recommender is None and not _recommender_failed_recently():
+                try:
+                    import joblib
+
+                    model = joblib.load(MODEL_PATH)
+                    user_ids = User.objects.values_list('user_id', flat=True)
+                    _recommender = (model, {user_id: idx for idx, user_id in enumerate(user_ids)})
+                except Exception:
+                    _recommender_failed_at = time.monotonic()
+                    logger.exception("Không tải được mô hình gợi ý %s", MODEL_PATH)
+    return _recommender or (None, {})
+
+def _recommender_failed_recently():
+    return _recommender_failed_at is not None and time.monotonic() - _recommender_failed_at < RECOMMENDER_RETRY_SECONDS
+
+def has_recommendations(user_id):
+    """Mô hình đã tải được và biết người dùng này."""
+    model, user_id_to_index = get_recommender()
+    return bool(model) and user_id in user_id_to_index
 
 def recommend_products(user_id, k=8):
     try:
+        model, user_id_to_index = get_recommender()
         # Kiểm tra nếu model không tồn tại
         if not model:
             print("Model chưa được tải. Gợi ý sản phẩm phổ biến.")
@@ -66,29 +122,34 @@ def recommend_products(user_id, k=8):
             print("Không có sản phẩm nào. Gợi ý sản phẩm phổ biến.")
             return recommend_popular_products(k)
 
-        # Dự đoán điểm đánh giá cho tất cả sản phẩm
-        predictions = [
-            (product_id, model.predict(user_id, product_id).est)
-            for product_id in all_products
-        ]
-
-        # Sắp xếp các sản phẩm theo điểm đánh giá dự đoán giảm dần
-        predictions.sort(key=lambda x: x[1], reverse=True)
-        # Lấy top K sản phẩm
-        recommended_products = [product_id for product_id, _ in predictions[:k]]
-
-        return recommended_products
+        return predict_top_products(user_id, all_products, k)
     except Exception as e:
         print(f"Error in recommend_products: {e}")
         return recommend_popular_products(k)
 
+def predict_top_products(user_id, product_ids, k=8):
+    """Top K sản phẩm theo điểm dự đoán của mô hình (chỉ tính toán, không truy vấn)."""
+    model, _ = get_recommender()
+    # Dự đoán điểm đánh giá cho tất cả sản phẩm
+    predictions = [
+        (product_id, model.predict(user_id, product_id).est)
+        for product_id in product_ids
+    ]
+
+    # Sắp xếp các sản phẩm theo điểm đánh giá dự đoán giảm dần
+    predictions.sort(key=lambda x: x[1], reverse=True)
+    # Lấy top K sản phẩm
+    return [product_id for product_id, _ in predictions[:k]]
+
+def popular_products_queryset(k=8):
+    # Tính sản phẩm phổ biến dựa trên đánh giá
+    return Review.objects.values('product__product_id') \
+        .annotate(avg_rating=Avg('rating'), review_count=Count('review_id')) \
+        .order_by('-avg_rating', '-review_count')[:k]
+
 def recommend_popular_products(k=8):
     try:
-        # Tính sản phẩm phổ biến dựa trên đánh giá
-        popular_products = Review.objects.values('product__product_id') \
-            .annotate(avg_rating=Avg('rating'), review_count=Count('review_id')) \
-            .order_by('-avg_rating', '-review_count')[:k]
-        return [item['product__product_id'] for item in popular_products]
+        return [item['product__product_id'] for item in popular_products_queryset(k)]
     except Exception as e:
         print(f"Error in recommend_popular_products: {e}")
         return []
\ No newline at end of file
@@ -1,5 +1,6 @@
 
-from cart.models import Order, OrderLine
+from cart import sales
+from cart.models import Order, OrderLine, SalesRollup
 import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -8,12 +9,13 @@ from rest_framework.exceptions import  ValidationError
 from django.db.models import Q
 
 from .vnpay import VNPay
+from .availability import availability_map
 from .models import Banner, Image, Product, Category, Review
 from .serializers import BannerSerializer, ProductSerializer, CategorySerializer, ReviewSerializer
 from rest_framework import status, permissions
 from unidecode import unidecode
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, F
+from django.db.models import Sum, F, Max
 from django.utils.timezone import now
 from django.db.models import OuterRef, Subquery
 from rest_framework import pagination
@@ -24,12 +26,12 @@ from django.contrib.admin.views.decorators import staff_member_required
 from datetime import datetime
 from django.contrib.auth.decorators import user_passes_test
 from user.models import User
-from .utils import get_vietnamese_stopwords, clean_description, calculate_cosine_similarity, calculate_weighted_scores, recommend_products
+from .utils import get_vietnamese_stopwords, rank_related_products, recommend_products
 
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.conf import settings
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import hashlib
 import json
 import hmac
@@ -222,9 +224,30 @@ class CategoryListView(ListAPIView):
     serializer_class = CategorySerializer
     
 
+def new_products_queryset():
+    """Sản phẩm mới nhất trước (index trên `created_at`)."""
+    return Product.objects.order_by('-created_at')
+
+
+def price_filter_queryset(min_price, max_price, category_id=None):
+    """Sản phẩm trong khoảng giá (index trên `sell_price`), có thể lọc thêm theo danh mục."""
+    filters = Q(sell_price__gte=min_price) & Q(sell_price__lte=max_price)
+    if category_id:
+        filters &= Q(category__category_id=category_id)
+    return Product.objects.filter(filters)
+
+
+def category_products_queryset(category_id):
+    return Product.objects.filter(category__category_id=category_id)
+
+
+def product_reviews_queryset(product_id):
+    return Review.objects.filter(product_id=product_id)
+
+
 class NewProductsView(APIView):
     def get(self, request):
-        products = Product.objects.order_by('-created_at')[:10]
+        products = new_products_queryset()[:10]
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
 
@@ -234,17 +257,9 @@ class FilterProductsByPriceView(APIView):
         min_price = request.query_params.get('min_price', 0)
         max_price = request.query_params.get('max_price', 9999999)
         category_id = request.query_params.get('category_id', None)
-        
-        # Xây dựng bộ lọc cơ bản
-        filters = Q(sell_price__gte=min_price) & Q(sell_price__lte=max_price)
 
-        # Thêm điều kiện lọc theo category_id nếu có
-        if category_id:
-            filters &= Q(category__category_id=category_id)
-            
-        
-        # Truy vấn sản phẩm theo điều kiện lọc
-        products = Product.objects.filter(filters)
+        # Truy vấn sản phẩm theo khoảng giá, lọc thêm theo category_id nếu có
+        products = price_filter_queryset(min_price, max_price, category_id)
         paginator = CustomPagination()
         paginated_products = paginator.paginate_queryset(products, request)
         
@@ -258,7 +273,7 @@ class FilterProductsByPriceView(APIView):
 class ProductsByCategoryView(APIView):
     
     def get(self, request, category_id):
-        products = Product.objects.filter(category__category_id=category_id)
+        products = category_products_queryset(category_id)
         
         paginator = CustomPagination()
         paginated_products = paginator.paginate_queryset(products, request)
@@ -273,7 +288,7 @@ class ProductReviewListView(APIView):
 
     def get(self, request, product_id):
         try:
-            reviews = Review.objects.filter(product_id=product_id)
+            reviews = product_reviews_queryset(product_id)
             if not reviews.exists():
                 return Response({"message": "No reviews found for this product."}, status=status.HTTP_404_NOT_FOUND)
             
@@ -310,7 +325,7 @@ class ReviewCreateAPIView(APIView):
                 
                 # Cập nhật status_review thành 1 (đã đánh giá)
                 orderline.status_review = 1
-                orderline.save()
+                orderline.save(update_fields=['status_review'])
 
                 return Response({
                     'message': 'Bình luận đã được thêm thành công.',
@@ -339,6 +354,32 @@ class BannerList(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AvailabilityView(APIView):
+    """
+    Tra cứu tồn kho của nhiều biến thể trong một request, đọc từ bảng tồn kho trong bộ nhớ.
+    Body: {"items": [{"product_id": ..., "color_id": ..., "size_id": ...}, ...]}
+    """
+    MAX_ITEMS = 200
+
+    def post(self, request, format=None):
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "items must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.MAX_ITEMS:
+            return Response({"detail": f"At most {self.MAX_ITEMS} items per request."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            variants = [(item['product_id'], item['color_id'], item['size_id']) for item in items]
+        except (KeyError, TypeError):
+            return Response({"detail": "Each item requires product_id, color_id and size_id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        stocks = availability_map.lookup(variants)
+        data = [
+            {"product_id": product_id, "color_id": color_id, "size_id": size_id, "stock": stock}
+            for (product_id, color_id, size_id), stock in zip(variants, stocks)
+        ]
+        return Response({"items": data}, status=status.HTTP_200_OK)
+
+
 from datetime import datetime
 
 def is_superuser(user):
@@ -346,9 +387,6 @@ def is_superuser(user):
 
 @user_passes_test(is_superuser)
 def dashboard_view(request):
-    # Tính toán doanh thu trong thời gian qua
-    orders = Order.objects.filter(status='delivered')
-
     # Chọn thời gian để thống kê (ví dụ: tháng qua)
     start_date_str = request.GET.get('start_date', '2023-01-01')
     end_date_str = request.GET.get('end_date', '2023-12-31')
@@ -362,13 +400,10 @@ def dashboard_view(request):
         start_date = datetime(2023, 1, 1).date()
         end_date = datetime(2023, 12, 31).date()
 
-    # Lọc đơn hàng theo khoảng thời gian
-    orders_in_range = orders.filter(created_at__date__range=[start_date, end_date])
-
-    # Tính toán doanh thu theo ngày
-    revenue_per_day = orders_in_range.values('created_at__date').annotate(
-        total_revenue=Sum('total_price')
-    ).order_by('created_at__date')
+    # Doanh thu theo ngày của các đơn đã giao, đọc từ bảng tổng hợp (không quét bảng đơn hàng)
+    revenue_per_day = SalesRollup.objects.filter(
+        period=SalesRollup.DAY, product_id='', category_id='', period_start__range=[start_date, end_date],
+    ).exclude(orders=0).order_by('period_start').values_list('period_start', 'revenue')
 
     # Nếu không có doanh thu, tạo một danh sách với doanh thu 0
     if not revenue_per_day:
@@ -376,8 +411,8 @@ def dashboard_view(request):
         revenues = [0]
     else:
         # Chuyển doanh thu thành số thực (float) để tránh lỗi Decimal trong JavaScript
-        dates = [entry['created_at__date'].strftime('%Y-%m-%d') for entry in revenue_per_day]
-        revenues = [float(entry['total_revenue']) for entry in revenue_per_day]
+        dates = [day.strftime('%Y-%m-%d') for day, _ in revenue_per_day]
+        revenues = [float(revenue) for _, revenue in revenue_per_day]
 
 
     # Trả về kết quả cho template
@@ -401,34 +436,17 @@ class TopSalesRealTimeAPIView(APIView):
         year = int(request.GET.get('year', current_year))  # Lấy từ query params hoặc mặc định
 
         try:
-            # Truy vấn dữ liệu của tháng hiện tại
-            order_lines = OrderLine.objects.filter(
-                order__created_at__year=year,
-                order__created_at__month=month
-            )
-            product_images = Image.objects.filter(product=OuterRef('product')).values('url')[:1]
-            # Tổng hợp số lượng bán và doanh thu của từng sản phẩm
-            sales_data = (
-                order_lines.values('product__product_id', 'product__name', 'product__sell_price')
-                .annotate(
-                    quantity_sold=Sum('quantity'),
-                    total_sales=Sum(F('quantity') * F('product__sell_price')),
-                    image_url=Subquery(product_images)
-                )
-                .order_by('-quantity_sold')[:8]  # Sắp xếp theo số lượng bán giảm dần
-            )
-
-            # Chuẩn bị dữ liệu để trả về
+            # Bảng xếp hạng được duy trì khi đặt/hủy đơn hàng (cart/sales.py), không tổng hợp lại mỗi request
             response_data = [
                 {
-                    'product_id': item['product__product_id'],
-                    'name': item['product__name'],
-                    'sell_price': item['product__sell_price'],
-                    'quantity_sold': item['quantity_sold'],
-                    'total_sales': item['total_sales'],
-                    'image_url': item['image_url'] if item['image_url'] else None
+                    'product_id': item['product_id'],
+                    'name': item['product_name'],
+                    'sell_price': (item['revenue'] / item['units']).quantize(item['revenue']),
+                    'quantity_sold': item['units'],
+                    'total_sales': item['revenue'],
+                    'image_url': item['image_url'] or None
                 }
-                for item in sales_data
+                for item in sales.leaderboard(date(year, month, 1))
             ]
 
             return Response({
@@ -450,16 +468,8 @@ class RelatedProductsView(APIView):
             vietnamese_stopwords = get_vietnamese_stopwords()
             # Lấy sản phẩm hiện tại từ product_id
             product = Product.objects.get(product_id=product_id)
-            products = Product.objects.exclude(product_id=product_id) 
-            features = [f"{p.name} {p.category} {clean_description(p.description)}" for p in products] + [f"{product.name} {product.category} {clean_description(product.description)}"]
-            # Tính độ tương đồng cosine
-            cosine_sim = calculate_cosine_similarity(features, vietnamese_stopwords)
-            # Tính sự khác biệt về giá và điểm trọng số
-            weighted_scores = calculate_weighted_scores(cosine_sim, product, products)
-            # Sắp xếp các sản phẩm theo điểm tương đồng (cả mô tả và giá)
-            sorted_indices = weighted_scores.argsort()[-5:][::-1]
-            products_list = list(products)
-            related_products = [products_list[i] for i in sorted_indices]
+            products = list(Product.objects.exclude(product_id=product_id))
+            related_products = rank_related_products(product, products, vietnamese_stopwords)
             serializer = ProductSerializer(related_products, many=True)
             return Response(serializer.data)
         except Product.DoesNotExist:
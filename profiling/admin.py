@@ -0,0 +1,73 @@
+from django.contrib import admin
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from shop_vivu.admin_paginator import EstimatedCountPaginator
+
+from .models import ProfileCapture
+
+# Định dạng tải về: (trường, đuôi file, content type)
+DOWNLOADS = {
+    'folded': ('folded_stacks', 'folded', 'text/plain; charset=utf-8'),
+    'pstats': ('pstats_data', 'prof', 'application/octet-stream'),
+}
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'method', 'path', 'view_name', 'mode', 'trigger', 'duration_ms', 'queries', 'status_code', 'user')
+    list_filter = ('mode', 'trigger', 'view_name', 'created_at')
+    search_fields = ('path', 'view_name', 'user__email')
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    fields = (
+        'created_at', 'method', 'path', 'view_name', 'user', 'mode', 'trigger',
+        'status_code', 'duration_ms', 'queries', 'downloads', 'report_preview',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download_view), name='profilecapture-download'),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, pk, kind):
+        if kind not in DOWNLOADS:
+            raise Http404
+        field, extension, content_type = DOWNLOADS[kind]
+        capture = get_object_or_404(ProfileCapture.objects.only(field), pk=pk)
+        content = getattr(capture, field)
+        if not content:
+            raise Http404
+        response = HttpResponse(bytes(content) if kind == 'pstats' else content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="profile-{pk}.{extension}"'
+        return response
+
+    @admin.display(description="Tải về")
+    def downloads(self, obj):
+        links = []
+        if obj.folded_stacks:
+            links.append(format_html(
+                '<a href="{}">Stack dạng folded</a> (flamegraph.pl, speedscope.app)',
+                reverse('admin:profilecapture-download', args=[obj.pk, 'folded']),
+            ))
+        if obj.pstats_data:
+            links.append(format_html(
+                '<a href="{}">pstats</a> (snakeviz, gprof2dot)',
+                reverse('admin:profilecapture-download', args=[obj.pk, 'pstats']),
+            ))
+        return format_html('<br>'.join(['{}'] * len(links)), *links) if links else '-'
+
+    @admin.display(description="Báo cáo")
+    def report_preview(self, obj):
+        return format_html('<pre style="font-size: 12px; white-space: pre; overflow-x: auto;">{}</pre>', obj.report)
@@ -0,0 +1,109 @@
+"""
+Đo hiệu năng theo yêu cầu, không cần triển khai lại:
+
+- Nhân viên (is_staff) thêm header `X-Profile: cprofile|sample` hoặc tham số `?_profile=cprofile|sample`
+  vào request bất kỳ (xác thực bằng session, Token hay Bearer đều được). Kết quả lưu vào
+  `ProfileCapture`, mã kết quả trả về trong header `X-Profile-Id`.
+- Lấy mẫu ngẫu nhiên: tỉ lệ `PROFILING_SAMPLE_RATE` request được đo bằng cách lấy mẫu stack;
+  chỉ lưu request chậm hơn `PROFILING_SAMPLE_MIN_MS`, qua task Celery để không cộng vào thời gian trả lời.
+
+Việc lưu kết quả không tính là lần ghi của request (không ghim request về CSDL chính, xem `shop_vivu.db_router`).
+
+Chỉ đo request chạy đồng bộ: dưới ASGI các request chia nhau event loop nên không tách riêng được.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import ProfileCapture
+from .profilers import CProfileCapture, StackSampler
+from .tasks import save_profile_capture, store_capture
+
+logger = logging.getLogger(__name__)
+
+
+def _staff_user(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return user
+    # Request API xác thực trong view của DRF, nên xác thực trước ở đây
+    authenticators = [authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        user = Request(request, authenticators=authenticators).user
+    except exceptions.APIException:
+        return None
+    return user if user.is_staff else None
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        mode, trigger = self._plan(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profiler = CProfileCapture() if mode == ProfileCapture.CPROFILE else StackSampler(settings.PROFILING_SAMPLE_INTERVAL)
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            started = time.perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                result = profiler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+
+        if trigger == ProfileCapture.RANDOM and duration_ms < settings.PROFILING_SAMPLE_MIN_MS:
+            return response
+        user = getattr(request, 'user', None)
+        match = request.resolver_match
+        fields = {
+            'method': request.method, 'path': request.path[:500], 'view_name': match.view_name[:100] if match else '',
+            'user_id': user.pk if user is not None and user.is_authenticated else None, 'mode': mode,
+            'trigger': trigger, 'status_code': response.status_code, 'duration_ms': duration_ms, 'queries': queries,
+            **result,
+        }
+        if trigger == ProfileCapture.ON_DEMAND:
+            # Nhân viên cần mã kết quả trong response: lưu ngay
+            response['X-Profile-Id'] = str(store_capture(fields).pk)
+            return response
+        try:
+            save_profile_capture.delay(fields)
+        except Exception:
+            logger.warning("Không gửi được kết quả lấy mẫu %s %s", request.method, request.path, exc_info=True)
+        return response
+
+    @staticmethod
+    def _plan(request):
+        requested = request.headers.get(settings.PROFILING_HEADER) or request.GET.get(settings.PROFILING_QUERY_PARAM)
+        if requested and _staff_user(request) is not None:
+            mode = ProfileCapture.SAMPLING if requested == 'sample' else ProfileCapture.CPROFILE
+            return mode, ProfileCapture.ON_DEMAND
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return ProfileCapture.SAMPLING, ProfileCapture.RANDOM
+        return None, None
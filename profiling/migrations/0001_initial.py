@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('method', models.CharField(max_length=10, verbose_name='Phương thức')),
+                ('path', models.CharField(max_length=500, verbose_name='Đường dẫn')),
+                ('view_name', models.CharField(blank=True, default='', max_length=100, verbose_name='Tên URL')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sampling', 'Lấy mẫu stack')], max_length=10, verbose_name='Cách đo')),
+                ('trigger', models.CharField(choices=[('on_demand', 'Nhân viên yêu cầu'), ('random', 'Lấy mẫu ngẫu nhiên')], max_length=10, verbose_name='Nguồn')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Mã trả về')),
+                ('duration_ms', models.FloatField(verbose_name='Thời gian (ms)')),
+                ('queries', models.PositiveIntegerField(default=0, verbose_name='Số truy vấn')),
+                ('report', models.TextField(blank=True, default='', verbose_name='Báo cáo')),
+                ('folded_stacks', models.TextField(blank=True, default='', verbose_name='Stack dạng folded')),
+                ('pstats_data', models.BinaryField(blank=True, null=True, verbose_name='Dữ liệu pstats')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Thời gian')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Người yêu cầu')),
+            ],
+            options={
+                'verbose_name': 'Kết quả đo hiệu năng',
+                'verbose_name_plural': 'Kết quả đo hiệu năng',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['view_name', 'created_at'], name='profile_view_created')],
+            },
+        ),
+    ]
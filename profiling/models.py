@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import models
+
+
+class ProfileCapture(models.Model):
+    """Kết quả đo hiệu năng (profile) của một request, xem trong trang quản trị."""
+    CPROFILE = 'cprofile'
+    SAMPLING = 'sampling'
+    MODE_CHOICES = [
+        (CPROFILE, 'cProfile'),
+        (SAMPLING, 'Lấy mẫu stack'),
+    ]
+    ON_DEMAND = 'on_demand'
+    RANDOM = 'random'
+    TRIGGER_CHOICES = [
+        (ON_DEMAND, 'Nhân viên yêu cầu'),
+        (RANDOM, 'Lấy mẫu ngẫu nhiên'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    method = models.CharField(max_length=10, verbose_name="Phương thức",)
+    path = models.CharField(max_length=500, verbose_name="Đường dẫn",)
+    view_name = models.CharField(max_length=100, blank=True, default='', verbose_name="Tên URL",)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Người yêu cầu",
+    )
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, verbose_name="Cách đo",)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, verbose_name="Nguồn",)
+    status_code = models.PositiveSmallIntegerField(verbose_name="Mã trả về",)
+    duration_ms = models.FloatField(verbose_name="Thời gian (ms)",)
+    queries = models.PositiveIntegerField(default=0, verbose_name="Số truy vấn",)
+    # cProfile: bảng thống kê đọc được; lấy mẫu: số mẫu và thời gian theo hàm
+    report = models.TextField(blank=True, default='', verbose_name="Báo cáo",)
+    # Định dạng "collapsed" (hàm;hàm;hàm số_mẫu) cho flamegraph.pl, speedscope
+    folded_stacks = models.TextField(blank=True, default='', verbose_name="Stack dạng folded",)
+    # Dữ liệu pstats gốc (marshal) cho snakeviz, gprof2dot
+    pstats_data = models.BinaryField(null=True, blank=True, verbose_name="Dữ liệu pstats",)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Thời gian",)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    class Meta:
+        verbose_name = "Kết quả đo hiệu năng"
+        verbose_name_plural = "Kết quả đo hiệu năng"
+        ordering = ['-id']
+        indexes = [models.Index(fields=['view_name', 'created_at'], name='profile_view_created')]
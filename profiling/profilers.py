@@ -0,0 +1,87 @@
+"""
+Hai cách đo một request:
+- `CProfileCapture`: cProfile, ghi mọi lời gọi hàm; chính xác nhưng làm request chậm đi đáng kể.
+- `StackSampler`: một thread phụ đọc stack của thread xử lý request sau mỗi khoảng `interval`;
+  gần như không làm chậm request nên dùng được cho lấy mẫu ngẫu nhiên trên production.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+REPORT_LINES = 60
+
+
+class CProfileCapture:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.profiler.create_stats()
+        # Cùng định dạng với `pstats.Stats.dump_stats`; lấy trước vì `pstats.Stats` lấy đi `profiler.stats`
+        data = marshal.dumps(self.profiler.stats)
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(REPORT_LINES)
+        return {'report': stream.getvalue(), 'pstats_data': data}
+
+
+def _label(frame):
+    code = frame.f_code
+    filename = os.sep.join(code.co_filename.split(os.sep)[-2:])
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def _fold(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame).replace(';', ','))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_fold(frame)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        folded = '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common())
+        return {'report': self._report(), 'folded_stacks': folded}
+
+    def _report(self):
+        """Thời gian ước tính theo hàm: tự thân (hàm ở đỉnh stack) và tổng (hàm có mặt trong stack)."""
+        own, total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            labels = stack.split(';')
+            own[labels[-1]] += count
+            for label in set(labels):
+                total[label] += count
+        ms = self.interval * 1000
+        lines = [
+            f"{sum(self.samples.values())} mẫu, mỗi mẫu {ms:g} ms",
+            f"{'tự thân ms':>11} {'tổng ms':>9}  hàm",
+        ]
+        lines += [f"{own[label] * ms:>11.0f} {count * ms:>9.0f}  {label}" for label, count in total.most_common(REPORT_LINES)]
+        return '\n'.join(lines)
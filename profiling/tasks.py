@@ -0,0 +1,30 @@
+from celery import shared_task
+from django.conf import settings
+
+from shop_vivu.db_router import detached_scope
+
+from .models import ProfileCapture
+
+
+def store_capture(fields):
+    """Lưu một kết quả đo; cứ `PROFILING_PRUNE_EVERY` kết quả thì dọn bớt kết quả cũ."""
+    # Không tính là lần ghi của request đang chạy: request không bị ghim về CSDL chính vì kết quả đo
+    with detached_scope():
+        capture = ProfileCapture.objects.create(**fields)
+        if capture.pk % settings.PROFILING_PRUNE_EVERY == 0:
+            prune_captures()
+    return capture
+
+
+def prune_captures():
+    # Chỉ giữ `PROFILING_MAX_CAPTURES` kết quả mới nhất
+    limit = settings.PROFILING_MAX_CAPTURES
+    cutoff = list(ProfileCapture.objects.order_by('-id').values_list('id', flat=True)[limit:limit + 1])
+    if cutoff:
+        ProfileCapture.objects.filter(id__lte=cutoff[0]).delete()
+
+
+@shared_task(ignore_result=True)
+def save_profile_capture(fields):
+    """Lưu kết quả lấy mẫu ngẫu nhiên ngoài luồng xử lý request (chỉ gồm văn bản, gửi được dạng JSON)."""
+    store_capture(fields)
@@ -0,0 +1,53 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from shop_vivu.db_router import read_scope
+from user.models import User
+
+from .models import ProfileCapture
+from .tasks import store_capture
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def token_header(self, **extra):
+        user = User.objects.create_user(email=f'{len(extra)}@shop.vn', full_name='Test', password='x', **extra)
+        return f'Token {Token.objects.create(user=user).key}'
+
+    def test_staff_header_captures_request(self):
+        response = self.client.get(
+            reverse('banner-list'), HTTP_AUTHORIZATION=self.token_header(is_staff=True), HTTP_X_PROFILE='cprofile',
+        )
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((capture.view_name, capture.mode, capture.trigger), ('banner-list', 'cprofile', 'on_demand'))
+        self.assertTrue(capture.pstats_data)
+
+    def test_query_flag_uses_sampling(self):
+        response = self.client.get(
+            reverse('banner-list') + '?_profile=sample', HTTP_AUTHORIZATION=self.token_header(is_staff=True),
+        )
+        self.assertEqual(ProfileCapture.objects.get(pk=response['X-Profile-Id']).mode, 'sampling')
+
+    def test_non_staff_request_is_not_profiled(self):
+        response = self.client.get(reverse('banner-list'), HTTP_AUTHORIZATION=self.token_header(), HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(ProfileCapture.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_SAMPLE_MIN_MS=0)
+    def test_random_sampling(self):
+        self.client.get(reverse('banner-list'), HTTP_AUTHORIZATION=self.token_header())
+        self.assertEqual(ProfileCapture.objects.get().trigger, 'random')
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_saving_capture_does_not_pin_request(self):
+        with read_scope() as state:
+            store_capture({'method': 'GET', 'path': '/', 'mode': 'sampling', 'trigger': 'random',
+                           'status_code': 200, 'duration_ms': 250.0})
+        self.assertFalse(state.wrote)
+
+    @override_settings(PROFILING_MAX_CAPTURES=2, PROFILING_PRUNE_EVERY=1)
+    def test_old_captures_are_pruned(self):
+        header = self.token_header(is_staff=True)
+        for _ in range(4):
+            self.client.get(reverse('banner-list'), HTTP_AUTHORIZATION=header, HTTP_X_PROFILE='sample')
+        self.assertEqual(ProfileCapture.objects.count(), 2)
@@ -1,12 +1,14 @@
 from celery import shared_task
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
-from surprise import accuracy
 from products.models import Review  # Import mô hình Review của Django
-import joblib
-import pandas as pd
+from products.utils import MODEL_PATH
 @shared_task
 def train_recommendation_model():
+    # Import khi chạy task, không phải khi worker Celery khởi động (autodiscover import module này)
+    from surprise import Dataset, Reader, SVD
+    from surprise.model_selection import train_test_split
+    from surprise import accuracy
+    import joblib
+    import pandas as pd
     # Truy vấn dữ liệu từ cơ sở dữ liệu
     review_data = Review.objects.all().values('user_id', 'product_id', 'rating')
     # Chuyển dữ liệu thành DataFrame
@@ -26,5 +28,5 @@ def train_recommendation_model():
     predictions = model.test(testset)
     rmse = accuracy.rmse(predictions)
     # Lưu mô hình sau khi huấn luyện
-    joblib.dump(model, 'recommendation/svd_model.pkl')
+    joblib.dump(model, MODEL_PATH)
     return f"Model trained with RMSE: {rmse}"
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Phân trang cho trang quản trị của các bảng lớn.
+
+`COUNT(*)` chính xác trên bảng hàng triệu dòng (InnoDB phải quét cả chỉ mục) làm trang danh sách
+chậm vài giây. Khi danh sách không lọc, `EstimatedCountPaginator` lấy số dòng ước lượng từ thống kê
+của cơ sở dữ liệu; khi có lọc/tìm kiếm thì vẫn đếm chính xác trên tập đã lọc.
+Dùng kèm `show_full_result_count = False` để Django không đếm lại toàn bảng lần thứ hai.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Dưới ngưỡng này đếm chính xác vẫn nhanh, và số trang hiển thị đúng tuyệt đối
+ESTIMATE_THRESHOLD = 100_000
+
+ESTIMATE_SQL = {
+    'mysql': (
+        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    ),
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+}
+
+
+def estimated_row_count(model, using='default'):
+    """Số dòng ước lượng của bảng theo thống kê của CSDL, hoặc None nếu backend không hỗ trợ."""
+    connection = connections[using]
+    sql = ESTIMATE_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
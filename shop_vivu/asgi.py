@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shop_vivu.settings')
+# Dưới ASGI các API đọc danh mục dùng view async (products/async_views.py)
+os.environ.setdefault('ASYNC_CATALOG', '1')
 
 application = get_asgi_application()
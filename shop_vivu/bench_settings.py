@@ -0,0 +1,29 @@
+"""
+Cấu hình cho `manage.py bench_load`: CSDL SQLite riêng (nạp từ data/*.csv), cache trong bộ nhớ và
+Celery chạy đồng bộ, để kết quả đo giữa các commit so sánh được với nhau mà không cần MySQL/Redis.
+
+    DJANGO_SETTINGS_MODULE=shop_vivu.bench_settings python manage.py bench_load --output bench.json
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import os
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB', os.path.join(tempfile.gettempdir(), 'shop_vivu_bench.sqlite3')),
+    }
+}
+REPLICA_DATABASES = []
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+CELERY_TASK_ALWAYS_EAGER = True
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+PROFILING_SAMPLE_RATE = 0
+# Số truy vấn đã có trong báo cáo, không cần log cảnh báo vượt ngân sách cho từng request
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'loggers': {'shop_vivu.metrics': {'level': 'ERROR'}},
+}
@@ -0,0 +1,124 @@
+"""
+Chia đọc/ghi giữa CSDL chính (`default`) và các bản sao chỉ đọc (`REPLICA_DATABASES`).
+
+- Ghi, `select_for_update` và mọi truy vấn trong giao dịch (`transaction.atomic`, ví dụ checkout)
+  luôn ở CSDL chính.
+- Chỉ các bảng danh mục, đánh giá và bảng thống kê (`REPLICA_MODELS`) được đọc từ bản sao, và chỉ
+  trong phạm vi một request (`ReplicaPinningMiddleware`). Celery, lệnh quản trị và shell đọc từ CSDL chính.
+- Đọc-sau-ghi: sau lần ghi đầu tiên của request, mọi truy vấn còn lại của request đó về CSDL chính.
+  Request ghi còn đặt cookie `REPLICA_PIN_COOKIE` để các request kế tiếp của cùng trình duyệt đọc
+  CSDL chính thêm `REPLICA_PIN_SECONDS` giây (bù độ trễ sao chép). Request POST/PUT/PATCH/DELETE
+  đọc CSDL chính ngay từ đầu.
+
+Mỗi request chọn một bản sao ngẫu nhiên và dùng nó cho cả request. Chạy thử cục bộ với hai file
+SQLite: thêm `DATABASES['replica1'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ...}` (bản
+chép của file CSDL chính) và `REPLICA_DATABASES = ['replica1']`; trong test đặt
+`'TEST': {'MIRROR': 'default'}` cho bản sao.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_MODELS = {
+    'products.product', 'products.category', 'products.image', 'products.color', 'products.size',
+    'products.banner', 'products.review',
+    'cart.salesrollup', 'cart.productsalescounter',
+}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """Trạng thái định tuyến của một request: bản sao đã chọn, đã bị ghim về CSDL chính chưa."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = random.choice(settings.REPLICA_DATABASES) if settings.REPLICA_DATABASES else None
+
+
+# Đối tượng trạng thái được sửa tại chỗ: thay đổi trong sync_to_async vẫn thấy được ở phía async
+_state = ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def read_scope(pinned=False):
+    """Phạm vi được phép đọc từ bản sao (một request); `pinned` buộc đọc CSDL chính ngay từ đầu."""
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def detached_scope():
+    """Truy vấn nội bộ trong lúc xử lý request (ví dụ lưu kết quả đo): đi CSDL chính, không ghim request."""
+    token = _state.set(None)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None:
+            return None
+        if state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in REPLICA_MODELS:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Bản sao có cùng dữ liệu với CSDL chính
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_scope(self._pinned(request)) as state:
+            response = self.get_response(request)
+        return self._pin_next(response, state)
+
+    async def __acall__(self, request):
+        with read_scope(self._pinned(request)) as state:
+            response = await self.get_response(request)
+        return self._pin_next(response, state)
+
+    @staticmethod
+    def _pinned(request):
+        return request.method not in SAFE_METHODS or settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+    @staticmethod
+    def _pin_next(response, state):
+        if state.wrote and state.replica is not None:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,104 @@
+"""
+Cấp mã dễ đọc (KH0001, OD0000000001, ...) không trùng và không tranh chấp.
+
+Mỗi tiền tố có một dòng `user.IdSequence`. Theo kiểu hi/lo, mỗi tiến trình đặt trước một khối
+`block_size` số bằng một câu UPDATE rồi cấp dần trong bộ nhớ, nên phần lớn lần cấp mã không tốn
+truy vấn nào. Khối được đặt trước trên một kết nối riêng và commit ngay, vì vậy giao dịch bên ngoài
+bị rollback cũng không trả khối về (tiến trình khác không thể nhận lại các số đang dùng).
+Đổi lại mã có thể bị nhảy số khi tiến trình khởi động lại.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+# Tiền tố: (số chữ số tối thiểu, số mã đặt trước mỗi lần)
+SEQUENCES = {
+    'KH': (4, 10),
+    'OD': (10, 100),
+    'OL': (10, 500),
+    'INV': (10, 20),
+    'PIL': (10, 500),
+}
+
+
+class IdAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._connection = None
+        self._inherited = []
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def next_id(self, prefix):
+        width, block_size = SEQUENCES[prefix]
+        with self._lock:
+            last, high = self._blocks.get(prefix, (0, 0))
+            if last >= high:
+                high = self._reserve(prefix, block_size)
+                last = high - block_size
+            last += 1
+            self._blocks[prefix] = (last, high)
+        return f"{prefix}{last:0{width}d}"
+
+    def _after_fork(self):
+        # Tiến trình con (Celery prefork, gunicorn --preload) không được dùng chung khối với tiến trình cha.
+        # Kết nối kế thừa không đóng ở đây vì socket vẫn thuộc về tiến trình cha.
+        self._lock = threading.Lock()
+        self._blocks = {}
+        if self._connection is not None:
+            self._inherited.append(self._connection)
+            self._connection = None
+
+    def _reserve(self, prefix, size):
+        table = apps.get_model('user', 'IdSequence')._meta.db_table
+        for attempt in range(2):
+            try:
+                with self._sequence_transaction() as connection, connection.cursor() as cursor:
+                    table_name = connection.ops.quote_name(table)
+                    cursor.execute(f"UPDATE {table_name} SET next_value = next_value + %s WHERE name = %s", [size, prefix])
+                    if cursor.rowcount:
+                        cursor.execute(f"SELECT next_value FROM {table_name} WHERE name = %s", [prefix])
+                        return cursor.fetchone()[0]
+                    # Tiền tố chưa có dòng (migration chỉ tạo sẵn các tiền tố đã biết)
+                    cursor.execute(f"INSERT INTO {table_name} (name, next_value) VALUES (%s, %s)", [prefix, size])
+                    return size
+            except IntegrityError:
+                # Tiến trình khác vừa tạo dòng này: thử lại bằng UPDATE
+                if attempt:
+                    raise
+
+    @contextmanager
+    def _sequence_transaction(self):
+        default = connections[DEFAULT_DB_ALIAS]
+        if default.vendor == 'sqlite':
+            # SQLite (môi trường dev/test) chỉ cho một kết nối ghi: kết nối riêng sẽ bị khóa bởi
+            # giao dịch đang mở, nên đặt khối ngay trên kết nối mặc định
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                yield default
+            return
+        if self._connection is None:
+            self._connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            self._connection.inc_thread_sharing()
+        connection = self._connection
+        connection.close_if_unusable_or_obsolete()
+        connection.ensure_connection()
+        connection.set_autocommit(False)
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.set_autocommit(True)
+
+
+allocator = IdAllocator()
+
+
+def next_id(prefix):
+    """Mã mới cho tiền tố `prefix`, ví dụ `next_id('OD')` -> 'OD0000000042'."""
+    return allocator.next_id(prefix)
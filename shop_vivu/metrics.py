@@ -0,0 +1,245 @@
+"""
+Đo hiệu năng từng request: số truy vấn, thời gian SQL, thời gian serializer và tổng thời gian.
+
+- Mỗi response có header `Server-Timing` (xem trực tiếp trong tab Network của trình duyệt).
+  Thời gian serializer (các serializer dùng `TimedSerializerMixin`) gồm cả các truy vấn lười phát sinh khi serialize.
+- Độ trễ được gom thành histogram theo tên URL (`product-list`, `create-order`, ...). Mỗi worker
+  gom trong bộ nhớ và định kỳ (`METRICS_FLUSH_SECONDS`) ghi ảnh chụp vào cache; `/metrics/` cộng
+  ảnh chụp của mọi worker và trả về dạng text của Prometheus.
+- Request có số truy vấn vượt ngân sách của view (`QUERY_BUDGETS`, mặc định `DEFAULT_QUERY_BUDGET`)
+  được ghi log cảnh báo và đếm riêng: dấu hiệu của lỗi N+1.
+"""
+import hmac
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+WORKERS_KEY = 'metrics:workers'
+WORKER_KEY = 'metrics:worker:{}'
+WORKER_TTL = 3600
+SUMMED_FIELDS = ('count', 'seconds', 'queries', 'sql_seconds', 'serializer_seconds', 'over_budget')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - started
+
+
+def _watch_connection(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedSerializerMixin:
+    """Cộng thời gian `to_representation` vào số liệu của request hiện tại."""
+
+    def to_representation(self, instance):
+        # Chỉ tính serializer ngoài cùng: serializer lồng và từng phần tử của danh sách đã nằm trong đó
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializing = False
+
+
+_installed = False
+
+
+def install():
+    """Gắn bộ đếm truy vấn vào mọi kết nối CSDL."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(_watch_connection)
+    for connection in connections.all(initialized_only=True):
+        _watch_connection(connection)
+
+
+class Registry:
+    """Số liệu cộng dồn của worker hiện tại, theo tên URL."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.views = {}
+        self.flushed_at = time.monotonic()
+
+    def observe(self, view, metrics, duration, over_budget):
+        with self._lock:
+            entry = self.views.get(view)
+            if entry is None:
+                entry = self.views[view] = {'buckets': [0] * (len(BUCKETS) + 1), **dict.fromkeys(SUMMED_FIELDS, 0)}
+            entry['buckets'][bisect_left(BUCKETS, duration)] += 1
+            entry['count'] += 1
+            entry['seconds'] += duration
+            entry['queries'] += metrics.queries
+            entry['sql_seconds'] += metrics.sql_time
+            entry['serializer_seconds'] += metrics.serializer_time
+            entry['over_budget'] += over_budget
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {**entry, 'buckets': list(entry['buckets'])} for view, entry in self.views.items()}
+
+    def flush(self):
+        """Ghi ảnh chụp của worker này vào cache để `/metrics/` đọc được từ worker bất kỳ."""
+        self.flushed_at = time.monotonic()
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        cache.set(WORKER_KEY.format(worker), self.snapshot(), timeout=WORKER_TTL)
+        workers = cache.get(WORKERS_KEY) or []
+        if worker not in workers:
+            cache.set(WORKERS_KEY, [*workers, worker], timeout=None)
+
+    def flush_if_due(self):
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_SECONDS:
+            self.flush()
+
+
+registry = Registry()
+# Tiến trình con (gunicorn --preload) bắt đầu với số liệu trống
+os.register_at_fork(after_in_child=registry.reset)
+
+
+def collect():
+    """Cộng số liệu của mọi worker còn sống (ảnh chụp trong cache chưa hết hạn)."""
+    workers = cache.get(WORKERS_KEY) or []
+    snapshots = cache.get_many([WORKER_KEY.format(worker) for worker in workers])
+    if len(snapshots) < len(workers):
+        # Bỏ worker đã dừng khỏi danh sách
+        cache.set(WORKERS_KEY, [worker for worker in workers if WORKER_KEY.format(worker) in snapshots], timeout=None)
+    total = {}
+    for snapshot in snapshots.values():
+        for view, entry in snapshot.items():
+            merged = total.get(view)
+            if merged is None:
+                total[view] = entry
+                continue
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], entry['buckets'])]
+            for field in SUMMED_FIELDS:
+                merged[field] += entry[field]
+    return total
+
+
+def render_prometheus(views):
+    lines = [
+        '# HELP http_request_duration_seconds Thời gian xử lý request theo tên URL.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for view, entry in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip([*BUCKETS, '+Inf'], entry['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{view="{view}"}} {entry["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{view="{view}"}} {entry["count"]}')
+    counters = [
+        ('db_queries_total', 'queries', 'Số truy vấn CSDL.'),
+        ('db_query_seconds_total', 'sql_seconds', 'Thời gian chạy truy vấn CSDL.'),
+        ('serializer_seconds_total', 'serializer_seconds', 'Thời gian serialize dữ liệu trả về.'),
+        ('query_budget_exceeded_total', 'over_budget', 'Số request vượt ngân sách truy vấn.'),
+    ]
+    for name, field, help_text in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{view="{view}"}} {entry[field]:g}' for view, entry in sorted(views.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    allowed = request.user.is_staff or (
+        token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    )
+    if not allowed:
+        return HttpResponse(status=403)
+    registry.flush()
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        budget = settings.QUERY_BUDGETS.get(view, settings.DEFAULT_QUERY_BUDGET)
+        over_budget = metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                "%s %s (%s): %d truy vấn, vượt ngân sách %d", request.method, request.path, view, metrics.queries, budget,
+            )
+        registry.observe(view, metrics, duration, over_budget)
+        registry.flush_if_due()
+        response['Server-Timing'] = (
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries", '
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}, total;dur={duration * 1000:.1f}'
+        )
+        return response
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django_filters',
     'django_celery_beat',
     'recommendation',
+    'profiling',
 ]
 AUTH_USER_MODEL = 'user.User'
 
@@ -58,12 +59,15 @@ VNPAY_HASH_SECRET = "EHO3H7BJKKBSBSAUVBC77FQM1BG5DAV3"  # Lấy từ VNPAY
 VNPAY_URL = "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html"  # URL của VNPAY (sandbox cho test)
 
 MIDDLEWARE = [
+    'shop_vivu.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'shop_vivu.db_router.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -104,9 +108,21 @@ DATABASES = {
         'PASSWORD': '123456',  # Mật khẩu người dùng MySQL
         'HOST': 'localhost',  # Địa chỉ máy chủ (localhost nếu chạy trên máy cục bộ)
         'PORT': '3306',  # Cổng MySQL (mặc định là 3306)
+        'CONN_MAX_AGE': 600,  # Giữ kết nối giữa các request thay vì mở lại mỗi request
+        'CONN_HEALTH_CHECKS': True,  # Kiểm tra kết nối giữ lại còn sống trước khi dùng
     }
 }
 
+# Bản sao chỉ đọc (MySQL replication), ví dụ DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+# Đọc danh mục/thống kê từ bản sao (shop_vivu/db_router.py)
+DATABASE_ROUTERS = ['shop_vivu.db_router.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_PIN_COOKIE = 'db_pin'
+REPLICA_PIN_SECONDS = 5  # Đọc CSDL chính thêm chừng này giây sau khi ghi (lớn hơn độ trễ sao chép)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -156,7 +172,8 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')# Đường dẫn trên hệ thống
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',  # Thêm dòng này để sử dụng Token
+        'user.authentication.CachedTokenAuthentication',  # Token, tra token -> user qua cache hai tầng
+        'user.authentication.SignedTokenAuthentication',  # Bearer, access token ký số (STATELESS_AUTH)
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Chỉ cho phép những người dùng đã xác thực
@@ -173,8 +190,61 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'recommendation.tasks.train_recommendation_model',
         'schedule': crontab(hour=0, minute=0, day_of_week='sunday'),  # Lên lịch vào mỗi chủ nhật lúc 00:00
     },
+    'compact-inventory-ledger-every-day': {
+        'task': 'products.tasks.compact_inventory_ledger',
+        'schedule': crontab(hour=2, minute=0),  # Gộp sổ kho mỗi ngày lúc 02:00
+    },
 }
 
+# Bảng tồn kho khả dụng trong bộ nhớ (products/availability.py)
+AVAILABILITY_STALENESS_SECONDS = 2  # Số liệu tồn kho hiển thị cũ tối đa bấy nhiêu giây
+AVAILABILITY_FULL_RELOAD_SECONDS = 300  # Nạp lại toàn bộ định kỳ (biến thể thêm bằng bulk_create)
+
+# Cache dùng chung giữa các worker (bảng xếp hạng, chống trùng callback, xác thực token...)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+AUTH_TOKEN_CACHE_TTL = 300  # Thời gian giữ token -> user trong Redis (giây)
+AUTH_TOKEN_LOCAL_TTL = 5  # Thời gian giữ trong bộ nhớ tiến trình; cũng là độ trễ tối đa khi thu hồi
+AUTH_TOKEN_LOCAL_SIZE = 10000
+
+# API đọc danh mục dạng async (products/async_views.py); shop_vivu/asgi.py bật khi chạy dưới ASGI
+ASYNC_CATALOG = os.environ.get('ASYNC_CATALOG') == '1'
+CATALOG_SCORING_WORKERS = 4  # Số luồng tối đa cho phần tính điểm sản phẩm liên quan/gợi ý
+
+# Số liệu hiệu năng từng request (shop_vivu/metrics.py), xem tại /metrics/
+METRICS_FLUSH_SECONDS = 10  # Chu kỳ mỗi worker ghi số liệu vào cache
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Prometheus gửi `Authorization: Bearer <token>`
+DEFAULT_QUERY_BUDGET = 30  # Số truy vấn tối đa mỗi request trước khi bị ghi log cảnh báo
+QUERY_BUDGETS = {
+    'product-list': 10,
+    'product-detail': 10,
+    'new-products': 10,
+    'category-list': 5,
+    'banner-list': 5,
+    'related-products': 12,
+    'order-list': 8,
+    'order-detail': 8,
+    'create-order': 40,
+}
+
+# Đo hiệu năng request theo yêu cầu của nhân viên và lấy mẫu ngẫu nhiên (profiling/middleware.py)
+PROFILING_HEADER = 'X-Profile'
+PROFILING_QUERY_PARAM = '_profile'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))  # Ví dụ 0.001: 1 request/1000
+PROFILING_SAMPLE_MIN_MS = 200  # Lấy mẫu ngẫu nhiên chỉ lưu request chậm hơn mức này
+PROFILING_SAMPLE_INTERVAL = 0.005  # Giây giữa hai lần đọc stack
+PROFILING_MAX_CAPTURES = 1000
+PROFILING_PRUNE_EVERY = 100  # Dọn kết quả cũ sau mỗi bấy nhiêu lần lưu
+
+# Đăng nhập trả về access/refresh token ký số thay cho session + Token (user/tokens.py)
+STATELESS_AUTH = False
+ACCESS_TOKEN_TTL = 300  # Access token sống ngắn, không thu hồi riêng lẻ được
+REFRESH_TOKEN_TTL = 14 * 24 * 3600
+
 
 JAZZMIN_UI_TWEAKS = {
     "navbar_small_text": False,
@@ -228,6 +298,7 @@ JAZZMIN_SETTINGS = {
         "products.Category": "fa-solid fa-shirt",
         "products.Image": "fa-solid fa-shirt",
         "products.StockQuantity": "fa-solid fa-shirt",
+        "products.InventoryMovement": "fa-solid fa-shirt",
         "products.PurchaseInvoiceLine": "fa-solid fa-shirt",
         "products.PurchaseInvoice": "fa-solid fa-shirt",
         "products.Review": "fa-solid fa-shirt",
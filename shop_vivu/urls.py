@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from cart import views
-from shop_vivu import settings
+from shop_vivu import metrics, settings
 from rest_framework.authtoken import views
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +27,7 @@ urlpatterns = [
     path('cart/', include('cart.urls')),
     path('api/', include('products.urls')),
     path('api-token-auth/', views.obtain_auth_token),
+    path('metrics/', metrics.metrics_view, name='metrics'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
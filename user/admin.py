@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.urls import path
 from django.utils.translation import gettext_lazy as _
+from shop_vivu import ids
 from .models import User
 
 
@@ -32,8 +33,7 @@ class UserAdmin(BaseUserAdmin):
         Đảm bảo `user_id` được tạo trước khi lưu người dùng mới.
         """
         if not obj.user_id:
-            current_count = User.objects.count() + 1
-            obj.user_id = f"KH{current_count:04d}"
+            obj.user_id = ids.next_id('KH')
         super().save_model(request, obj, form, change)
 
     def get_urls(self):
@@ -5,3 +5,6 @@ class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
     verbose_name = 'Tài khoản'
+
+    def ready(self):
+        import user.signals
@@ -0,0 +1,201 @@
+"""
+Xác thực token có cache: tránh truy vấn Token + User ở mỗi request API.
+
+Hai tầng cache:
+- Tầng 1: LRU trong bộ nhớ tiến trình, TTL ngắn (`AUTH_TOKEN_LOCAL_TTL`), không tốn round-trip nào.
+- Tầng 2: cache dùng chung (Redis, `AUTH_TOKEN_CACHE_TTL`), dùng chung giữa các worker.
+
+Đăng xuất, đổi mật khẩu và khóa tài khoản gọi `invalidate_user`: tầng 2 và tầng 1 của tiến trình
+hiện tại bị xóa ngay; tầng 1 của các tiến trình khác hết hạn sau tối đa `AUTH_TOKEN_LOCAL_TTL` giây.
+
+`SignedTokenAuthentication` (chế độ `STATELESS_AUTH`, xem `user.tokens`) kiểm tra chữ ký rồi lấy trạng thái
+người dùng (kèm mốc thu hồi) từ cùng hai tầng cache theo mã người dùng, nên cũng không cần truy vấn.
+
+Cache chỉ giữ mã người dùng, `is_active` (và mã token hoặc mốc thu hồi), không giữ đối tượng `User`: không có
+hash mật khẩu trong cache dùng chung, và view không thể lưu đè bản cũ lên thay đổi của worker khác.
+`request.user` là `LazyUser`, chỉ truy vấn người dùng khi view đọc tới một trường ngoài `pk`.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from . import tokens
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'auth-token:{}'
+USER_CACHE_KEY = 'auth-user:{}'
+
+
+class LocalTTLCache:
+    """LRU nhỏ trong bộ nhớ, mỗi phần tử có hạn dùng riêng; an toàn khi dùng từ nhiều thread."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def discard(self, predicate):
+        """Xóa các phần tử có `predicate(key, value)` đúng."""
+        with self._lock:
+            for key in [key for key, (value, _) in self._data.items() if predicate(key, value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LazyUser(SimpleLazyObject):
+    """Người dùng đã xác thực; `pk` có sẵn từ cache, các trường khác được nạp từ DB ở lần đọc đầu tiên."""
+
+    def __init__(self, pk):
+        super().__init__(lambda: _load_user(pk))
+        self.__dict__['_user_pk'] = pk
+
+    @property
+    def pk(self):
+        return self.__dict__['_user_pk']
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        # `IsAuthenticated` kiểm tra `request.user and ...`: không nạp người dùng chỉ để trả lời
+        return True
+
+    def __copy__(self):
+        return LazyUser(self.pk) if self._wrapped is empty else copy.copy(self._wrapped)
+
+    def __deepcopy__(self, memo):
+        return LazyUser(self.pk) if self._wrapped is empty else copy.deepcopy(self._wrapped, memo)
+
+
+def _load_user(pk):
+    user = User.objects.filter(pk=pk).first()
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+    return user
+
+
+local_cache = LocalTTLCache(settings.AUTH_TOKEN_LOCAL_SIZE, settings.AUTH_TOKEN_LOCAL_TTL)
+# Số lần xác thực theo nguồn ('local', 'shared', 'db', 'signed') và tổng thời gian (giây) tương ứng
+stats = Counter()
+
+
+def invalidate_user(user_id):
+    """Xóa khỏi cả hai tầng cache mọi token của người dùng."""
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    cache.delete_many([USER_CACHE_KEY.format(user_id)] + [CACHE_KEY.format(key) for key in keys])
+    local_cache.discard(lambda key, value: value[0] == user_id)
+
+
+def invalidate_token(key):
+    cache.delete(CACHE_KEY.format(key))
+    local_cache.discard(lambda cached_key, value: cached_key == key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` với cache hai tầng cho phép tra token -> người dùng."""
+
+    def authenticate_credentials(self, key):
+        started = time.perf_counter()
+        source = 'local'
+        entry = local_cache.get(key)
+        if entry is None:
+            source = 'shared'
+            entry = cache.get(CACHE_KEY.format(key))
+            if entry is None:
+                source = 'db'
+                entry = Token.objects.filter(key=key).values_list('user_id', 'key', 'user__is_active').first()
+                if entry is None:
+                    raise exceptions.AuthenticationFailed('Invalid token.')
+                cache.set(CACHE_KEY.format(key), entry, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+            local_cache.set(key, entry)
+
+        user_pk, token_key, is_active = entry
+        if not is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        _record(source, started)
+        return LazyUser(user_pk), Token(key=token_key, user_id=user_pk)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Access token ký số: `Authorization: Bearer <token>`. Trạng thái người dùng và mốc thu hồi được lấy từ
+    cache hai tầng theo mã trong token; token cấp trước lần đổi mật khẩu/khóa tài khoản bị từ chối.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        started = time.perf_counter()
+        try:
+            payload = tokens.read_access(auth[1].decode())
+        except (tokens.InvalidToken, UnicodeError):
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+
+        key = USER_CACHE_KEY.format(payload['u'])
+        entry = local_cache.get(key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is None:
+                is_active = User.objects.filter(pk=payload['u']).values_list('is_active', flat=True).first()
+                if is_active is None:
+                    raise exceptions.AuthenticationFailed('User inactive or deleted.')
+                entry = (payload['u'], is_active, tokens.revoked_before(payload['u']))
+                cache.set(key, entry, timeout=settings.AUTH_TOKEN_CACHE_TTL)
+            local_cache.set(key, entry)
+
+        user_pk, is_active, revoked_before = entry
+        if not is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if revoked_before is not None and payload.get('t', 0) <= revoked_before:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        _record('signed', started)
+        return LazyUser(user_pk), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def _record(source, started):
+    elapsed = time.perf_counter() - started
+    stats[source] += 1
+    stats[f'{source}_seconds'] += elapsed
+    logger.debug("Xác thực từ %s trong %.3f ms", source, elapsed * 1000)
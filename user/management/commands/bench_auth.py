@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from user import tokens
+from user.authentication import CachedTokenAuthentication, SignedTokenAuthentication, local_cache
+from user.models import User
+from user.views import user_login
+
+BENCH_EMAIL = 'bench-auth@shop.local'
+BENCH_PASSWORD = 'bench-auth'
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo chi phí xác thực mỗi request (thời gian, số truy vấn) của Token thường, Token có cache "
+        "và access token ký số (STATELESS_AUTH), cùng số truy vấn khi đăng nhập ở hai chế độ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Số request xác thực mỗi chế độ")
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        user = User.objects.create_user(email=BENCH_EMAIL, full_name='Bench', password=BENCH_PASSWORD)
+        try:
+            token = Token.objects.create(user=user)
+            modes = [
+                ('token (DB)', TokenAuthentication, f'Token {token.key}'),
+                ('token (cache)', CachedTokenAuthentication, f'Token {token.key}'),
+                ('signed', SignedTokenAuthentication, f'Bearer {tokens.issue_access(user)}'),
+            ]
+            self.stdout.write(f"{'chế độ':<14} {'µs/request':>11} {'truy vấn/request':>17}  ({connection.vendor})")
+            local_cache.clear()
+            for name, authentication_class, header in modes:
+                elapsed, queries = self._measure(authentication_class, header, count)
+                self.stdout.write(f"{name:<14} {elapsed / count * 1e6:>11.1f} {queries / count:>17.3f}")
+
+            for stateless in (False, True):
+                with override_settings(STATELESS_AUTH=stateless):
+                    queries = self._login_queries()
+                self.stdout.write(f"Đăng nhập (STATELESS_AUTH={stateless}): {queries} truy vấn")
+        finally:
+            user.delete()
+
+    def _measure(self, authentication_class, header, count):
+        factory = APIRequestFactory()
+        authenticator = authentication_class()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(count):
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=header), authenticators=[authenticator])
+                request.user
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries)
+
+    def _login_queries(self):
+        request = APIRequestFactory().post(
+            '/user/login/', {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}, format='json',
+        )
+        SessionMiddleware(lambda request: None).process_request(request)
+        with CaptureQueriesContext(connection) as queries:
+            response = user_login(request)
+            # Session chỉ được ghi khi response đi qua SessionMiddleware
+            if request.session.modified:
+                request.session.save()
+        if response.status_code != 200:
+            raise CommandError(f"Đăng nhập thất bại: {response.content!r}")
+        return len(queries)
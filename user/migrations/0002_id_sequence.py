@@ -0,0 +1,86 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+PREFIXES = ['KH', 'OD', 'OL', 'INV', 'PIL']
+
+
+def seed_sequences(apps, schema_editor):
+    """
+    Tạo sẵn bộ đếm cho các tiền tố. Mã KH cũ là số liên tiếp nên bộ đếm KH bắt đầu sau mã lớn nhất;
+    mã OD/OL/INV/PIL cũ là 8 ký tự hex, khác độ dài với mã mới nên không thể trùng.
+    """
+    User = apps.get_model('user', 'User')
+    IdSequence = apps.get_model('user', 'IdSequence')
+    user_ids = User.objects.filter(user_id__regex=r'^KH[0-9]+$').values_list('user_id', flat=True)
+    last_user = max((int(user_id[2:]) for user_id in user_ids.iterator()), default=0)
+    IdSequence.objects.bulk_create(
+        [IdSequence(name=prefix, next_value=last_user if prefix == 'KH' else 0) for prefix in PREFIXES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='Tiền tố')),
+                ('next_value', models.BigIntegerField(default=0, verbose_name='Số đã cấp tới')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm mã',
+                'verbose_name_plural': 'Bộ đếm mã',
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='user',
+            options={'verbose_name': 'Quản lý người dùng', 'verbose_name_plural': 'Quản lý người dùng'},
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='address',
+            field=models.TextField(null=True, verbose_name='Địa chỉ'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='full_name',
+            field=models.CharField(max_length=255, verbose_name='Họ và tên'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='gender',
+            field=models.CharField(choices=[('Male', 'Nam'), ('Female', 'Nữ'), ('Other', 'Khác')], default='Other', max_length=10, null=True, verbose_name='Giới tính'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Còn hoạt động'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_staff',
+            field=models.BooleanField(default=False, verbose_name='Là nhân viên'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='password',
+            field=models.CharField(max_length=255, verbose_name='Mật khẩu'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(max_length=15, null=True, unique=True, verbose_name='Số điện thoại'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('Customer', 'Khách hàng'), ('Admin', 'Quản lý'), ('Staff', 'Nhân viên')], default='Customer', max_length=10, verbose_name='Vai trò'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 
+from shop_vivu import ids
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, full_name, password=None, **extra_fields):
@@ -8,16 +10,8 @@ class CustomUserManager(BaseUserManager):
             raise ValueError("The Email field must be set")
         email = self.normalize_email(email)
 
-        # Tự động tạo `user_id`
-        max_id = self.model.objects.aggregate(models.Max('user_id'))['user_id__max']
-        if max_id:
-            # Lấy số từ mã cuối cùng và tăng lên 1
-            num = int(max_id[2:]) + 1
-        else:
-            num = 1
-        user_id = 'KH' + str(num).zfill(4)  # KH0001, KH0002, KH0003...
-
-        user = self.model(user_id=user_id, email=email, full_name=full_name, **extra_fields)
+        # Tự động tạo `user_id`: KH0001, KH0002, ... (xem shop_vivu.ids)
+        user = self.model(user_id=ids.next_id('KH'), email=email, full_name=full_name, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
@@ -109,11 +103,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['full_name']
     def save(self, *args, **kwargs):
         if not self.user_id:
-            current_count = User.objects.count() + 1
-            self.user_id = f"KH{current_count:04d}"
+            self.user_id = ids.next_id('KH')
         super().save(*args, **kwargs)
     def __str__(self):
         return f"{self.user_id} - {self.full_name}"
     class Meta:
         verbose_name = "Quản lý người dùng"
-        verbose_name_plural = "Quản lý người dùng"
\ No newline at end of file
+        verbose_name_plural = "Quản lý người dùng"
+
+
+class IdSequence(models.Model):
+    """
+    Bộ đếm mã theo tiền tố (KH, OD, OL, INV, PIL). `next_value` là số lớn nhất đã được cấp
+    cho một tiến trình; mỗi tiến trình giữ một khối số trong bộ nhớ (xem `shop_vivu.ids`).
+    """
+    name = models.CharField(max_length=10, primary_key=True, verbose_name="Tiền tố")
+    next_value = models.BigIntegerField(default=0, verbose_name="Số đã cấp tới")
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+    class Meta:
+        verbose_name = "Bộ đếm mã"
+        verbose_name_plural = "Bộ đếm mã"
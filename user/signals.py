@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import tokens
+from .authentication import invalidate_token, invalidate_user
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    # Đổi mật khẩu, khóa tài khoản hay sửa thông tin đều làm bản cache cũ; riêng cập nhật last_login thì bỏ qua
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    # Đặt mốc thu hồi trước khi xóa cache: request chen giữa không nạp lại bản cache thiếu mốc
+    if 'is_active' not in instance.get_deferred_fields() and not instance.is_active:
+        tokens.revoke_user(instance.pk)
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
@@ -1,3 +1,200 @@
-from django.test import TestCase
+import threading
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from shop_vivu import ids
+
+from . import tokens
+from .authentication import CACHE_KEY, CachedTokenAuthentication, SignedTokenAuthentication, local_cache
+from .models import IdSequence, User
+
+
+class AuthenticationTestMixin:
+    authentication_class = None
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(email='khach@shop.vn', full_name='Khách', password='matkhau-cu')
+
+    def authenticate(self, header):
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=header),
+                          authenticators=[self.authentication_class()])
+        return request.user
+
+
+
+class CachedTokenAuthenticationTests(AuthenticationTestMixin, TestCase):
+    authentication_class = CachedTokenAuthentication
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.header = f'Token {self.token.key}'
+
+    def assertNotCached(self):
+        self.assertIsNone(local_cache.get(self.token.key))
+        self.assertIsNone(cache.get(CACHE_KEY.format(self.token.key)))
+
+    def test_cached_token_needs_no_queries(self):
+        self.authenticate(self.header)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(self.header).pk, self.user.pk)
+        # Hết hạn ở tầng 1 thì lấy từ tầng 2, vẫn không truy vấn
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(self.header).pk, self.user.pk)
+
+    def test_logout_clears_both_levels(self):
+        self.authenticate(self.header)
+        response = self.client.post(reverse('logout'), HTTP_AUTHORIZATION=self.header)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotCached()
+
+    def test_password_change_clears_both_levels(self):
+        self.authenticate(self.header)
+        response = self.client.put(reverse('change_password'), {
+            'current_password': 'matkhau-cu', 'new_password': 'matkhau-moi',
+        }, content_type='application/json', HTTP_AUTHORIZATION=self.header)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotCached()
+
+    def test_deleted_token_is_rejected(self):
+        self.authenticate(self.header)
+        self.token.delete()
+        self.assertNotCached()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.header)
+
+    def test_expired_entry_is_checked_again(self):
+        self.authenticate(self.header)
+        # Token bị xóa ở tiến trình khác (cache tầng 1 ở đây không được báo) rồi mục cache hết hạn
+        Token.objects.filter(pk=self.token.pk)._raw_delete(connection.alias)
+        self.assertEqual(self.authenticate(self.header).pk, self.user.pk)
+        local_cache.clear()
+        cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.header)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate(self.header)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.header)
+
+    def test_cache_holds_no_user_object(self):
+        self.authenticate(self.header)
+        self.assertEqual(cache.get(CACHE_KEY.format(self.token.key)), (self.user.pk, self.token.key, True))
+
+    def test_profile_update_keeps_password_changed_elsewhere(self):
+        self.authenticate(self.header)
+        # Worker khác đổi mật khẩu mà cache ở đây chưa được báo
+        User.objects.filter(pk=self.user.pk).update(password=make_password('matkhau-moi'))
+        new_hash = User.objects.get(pk=self.user.pk).password
+        response = self.client.put(reverse('update_user'), {'full_name': 'Khách mới'},
+                                   content_type='application/json', HTTP_AUTHORIZATION=self.header)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.full_name, self.user.password), ('Khách mới', new_hash))
+
+class SignedTokenAuthenticationTests(AuthenticationTestMixin, TestCase):
+    authentication_class = SignedTokenAuthentication
+
+    def header(self):
+        return f'Bearer {tokens.issue_access(self.user)}'
+
+    def test_cached_user_needs_no_queries(self):
+        header = self.header()
+        self.authenticate(header)
+        with self.assertNumQueries(0):
+            user = self.authenticate(header)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertTrue(IsAuthenticated().has_permission(SimpleNamespace(user=user), None))
+        # Các trường hồ sơ được nạp một lần, khi view đọc tới
+        with self.assertNumQueries(1):
+            self.assertEqual((user.full_name, user.is_staff), ('Khách', False))
+
+    def test_token_issued_before_password_change_is_rejected(self):
+        header = self.header()
+        self.authenticate(header)
+        tokens.revoke_user(self.user.pk)
+        self.user.set_password('matkhau-moi')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(header)
+
+    def test_deactivated_user_is_rejected(self):
+        header = self.header()
+        self.authenticate(header)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(header)
+
+    def test_deleted_user_is_rejected(self):
+        header = self.header()
+        self.authenticate(header)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(header)
+
+    def test_tampered_token_is_rejected(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.header() + 'x')
+
+
+@mock.patch.dict(ids.SEQUENCES, {'TST': (4, 3)})
+class IdAllocatorTests(TestCase):
+    def test_block_rollover(self):
+        allocator = ids.IdAllocator()
+        self.assertEqual(allocator.next_id('TST'), 'TST0001')
+        with self.assertNumQueries(0):
+            self.assertEqual([allocator.next_id('TST') for _ in range(2)], ['TST0002', 'TST0003'])
+        # Khối đầu đã hết: đặt khối mới bằng một lần ghi
+        self.assertEqual(allocator.next_id('TST'), 'TST0004')
+        self.assertEqual(IdSequence.objects.get(name='TST').next_value, 6)
+
+    def test_ids_increase_after_another_process_takes_a_block(self):
+        first, second = ids.IdAllocator(), ids.IdAllocator()
+        taken = [first.next_id('TST') for _ in range(3)]
+        others = [second.next_id('TST') for _ in range(3)]
+        taken += [first.next_id('TST') for _ in range(3)]
+        self.assertEqual(taken, sorted(taken))
+        self.assertEqual(taken[3], 'TST0007')
+        self.assertFalse(set(taken) & set(others))
+
+
+@mock.patch.dict(ids.SEQUENCES, {'TST': (4, 3)})
+class IdAllocatorThreadTests(TransactionTestCase):
+    def test_unique_across_threads(self):
+        allocator = ids.IdAllocator()
+        results = [[] for _ in range(6)]
+
+        def work(out):
+            try:
+                out.extend(allocator.next_id('TST') for _ in range(20))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(out,)) for out in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        issued = [value for out in results for value in out]
+        self.assertEqual(len(issued), 120)
+        self.assertEqual(len(set(issued)), 120)
+        for out in results:
+            self.assertEqual(out, sorted(out))
@@ -0,0 +1,89 @@
+"""
+Token truy cập ký số cho chế độ xác thực không trạng thái (`STATELESS_AUTH`).
+
+- Access token: sống ngắn (`ACCESS_TOKEN_TTL`), chứa mã người dùng và thời điểm cấp, được kiểm tra bằng chữ ký;
+  người dùng lấy từ cache hai tầng (`user.authentication`) nên request API không cần truy vấn nào để xác thực.
+  Không bị thu hồi riêng lẻ (đăng xuất), nhưng bị từ chối khi người dùng bị thu hồi (xem dưới).
+- Refresh token: sống lâu (`REFRESH_TOKEN_TTL`), dùng để lấy access token mới; mỗi lần làm mới kiểm tra
+  danh sách thu hồi và trạng thái tài khoản.
+
+Danh sách thu hồi nằm trong cache với TTL bằng thời gian sống còn lại của refresh token, nên tự gọn:
+từng refresh token (đăng xuất) theo `jti`, và theo người dùng (đổi mật khẩu, khóa tài khoản) bằng
+mốc thời gian: mọi refresh token cấp trước mốc đó đều bị từ chối.
+"""
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+ACCESS_SALT = 'user.tokens.access'
+REFRESH_SALT = 'user.tokens.refresh'
+REVOKED_TOKEN_KEY = 'auth-revoked-token:{}'
+REVOKED_USER_KEY = 'auth-revoked-user:{}'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def issue_access(user):
+    return signing.dumps({'u': user.pk, 't': _now_ms()}, salt=ACCESS_SALT)
+
+
+def issue_refresh(user):
+    return signing.dumps({'u': user.pk, 'j': secrets.token_hex(8), 't': _now_ms()}, salt=REFRESH_SALT)
+
+
+def issue_pair(user):
+    return {'access': issue_access(user), 'refresh': issue_refresh(user), 'expires_in': settings.ACCESS_TOKEN_TTL}
+
+
+def read_access(token):
+    """
+    Nội dung access token ({'u': user_id, 't': thời điểm cấp}) nếu chữ ký đúng và chưa hết hạn.
+    Việc thu hồi theo người dùng do bên gọi kiểm tra bằng `revoked_before`.
+    """
+    try:
+        return signing.loads(token, salt=ACCESS_SALT, max_age=settings.ACCESS_TOKEN_TTL)
+    except signing.BadSignature:  # gồm cả SignatureExpired
+        raise InvalidToken
+
+
+def read_refresh(token):
+    """Nội dung refresh token nếu hợp lệ, chưa hết hạn và chưa bị thu hồi."""
+    try:
+        payload = signing.loads(token, salt=REFRESH_SALT, max_age=settings.REFRESH_TOKEN_TTL)
+    except signing.BadSignature:
+        raise InvalidToken
+    revoked = cache.get_many([REVOKED_TOKEN_KEY.format(payload['j']), REVOKED_USER_KEY.format(payload['u'])])
+    if REVOKED_TOKEN_KEY.format(payload['j']) in revoked:
+        raise InvalidToken
+    user_revoked_at = revoked.get(REVOKED_USER_KEY.format(payload['u']))
+    if user_revoked_at is not None and payload['t'] <= user_revoked_at:
+        raise InvalidToken
+    return payload
+
+
+def revoke_refresh(token):
+    try:
+        payload = read_refresh(token)
+    except InvalidToken:
+        return
+    remaining = (payload['t'] - _now_ms()) // 1000 + settings.REFRESH_TOKEN_TTL
+    cache.set(REVOKED_TOKEN_KEY.format(payload['j']), 1, timeout=max(remaining, 1))
+
+
+def revoked_before(user_id):
+    """Mốc thu hồi (ms) của người dùng, token cấp không muộn hơn mốc này bị từ chối; None nếu chưa bị thu hồi."""
+    return cache.get(REVOKED_USER_KEY.format(user_id))
+
+
+def revoke_user(user_id):
+    """Thu hồi mọi refresh token đã cấp cho người dùng tới thời điểm này."""
+    cache.set(REVOKED_USER_KEY.format(user_id), _now_ms(), timeout=settings.REFRESH_TOKEN_TTL)
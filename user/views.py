@@ -5,6 +5,10 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from .models import User
 from .forms import UserRegistrationForm
 from rest_framework.authtoken.models import Token
+from shop_vivu import ids
+from django.conf import settings
+from . import tokens
+from .authentication import invalidate_token
 
 # Đăng ký tài khoản
 @api_view(['POST'])
@@ -13,9 +17,7 @@ def register(request):
     form = UserRegistrationForm(data=request.data)
     if form.is_valid():
         user = form.save(commit=False)
-        user_id_prefix = "KH"
-        current_count = User.objects.count() + 1
-        user.user_id = f"{user_id_prefix}{current_count:04d}"  # Tạo mã như KH0001, KH0002
+        user.user_id = ids.next_id('KH')  # Tạo mã như KH0001, KH0002
         user.set_password(form.cleaned_data['password1'])  # Mã hóa mật khẩu
         user.save()
         return JsonResponse({"message": "Đăng ký tài khoản thành công"}, status=201)
@@ -36,17 +38,40 @@ def user_login(request):
     if user is not None:
         if not user.is_active:
             return JsonResponse({'error': 'Tài khoản đã bị vô hiệu hóa'}, status=403)
+        if settings.STATELESS_AUTH:
+            # Không ghi session, không tạo Token: trả về cặp access/refresh token ký số
+            return JsonResponse({
+                'message': 'Đăng nhập thành công', 'user_id': user.user_id, 'user_name': user.full_name,
+                **tokens.issue_pair(user),
+            }, status=200)
         login(request, user)
         # Tạo hoặc lấy token cho user
         token, _ = Token.objects.get_or_create(user=user)
         return JsonResponse({'message': 'Đăng nhập thành công', 'user_id': user.user_id, 'user_name': user.full_name, 'token': token.key}, status=200)
     return JsonResponse({'error': 'Email hoặc mật khẩu không đúng'}, status=401)
 
+# Lấy access token mới từ refresh token (chế độ STATELESS_AUTH)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def token_refresh(request):
+    try:
+        payload = tokens.read_refresh(request.data.get('refresh') or '')
+    except tokens.InvalidToken:
+        return JsonResponse({'error': 'Refresh token không hợp lệ hoặc đã hết hạn'}, status=401)
+    user = User.objects.filter(pk=payload['u'], is_active=True).only('user_id').first()
+    if user is None:
+        return JsonResponse({'error': 'Tài khoản đã bị vô hiệu hóa'}, status=401)
+    return JsonResponse({'access': tokens.issue_access(user), 'expires_in': settings.ACCESS_TOKEN_TTL}, status=200)
+
 # Đăng xuất người dùng
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def user_logout(request):
     logout(request)
+    if isinstance(request.auth, Token):
+        invalidate_token(request.auth.key)
+    if request.data.get('refresh'):
+        tokens.revoke_refresh(request.data['refresh'])
     return JsonResponse({'message': 'Đăng xuất thành công'}, status=200)
 
 # Lấy thông tin người dùng
@@ -78,17 +103,23 @@ def update_user(request):
     gender = data.get('gender')
     address = data.get('address')
 
-    # Cập nhật từng trường nếu có dữ liệu mới
+    # Cập nhật từng trường nếu có dữ liệu mới; chỉ ghi các trường đã đổi để không ghi đè thay đổi khác
+    changed = []
     if full_name:
         user.full_name = full_name
+        changed.append('full_name')
     if phone:
         user.phone = phone
+        changed.append('phone')
     if gender:
         user.gender = gender
+        changed.append('gender')
     if address:
         user.address = address
+        changed.append('address')
 
-    user.save()
+    if changed:
+        user.save(update_fields=changed + ['updated_at'])
     return JsonResponse({'message': 'Thông tin người dùng đã được cập nhật'}, status=200)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
@@ -107,5 +138,6 @@ def change_password(request):
 
     # Đặt mật khẩu mới và lưu thay đổi
     user.set_password(new_password)
-    user.save()
+    tokens.revoke_user(user.pk)  # trước khi lưu: lưu người dùng xóa cache xác thực, bản nạp lại có mốc thu hồi
+    user.save(update_fields=['password', 'updated_at'])
     return JsonResponse({'message': 'Mật khẩu đã được thay đổi thành công'}, status=200)